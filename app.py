@@ -21,6 +21,17 @@ import hashlib
 import base64
 import html as html_module
 import copy
+import tempfile
+import threading
+import collections
+import logging
+import concurrent.futures
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except Exception:  # 구버전 Streamlit: 스레드에 실행 컨텍스트 전달 불가 (경고만 발생)
+    add_script_run_ctx = None
+    get_script_run_ctx = None
 
 # 1. 페이지 설정
 st.set_page_config(page_title="PM 통합 공정 관리 v4.5.22", page_icon="🏗️", layout="wide")
@@ -353,6 +364,10 @@ ADMIN_USER_ID = "admin"
 MENU_CONFIG_SHEET = "Control_Center"
 MENU_CONFIG_KEY = "hidden_pmo_menus"
 DAILY_REPORT_SHEET = "일일보고"
+PROGRESS_HISTORY_SHEET = "progress_history"
+PROGRESS_HISTORY_COLUMNS = ["날짜", "프로젝트명", "실적%", "계획%", "유형", "공정진행률", "저장시각"]
+PROGRESS_KEYFRAME_EVERY = 30  # 변경분(D) 30건마다 전체(K) 1건 기록 → 복원 시 재생 길이 제한
+PROGRESS_SNAPSHOT_DAY_CACHE = CACHE_DIR / "progress_snapshot_day.json"
 DAILY_REPORT_COLUMNS = [
     "날짜",
     "프로젝트명",
@@ -529,6 +544,10 @@ def refresh_sheet_data_cache(project_names=None, invalidate_editor: bool = True)
             clear_file_cache(p, preserve_menu_config=True)
     else:
         clear_file_cache(preserve_menu_config=True)
+        if SOLAR_STORE_ENABLED:
+            mark_solar_store_stale()
+        else:
+            invalidate_solar_sheets_fallback()
     if invalidate_editor:
         invalidate_process_edit_cache(project_names if project_names else None)
         if project_names:
@@ -558,11 +577,41 @@ def render_sidebar_cache_controls():
         st.rerun()
 
 
+SHEETS_API_CALLS_PER_MIN = int(os.environ.get("PMS_SHEETS_CALLS_PER_MIN", "60"))  # 0이면 제한 없음
+PORTFOLIO_FETCH_WORKERS = int(os.environ.get("PMS_FETCH_WORKERS", "4"))
+
+
+@st.cache_resource
+def _sheets_rate_state():
+    """프로세스 전체(모든 세션·스레드)가 공유하는 시트 API 호출 시각 기록"""
+    return {"lock": threading.Lock(), "calls": collections.deque()}
+
+
+def _wait_sheets_rate_limit() -> None:
+    """최근 60초 호출 수가 한도에 닿으면 가장 오래된 호출이 창을 벗어날 때까지 대기"""
+    limit = SHEETS_API_CALLS_PER_MIN
+    if limit <= 0:
+        return
+    state = _sheets_rate_state()
+    while True:
+        with state["lock"]:
+            now = time.monotonic()
+            calls = state["calls"]
+            while calls and now - calls[0] >= 60.0:
+                calls.popleft()
+            if len(calls) < limit:
+                calls.append(now)
+                return
+            wait = 60.0 - (now - calls[0])
+        time.sleep(max(0.05, wait))
+
+
 def safe_api_call(func, *args, **kwargs):
-    """API 할당량 초과(429) 방지를 위한 자동 재시도 함수"""
+    """API 할당량 초과(429) 방지를 위한 자동 재시도 함수 (공유 분당 호출 한도 적용)"""
     retries = 8
     for i in range(retries):
         try:
+            _wait_sheets_rate_limit()
             return func(*args, **kwargs)
         except Exception as e:
             is_quota = "429" in str(e) or "Quota exceeded" in str(e)
@@ -716,6 +765,39 @@ def get_client():
 # -------------------------------
 # [성능 개선] 구글 시트 읽기 캐시
 # -------------------------------
+# 시트 스냅샷 버전: 조회(캐시 미스) 시점에 한 번만 내용 해시를 계산해 등록.
+# 화면은 get_snapshot_version 으로 꺼내 쓰므로 리런마다 전체 데이터를 직렬화·해시하지 않음.
+
+@st.cache_resource
+def _snapshot_version_registry():
+    return {"lock": threading.Lock(), "versions": {}}
+
+
+def _data_content_hash(data) -> str:
+    """내용 해시 — JSON 으로 바로 못 바꾸는 값(날짜 등)은 문자열로 바꿔 해시하므로 같은 내용이면 항상 같은 키"""
+    try:
+        payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+    except (TypeError, ValueError):
+        payload = repr(data)
+    return hashlib.md5(payload.encode("utf-8")).hexdigest()
+
+
+def _register_snapshot_version(kind: str, spreadsheet_name: str, worksheet_name: str, data) -> None:
+    reg = _snapshot_version_registry()
+    version = _data_content_hash(data)
+    with reg["lock"]:
+        reg["versions"][(kind, spreadsheet_name, worksheet_name)] = version
+
+
+def get_snapshot_version(spreadsheet_name: str, worksheet_name: str, kind: str = "values") -> Optional[str]:
+    """
+    cached_get_* 가 마지막으로 조회한 스냅샷의 버전(내용 해시). 아직 조회 전이면 None.
+    kind: values(cached_get_all_values) / records / head_all(cached_get_head 기본) / head_{행수}
+    """
+    reg = _snapshot_version_registry()
+    with reg["lock"]:
+        return reg["versions"].get((kind, spreadsheet_name, worksheet_name))
+
 
 @st.cache_data(ttl=300, show_spinner=False)
 def cached_get_all_values(spreadsheet_name: str, worksheet_name: str):
@@ -724,6 +806,7 @@ def cached_get_all_values(spreadsheet_name: str, worksheet_name: str):
         cache_path = CACHE_DIR / f"{_sheet_name_to_filename(worksheet_name)}.json"
         loaded = _load_file_cache(cache_path, FILE_CACHE_TTL)
         if loaded is not None:
+            _register_snapshot_version("values", spreadsheet_name, worksheet_name, loaded)
             return loaded
     client = get_client()
     if client is None:
@@ -731,6 +814,7 @@ def cached_get_all_values(spreadsheet_name: str, worksheet_name: str):
     sh = safe_api_call(client.open, spreadsheet_name)
     ws = safe_api_call(sh.worksheet, worksheet_name)
     data = safe_api_call(ws.get_all_values)
+    _register_snapshot_version("values", spreadsheet_name, worksheet_name, data)
     if SHEET_CACHE_ENABLED and FILE_CACHE_TTL > 0 and spreadsheet_name == "pms_db":
         cache_path = CACHE_DIR / f"{_sheet_name_to_filename(worksheet_name)}.json"
         _save_file_cache(cache_path, data)
@@ -743,6 +827,7 @@ def cached_get_all_records(spreadsheet_name: str, worksheet_name: str):
         cache_path = CACHE_DIR / f"{_sheet_name_to_filename(worksheet_name)}_records.json"
         loaded = _load_file_cache(cache_path, FILE_CACHE_TTL)
         if loaded is not None:
+            _register_snapshot_version("records", spreadsheet_name, worksheet_name, loaded)
             return loaded
     client = get_client()
     if client is None:
@@ -750,34 +835,164 @@ def cached_get_all_records(spreadsheet_name: str, worksheet_name: str):
     sh = safe_api_call(client.open, spreadsheet_name)
     ws = safe_api_call(sh.worksheet, worksheet_name)
     data = safe_api_call(ws.get_all_records)
+    _register_snapshot_version("records", spreadsheet_name, worksheet_name, data)
     if SHEET_CACHE_ENABLED and FILE_CACHE_TTL > 0 and spreadsheet_name == "pms_db":
         cache_path = CACHE_DIR / f"{_sheet_name_to_filename(worksheet_name)}_records.json"
         _save_file_cache(cache_path, data)
     return data
 
 @st.cache_data(ttl=300, show_spinner=False)
-def cached_get_head(spreadsheet_name: str, worksheet_name: str, max_rows: int = 200):
+def cached_get_head(spreadsheet_name: str, worksheet_name: str, max_rows: Optional[int] = None):
     """
-    대시보드용: 상단 N행(A1~J{max_rows})만 읽어서 평균 진척 계산
-    → 프로젝트별 행이 많아져도 속도 유지. 파일 캐시 지원.
+    대시보드용: A~J열만 읽어서 평균 진척 계산 (파일 캐시 지원).
+    - max_rows=None(기본): 끝 행을 열어 둔 범위(A1:J) → API가 값이 있는 행까지만 반환하므로
+      공정이 200행을 넘어도 잘리지 않고, 작은 프로젝트는 빈 행을 받지 않음
+    - max_rows 지정 시: A1~J{max_rows} 고정 범위
     """
+    head_tag = "all" if max_rows is None else str(int(max_rows))
     if SHEET_CACHE_ENABLED and FILE_CACHE_TTL > 0 and spreadsheet_name == "pms_db":
-        cache_path = CACHE_DIR / f"{_sheet_name_to_filename(worksheet_name)}_head_{max_rows}.json"
+        cache_path = CACHE_DIR / f"{_sheet_name_to_filename(worksheet_name)}_head_{head_tag}.json"
         loaded = _load_file_cache(cache_path, FILE_CACHE_TTL)
         if loaded is not None:
+            _register_snapshot_version(f"head_{head_tag}", spreadsheet_name, worksheet_name, loaded)
             return loaded
     client = get_client()
     if client is None:
         return []
     sh = safe_api_call(client.open, spreadsheet_name)
     ws = safe_api_call(sh.worksheet, worksheet_name)
-    rng = f"A1:J{max_rows}"
+    rng = "A1:J" if max_rows is None else f"A1:J{int(max_rows)}"
     data = safe_api_call(ws.get, rng)
+    _register_snapshot_version(f"head_{head_tag}", spreadsheet_name, worksheet_name, data)
     if SHEET_CACHE_ENABLED and FILE_CACHE_TTL > 0 and spreadsheet_name == "pms_db":
-        cache_path = CACHE_DIR / f"{_sheet_name_to_filename(worksheet_name)}_head_{max_rows}.json"
+        cache_path = CACHE_DIR / f"{_sheet_name_to_filename(worksheet_name)}_head_{head_tag}.json"
         _save_file_cache(cache_path, data)
     return data
 
+# -------------------------------
+# [성능 개선] 포트폴리오 병렬 로더 (캐시가 비었을 때 프로젝트 시트 동시 조회)
+# -------------------------------
+
+def _bounded_thread_pool(max_workers: int, name_prefix: str = "pms-fetch"):
+    """작업 스레드에 현재 Streamlit 실행 컨텍스트를 붙인 스레드 풀 (st.cache_data 호출 가능)"""
+    ctx = get_script_run_ctx() if get_script_run_ctx is not None else None
+
+    def _attach_ctx():
+        if ctx is not None and add_script_run_ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+
+    return concurrent.futures.ThreadPoolExecutor(
+        max_workers=max(1, int(max_workers)),
+        thread_name_prefix=name_prefix,
+        initializer=_attach_ctx,
+    )
+
+
+def load_portfolio_snapshots(pjt_list, loader=None, progress_cb=None, max_workers: int = None) -> dict:
+    """
+    프로젝트별 시트 스냅샷을 제한된 스레드 풀로 동시에 조회.
+    - loader(프로젝트명): 기본은 대시보드용 A~J열 값(cached_get_head). 캐시 적중분은 즉시 반환됨
+    - 모든 호출은 safe_api_call 의 공유 분당 한도를 따름
+    - progress_cb(완료수, 전체수, 프로젝트명): 결과가 도착할 때마다 메인 스레드에서 호출
+    반환: {프로젝트명: 시트 값 목록} (조회 실패 프로젝트는 제외, pjt_list 순서 유지)
+    """
+    names = [p for p in dict.fromkeys(pjt_list or []) if p]
+    if not names:
+        return {}
+    if loader is None:
+        loader = lambda name: cached_get_head("pms_db", name)
+    workers = min(len(names), max_workers or PORTFOLIO_FETCH_WORKERS)
+    results = {}
+    done = 0
+    with _bounded_thread_pool(workers) as pool:
+        futures = {pool.submit(loader, name): name for name in names}
+        for fut in concurrent.futures.as_completed(futures):
+            name = futures[fut]
+            try:
+                results[name] = fut.result()
+            except Exception:
+                # 개별 프로젝트 오류는 무시하고 계속 (기존 직렬 루프와 동일)
+                pass
+            done += 1
+            if progress_cb is not None:
+                progress_cb(done, len(names), name)
+    return {name: results[name] for name in names if name in results}
+
+
+def _portfolio_progress_callback(label: str):
+    """st.progress 기반 진행 표시 콜백 → (진행바, 콜백). 완료 후 진행바.empty() 로 제거"""
+    bar = st.progress(0.0, text=label)
+
+    def _cb(done: int, total: int, name: str):
+        bar.progress(min(1.0, done / total) if total else 1.0, text=f"{label} ({done}/{total}) {name}")
+
+    return bar, _cb
+
+# -------------------------------
+# [성능 개선] Plotly Figure 캐시 (원본 데이터 서명 + 표시 옵션 기준)
+# -------------------------------
+# 달력 폼·PM 입력 등 다른 위젯 조작으로 리런될 때 같은 데이터의 차트를 다시 만들지 않음.
+# 캐시된 Figure는 세션 간 공유되므로 호출 측에서 수정(update_*)하지 말 것.
+FIGURE_CACHE_MAX = int(os.environ.get("PMS_FIGURE_CACHE_MAX", "64"))
+
+
+@st.cache_resource
+def _figure_cache_store():
+    return {"lock": threading.Lock(), "items": collections.OrderedDict()}
+
+
+def frame_signature(df: Optional[pd.DataFrame]) -> str:
+    """DataFrame 내용 서명 (행 단위 해시 합 → MD5). 차트 캐시 키용"""
+    if df is None or df.empty:
+        return "empty"
+    try:
+        row_hash = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        return hashlib.md5(row_hash.tobytes() + "|".join(map(str, df.columns)).encode("utf-8")).hexdigest()
+    except Exception:
+        return hashlib.md5(df.to_csv(index=False).encode("utf-8")).hexdigest()
+
+
+def get_or_build_figure(kind: str, signature: str, options: dict, builder) -> go.Figure:
+    """
+    (차트 종류, 데이터 서명, 옵션) 이 같으면 이전에 만든 Figure를 그대로 반환, 없으면 builder() 로 생성.
+    최근 사용 순으로 FIGURE_CACHE_MAX 개까지 보관.
+    """
+    if FIGURE_CACHE_MAX <= 0:
+        return builder()
+    key = (kind, str(signature), json.dumps(options or {}, sort_keys=True, ensure_ascii=False, default=str))
+    store = _figure_cache_store()
+    with store["lock"]:
+        fig = store["items"].get(key)
+        if fig is not None:
+            store["items"].move_to_end(key)
+            return fig
+    fig = builder()
+    with store["lock"]:
+        store["items"][key] = fig
+        store["items"].move_to_end(key)
+        while len(store["items"]) > FIGURE_CACHE_MAX:
+            store["items"].popitem(last=False)
+    return fig
+
+
+# -------------------------------
+# [성능 개선] 부분 리런 (st.fragment) — 편집기 셀 수정 시 해당 영역만 다시 실행
+# -------------------------------
+_st_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+
+
+def _fragment_or_plain(func):
+    """st.fragment 가 있는 버전이면 fragment 로, 없으면 일반 함수 그대로"""
+    return _st_fragment(func) if _st_fragment is not None else func
+
+
+def _rerun_fragment() -> None:
+    """현재 fragment 만 다시 실행 (미지원 버전은 전체 리런)"""
+    try:
+        st.rerun(scope="fragment")
+    except TypeError:
+        st.rerun()
+
 # -------------------------------
 # [예측] Open-Meteo 기반 내일 일사량/발전시간 예측
 # -------------------------------
@@ -797,6 +1012,15 @@ SOLAR_ANALYSIS_FOCUS_YEARS = [2024, 2025]
 SOLAR_SHEET_PREFIX = "Solar_"
 SOLAR_LEGACY_SHEET = "Solar_DB"
 SOLAR_FORECAST_SHEET = "Solar_Forecast"
+SOLAR_FORECAST_COLUMNS = [
+    "날짜", "지점", "위도", "경도", "예보_일사량(MJ/m²)", "예측_발전시간(h)", "예측모델", "R2",
+    "운량(%)", "최고기온(℃)", "강수량(mm)", "저장시각", "저장자",
+]
+# 전 지점 7일 예보: 한 요청에 묶을 최대 좌표 수, 하루 1회 자동 저장 여부
+OPEN_METEO_MULTI_MAX = int(os.environ.get("PMS_OPEN_METEO_MULTI_MAX", "50"))
+PORTFOLIO_FORECAST_AUTO = os.environ.get("PMS_PORTFOLIO_FORECAST_AUTO", "false").strip().lower() in ("1", "true", "yes", "on")
+PORTFOLIO_FORECAST_STATE = CACHE_DIR / "portfolio_forecast_state.json"
+PORTFOLIO_FORECAST_CHECK_INTERVAL = int(os.environ.get("PMS_PORTFOLIO_FORECAST_INTERVAL", "1800"))  # 초. 자동 저장 작업이 날짜 바뀜을 확인하는 간격
 SOLAR_LOCATION_COLUMNS = ["날짜", "발전시간", "일사량합계"]
 SOLAR_UNIFIED_COLUMNS = ["날짜", "지점", "발전시간", "일사량합계"]
 SOLAR_SHEET_DEFAULT_ROWS = 20000
@@ -855,10 +1079,14 @@ def get_or_create_solar_location_worksheet(sh, location: str):
     return ws
 
 
-def list_solar_locations(sh, df_db: pd.DataFrame = None) -> list:
+def list_solar_locations(sh, df_db: pd.DataFrame = None, index: dict = None) -> list:
     locs = set(GEO_FALLBACK_COORDS.keys())
     if df_db is not None and not df_db.empty and "지점" in df_db.columns:
         locs.update(df_db["지점"].dropna().astype(str).unique().tolist())
+    if index is not None:
+        # 메타데이터 색인이 있으면 시트 목록 API 조회 생략
+        locs.update(index.keys())
+        return sorted(str(x) for x in locs if str(x).strip())
     try:
         for ws in sh.worksheets():
             loc = location_from_solar_sheet(ws.title)
@@ -868,16 +1096,99 @@ def list_solar_locations(sh, df_db: pd.DataFrame = None) -> list:
         pass
     return sorted(str(x) for x in locs if str(x).strip())
 
+# -------------------------------
+# [성능 개선] Open-Meteo 응답 디스크 캐시 + 연결 재사용 세션
+# -------------------------------
+# 재시작·재배포 후에도 지오코딩·과거 일사량 응답을 재사용. 키 = 엔드포인트 + 정규화된 요청 파라미터.
+# 주소·캐시 폴더는 환경변수로 바꿀 수 있음 (로컬 스텁 서버로 테스트할 때 사용)
+OPEN_METEO_GEOCODE_URL = os.environ.get("PMS_OPEN_METEO_GEOCODE_URL", "https://geocoding-api.open-meteo.com/v1/search")
+OPEN_METEO_FORECAST_URL = os.environ.get("PMS_OPEN_METEO_FORECAST_URL", "https://api.open-meteo.com/v1/forecast")
+OPEN_METEO_ARCHIVE_URL = os.environ.get("PMS_OPEN_METEO_ARCHIVE_URL", "https://archive-api.open-meteo.com/v1/archive")
+HTTP_CACHE_DIR = pathlib.Path(os.environ.get("PMS_HTTP_CACHE_DIR", str(CACHE_DIR / "http")))
+HTTP_CACHE_ENABLED = os.environ.get("PMS_HTTP_CACHE", "true").strip().lower() not in ("0", "false", "no", "off")
+# 엔드포인트별 신선도(초). None = 만료 없음 (지난 연도 과거 데이터)
+HTTP_CACHE_TTL = {
+    "geocode": 30 * 24 * 3600,
+    "forecast": 3600,
+    "archive_recent": 24 * 3600,
+    "archive_past": None,
+}
+
+
+@st.cache_resource
+def _http_session_local():
+    return threading.local()
+
+
+def _http_session() -> requests.Session:
+    """스레드별 keep-alive 세션 (백필 스레드 풀에서도 연결 재사용)"""
+    local = _http_session_local()
+    sess = getattr(local, "session", None)
+    if sess is None:
+        sess = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        sess.mount("https://", adapter)
+        sess.mount("http://", adapter)
+        local.session = sess
+    return sess
+
+
+def _normalize_http_params(params: dict) -> dict:
+    """캐시 키·요청 공용 정규화: 좌표는 소수 4자리, 나머지는 문자열 (같은 지점이면 같은 키)"""
+    out = {}
+    for k, v in sorted((params or {}).items()):
+        if v is None:
+            continue
+        if isinstance(v, float):
+            v = round(v, 4)
+        out[str(k)] = v
+    return out
+
+
+def cached_http_get_json(
+    endpoint: str, url: str, params: dict, timeout: float, ttl_key: str = None, cacheable=None
+) -> dict:
+    """
+    GET → JSON (디스크 캐시 경유).
+    ttl_key 로 HTTP_CACHE_TTL 의 신선도 규칙을 고름 (기본: endpoint). 만료·없음이면 세션으로 조회 후 저장.
+    cacheable(data) 가 False 면 응답을 디스크에 저장하지 않음 (덜 채워진 응답이 캐시에 남지 않도록)
+    """
+    norm = _normalize_http_params(params)
+    key_src = json.dumps({"url": url, "params": norm}, sort_keys=True, ensure_ascii=False, default=str)
+    cache_path = HTTP_CACHE_DIR / endpoint / f"{hashlib.md5(key_src.encode('utf-8')).hexdigest()}.json"
+    ttl = HTTP_CACHE_TTL.get(ttl_key or endpoint, 3600)
+    if HTTP_CACHE_ENABLED and cache_path.exists():
+        try:
+            if ttl is None or (time.time() - cache_path.stat().st_mtime) <= ttl:
+                with open(cache_path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+        except Exception:
+            pass
+    r = _http_session().get(url, params=norm, timeout=timeout)
+    r.raise_for_status()
+    data = r.json()
+    if HTTP_CACHE_ENABLED and (cacheable is None or cacheable(data)):
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            # 같은 키를 여러 스레드가 동시에 저장해도 겹치지 않도록 임시 파일 이름을 따로 만듦
+            with tempfile.NamedTemporaryFile(
+                "w", encoding="utf-8", dir=cache_path.parent, suffix=".tmp", delete=False
+            ) as f:
+                json.dump(data, f, ensure_ascii=False)
+                tmp = f.name
+            os.replace(tmp, cache_path)
+        except Exception:
+            pass
+    return data
+
+
 def _geocode_one_query(query: str):
     """단일 쿼리로 Open-Meteo Geocoding 시도"""
     if not query or not query.strip():
         return None
-    url = "https://geocoding-api.open-meteo.com/v1/search"
     params = {"name": query.strip(), "count": 1, "language": "ko", "format": "json"}
     try:
-        r = requests.get(url, params=params, timeout=10)
-        r.raise_for_status()
-        j = r.json()
+        j = cached_http_get_json("geocode", OPEN_METEO_GEOCODE_URL, params, timeout=10)
         results = j.get("results") or []
         if not results:
             return None
@@ -931,17 +1242,14 @@ def fetch_open_meteo_daily_forecast(latitude: float, longitude: float, timezone:
     일 단위 예보:
     - shortwave_radiation_sum: MJ/m² (Open-Meteo 문서 기준)
     """
-    url = "https://api.open-meteo.com/v1/forecast"
     params = {
-        "latitude": latitude,
-        "longitude": longitude,
+        "latitude": float(latitude),
+        "longitude": float(longitude),
         "daily": "shortwave_radiation_sum,cloud_cover_mean,temperature_2m_max,temperature_2m_min,precipitation_sum",
         "forecast_days": 7,
         "timezone": timezone,
     }
-    r = requests.get(url, params=params, timeout=15)
-    r.raise_for_status()
-    return r.json()
+    return cached_http_get_json("forecast", OPEN_METEO_FORECAST_URL, params, timeout=15)
 
 def _pick_daily_value(forecast_json: dict, target_date: datetime.date, key: str):
     daily = (forecast_json or {}).get("daily") or {}
@@ -972,20 +1280,45 @@ def fetch_open_meteo_archive_daily(
     start_date: str,
     end_date: str,
     timezone: str = "Asia/Seoul",
+    daily: str = "shortwave_radiation_sum",
 ):
-    """Open-Meteo Archive API — 과거 일별 일사량(MJ/m²)"""
-    url = "https://archive-api.open-meteo.com/v1/archive"
+    """
+    Open-Meteo Archive API — 과거 일별 일사량(MJ/m²) 등.
+    끝 날짜가 공개 지연(SOLAR_ARCHIVE_LAG_DAYS)보다 이전인 응답만 디스크 캐시에서 만료 없음,
+    끝부분이 비어 있는(null) 응답은 저장하지 않음
+    """
     params = {
-        "latitude": latitude,
-        "longitude": longitude,
+        "latitude": float(latitude),
+        "longitude": float(longitude),
         "start_date": start_date,
         "end_date": end_date,
-        "daily": "shortwave_radiation_sum",
+        "daily": daily,
         "timezone": timezone,
     }
-    r = requests.get(url, params=params, timeout=90)
-    r.raise_for_status()
-    return r.json()
+    try:
+        end = datetime.date.fromisoformat(str(end_date)[:10])
+    except ValueError:
+        end = datetime.date.today()
+    past = end <= datetime.date.today() - datetime.timedelta(days=SOLAR_ARCHIVE_LAG_DAYS)
+    return cached_http_get_json(
+        "archive",
+        OPEN_METEO_ARCHIVE_URL,
+        params,
+        timeout=90,
+        ttl_key="archive_past" if past else "archive_recent",
+        cacheable=_archive_response_complete,
+    )
+
+
+def _archive_response_complete(data: dict) -> bool:
+    """daily 배열의 마지막 값이 모두 채워져 있으면 True (아직 공개 전인 날짜가 null 로 오는 응답 제외)"""
+    daily = (data or {}).get("daily") or {}
+    for key, values in daily.items():
+        if key == "time":
+            continue
+        if not values or values[-1] is None:
+            return False
+    return True
 
 
 def archive_json_to_daily_df(archive_json: dict) -> pd.DataFrame:
@@ -1015,27 +1348,16 @@ def solar_stack_target_years() -> list:
     return solar_baseline_years() + list(SOLAR_ANALYSIS_FOCUS_YEARS)
 
 
-def get_location_year_coverage(df_db: pd.DataFrame, location: str) -> dict:
-    """지점별 연도 → 저장된 일수"""
+def get_location_year_coverage(df_db: pd.DataFrame, location: str, index: dict = None) -> dict:
+    """지점별 연도 → 저장된 일수 (index 를 주면 메타데이터 색인에서 바로 조회)"""
+    if index is not None:
+        return dict((index.get(location) or {}).get("years") or {})
     if df_db is None or df_db.empty or not location:
         return {}
     sub = df_db[df_db["지점"].astype(str) == str(location)]
     if sub.empty:
         return {}
-    out = {}
-    for yr, grp in sub.groupby(sub["날짜"].dt.year):
-        out[int(yr)] = len(grp)
-    return out
-
-
-def extract_local_climatology_df(df_db: pd.DataFrame, location: str, years: list) -> pd.DataFrame:
-    """Solar_DB에서 해당 지점·연도 구간 일사량 추출 (10년 기준용)"""
-    if df_db is None or df_db.empty:
-        return pd.DataFrame(columns=["날짜", "일사량합계", "발전시간"])
-    sub = df_db[df_db["지점"].astype(str) == str(location)].copy()
-    if sub.empty:
-        return pd.DataFrame(columns=["날짜", "일사량합계", "발전시간"])
-    return sub[sub["날짜"].dt.year.isin(years)]
+    return climatology_coverage(solar_climatology_tables(location, sub))
 
 
 def save_single_year_solar_data(
@@ -1057,60 +1379,134 @@ def save_single_year_solar_data(
     return append_solar_location_rows(sh, location, rows, overwrite_dates=True)
 
 
-def build_monthly_climatology(daily_df: pd.DataFrame) -> pd.DataFrame:
-    """일별 데이터 → 월별 평균 일사량"""
-    if daily_df is None or daily_df.empty:
-        return pd.DataFrame(columns=["월", "기후_월평균_일사량"])
-    tmp = daily_df.copy()
-    tmp["월"] = tmp["날짜"].dt.month
-    monthly = (
-        tmp.groupby("월", as_index=False)["일사량합계"]
-        .mean()
-        .rename(columns={"일사량합계": "기후_월평균_일사량"})
-    )
-    monthly["월"] = monthly["월"].astype(int)
-    return monthly.sort_values("월")
+# -------------------------------
+# [성능 개선] 지점별 기후 요약표 (연도 × 월 집계) — 분석 화면은 원본 일별 행 대신 이 작은 표로 계산
+# -------------------------------
+def _solar_year_aggregates(days, gen, rad) -> dict:
+    """
+    1개 연도 일별 배열 → 월별 집계 {"days", "n", "rad", "gen_n", "gen"} (각 12칸, 1~12월).
+    days: datetime64[D] 또는 그 정수값
+    """
+    d = np.asarray(days)
+    if d.dtype.kind != "M":
+        d = d.astype("int64").astype("datetime64[D]")
+    month = d.astype("datetime64[M]").astype("int64") % 12
+    rad = np.asarray(rad, dtype=float)
+    gen = np.asarray(gen, dtype=float)
+    r_ok, g_ok = ~np.isnan(rad), ~np.isnan(gen)
+    return {
+        "days": int(len(d)),
+        "n": np.bincount(month[r_ok], minlength=12).astype(int).tolist(),
+        "rad": np.round(np.bincount(month[r_ok], weights=rad[r_ok], minlength=12), 4).tolist(),
+        "gen_n": np.bincount(month[g_ok], minlength=12).astype(int).tolist(),
+        "gen": np.round(np.bincount(month[g_ok], weights=gen[g_ok], minlength=12), 4).tolist(),
+    }
 
 
-def summarize_yearly_radiation(actual_df: pd.DataFrame, years: list) -> pd.DataFrame:
-    """실측(또는 시트) 데이터의 연도별 일평균·연합계 일사량"""
-    if actual_df is None or actual_df.empty:
-        return pd.DataFrame()
-    tmp = actual_df.copy()
-    tmp["연도"] = tmp["날짜"].dt.year
+def _solar_aggregates_from_frame(loc_df: pd.DataFrame) -> dict:
+    """지점 일별 DataFrame → {연도: 월별 집계} (저장소 미사용 시)"""
+    if loc_df is None or loc_df.empty:
+        return {}
+    df = loc_df.dropna(subset=["날짜"])
+    days = df["날짜"].to_numpy(dtype="datetime64[D]")
+    gen = pd.to_numeric(df.get("발전시간"), errors="coerce").to_numpy(dtype=float)
+    rad = pd.to_numeric(df.get("일사량합계"), errors="coerce").to_numpy(dtype=float)
+    years = df["날짜"].dt.year.to_numpy()
+    return {
+        int(yr): _solar_year_aggregates(days[years == yr], gen[years == yr], rad[years == yr])
+        for yr in np.unique(years)
+    }
+
+
+def solar_climatology_tables(location: str, loc_df: pd.DataFrame = None) -> dict:
+    """
+    지점 기후 요약표 {연도: 월별 집계}.
+    저장소 사용 시 연도 파티션과 함께 manifest 에 저장된 집계를 그대로 씀 (바뀐 연도만 다시 계산됨).
+    예전 manifest 처럼 집계가 없는 연도는 파티션에서 1회 계산 후 저장.
+    """
+    if SOLAR_STORE_ENABLED and location:
+        try:
+            state = _solar_store_state()
+            with state["lock"]:
+                manifest = _load_solar_manifest()
+                entry = manifest["locations"].get(location) or {}
+                if entry.get("years"):
+                    out, dirty = {}, False
+                    for yr, meta in entry["years"].items():
+                        agg = (meta or {}).get("agg")
+                        if agg is None:
+                            arr = _read_solar_partition(_solar_partition_path(location, int(yr)))
+                            if arr is None:
+                                continue
+                            agg = _solar_year_aggregates(arr["d"], arr["gen"], arr["rad"])
+                            meta["agg"] = agg
+                            dirty = True
+                        out[int(yr)] = agg
+                    if dirty:
+                        _save_solar_manifest(manifest)
+                    return out
+        except Exception:
+            pass
+    return _solar_aggregates_from_frame(loc_df)
+
+
+def climatology_coverage(clim: dict) -> dict:
+    """요약표 → {연도: 저장된 일수}"""
+    return {int(yr): int(agg.get("days", 0)) for yr, agg in (clim or {}).items()}
+
+
+def summarize_yearly_radiation(clim: dict, years: list) -> pd.DataFrame:
+    """요약표의 연도별 일평균·연합계 일사량"""
     rows = []
     for yr in years:
-        sub = tmp[tmp["연도"] == yr]
-        if sub.empty:
+        agg = (clim or {}).get(int(yr))
+        if not agg or not agg.get("days"):
             continue
+        n, rad_sum = sum(agg["n"]), sum(agg["rad"])
+        gen_n, gen_sum = sum(agg["gen_n"]), sum(agg["gen"])
         rows.append(
             {
                 "연도": int(yr),
-                "일수": len(sub),
-                "일평균_일사량": round(float(sub["일사량합계"].mean()), 2),
-                "연합계_일사량": round(float(sub["일사량합계"].sum()), 1),
-                "일평균_발전시간": round(float(sub["발전시간"].mean()), 2) if "발전시간" in sub.columns else None,
+                "일수": int(agg["days"]),
+                "일평균_일사량": round(rad_sum / n, 2) if n else None,
+                "연합계_일사량": round(rad_sum, 1),
+                "일평균_발전시간": round(gen_sum / gen_n, 2) if gen_n else None,
             }
         )
     return pd.DataFrame(rows)
 
 
+def build_monthly_climatology(clim: dict, baseline_years: list) -> pd.DataFrame:
+    """기준 연도 월별 평균 일사량 (일별 평균 = 월 합계 / 월 일수)"""
+    n = np.zeros(12)
+    rad = np.zeros(12)
+    for yr in baseline_years:
+        agg = (clim or {}).get(int(yr))
+        if agg:
+            n += np.asarray(agg["n"], dtype=float)
+            rad += np.asarray(agg["rad"], dtype=float)
+    has = n > 0
+    if not has.any():
+        return pd.DataFrame(columns=["월", "기후_월평균_일사량"])
+    return pd.DataFrame({"월": np.arange(1, 13)[has], "기후_월평균_일사량": rad[has] / n[has]})
+
+
 def build_yearly_vs_climatology_table(
-    actual_df: pd.DataFrame,
-    clim_daily_df: pd.DataFrame,
+    clim: dict,
+    baseline_years: list,
     years: list = None,
     baseline_label: str = None,
 ) -> pd.DataFrame:
     """연도별 일평균 일사량 vs 동일 지점 10년 누적 평균 비교표"""
     if years is None:
         years = SOLAR_ANALYSIS_FOCUS_YEARS
-    if clim_daily_df is None or clim_daily_df.empty:
+    base = [(clim or {}).get(int(y)) for y in baseline_years]
+    base = [a for a in base if a and sum(a["n"]) > 0]
+    if not base:
         return pd.DataFrame()
-    climate_daily_mean = float(clim_daily_df["일사량합계"].mean())
-    climate_annual_sum = float(
-        clim_daily_df.groupby(clim_daily_df["날짜"].dt.year)["일사량합계"].sum().mean()
-    )
-    yearly = summarize_yearly_radiation(actual_df, years)
+    climate_daily_mean = sum(sum(a["rad"]) for a in base) / sum(sum(a["n"]) for a in base)
+    climate_annual_sum = float(np.mean([sum(a["rad"]) for a in base]))
+    yearly = summarize_yearly_radiation(clim, years)
     if yearly.empty:
         return pd.DataFrame()
     yearly["기후_10년_일평균"] = round(climate_daily_mean, 2)
@@ -1131,56 +1527,54 @@ def build_yearly_vs_climatology_table(
 
 
 def build_monthly_comparison_df(
-    actual_df: pd.DataFrame,
+    clim: dict,
     clim_monthly_df: pd.DataFrame,
     years: list = None,
 ) -> pd.DataFrame:
     """월별: 10년 기후평균 vs 지정 연도(2024·2025 등) 실측 월평균"""
     if years is None:
         years = SOLAR_ANALYSIS_FOCUS_YEARS
-    if actual_df is None or actual_df.empty or clim_monthly_df is None or clim_monthly_df.empty:
+    if not clim or clim_monthly_df is None or clim_monthly_df.empty:
         return pd.DataFrame()
-    tmp = actual_df.copy()
-    tmp["월"] = tmp["날짜"].dt.month
-    tmp["연도"] = tmp["날짜"].dt.year
     out = clim_monthly_df.copy()
     for yr in years:
-        sub = tmp[tmp["연도"] == yr]
-        if sub.empty:
+        agg = clim.get(int(yr))
+        if not agg:
             continue
-        m = sub.groupby("월", as_index=False)["일사량합계"].mean().rename(
-            columns={"일사량합계": f"{yr}년_월평균"}
-        )
-        out = out.merge(m, on="월", how="left")
+        n = np.asarray(agg["n"], dtype=float)
+        rad = np.asarray(agg["rad"], dtype=float)
+        monthly = np.where(n > 0, rad / np.where(n > 0, n, 1), np.nan)
+        out[f"{yr}년_월평균"] = monthly[out["월"].to_numpy(dtype=int) - 1]
     return out.sort_values("월")
 
 
 def estimate_generation_hours_from_radiation(radiation_mj_m2: float, ref_df: pd.DataFrame = None) -> float:
     """발전시간 추정 — 참조 지점 회귀식 우선, 없으면 PR 0.8"""
-    if ref_df is not None and not ref_df.empty:
-        pred, _, _ = fit_predict_generation_hours(ref_df, radiation_mj_m2)
-        return pred
-    return max(0.0, min(24.0, float((radiation_mj_m2 / 3.6) * 0.8)))
+    model = get_generation_model(ref_df) if ref_df is not None and not ref_df.empty else None
+    return float(predict_generation_hours(model, radiation_mj_m2))
 
 
 def build_solar_db_rows_from_archive(
     location_name: str,
     archive_df: pd.DataFrame,
     ref_df: pd.DataFrame = None,
+    model: Optional[dict] = None,
 ) -> list:
-    """Archive 일사량 → 지역 시트 저장용 행 [날짜, 발전시간, 일사량합계]"""
-    rows = []
-    for _, r in archive_df.iterrows():
-        rad = float(r["일사량합계"])
-        gen_h = estimate_generation_hours_from_radiation(rad, ref_df)
-        rows.append(
-            [
-                pd.Timestamp(r["날짜"]).strftime("%Y-%m-%d"),
-                round(gen_h, 2),
-                round(rad, 2),
-            ]
-        )
-    return rows
+    """
+    Archive 일사량 → 지역 시트 저장용 행 [날짜, 발전시간, 일사량합계] (참조 모델 1회 적합 후 일괄 예측).
+    model 을 주면 그 모델을 그대로 사용 (여러 구간을 같은 모델로 채울 때)
+    """
+    if archive_df is None or archive_df.empty:
+        return []
+    if model is None and ref_df is not None and not ref_df.empty:
+        model = get_generation_model(ref_df)
+    rad = archive_df["일사량합계"].to_numpy(dtype=float)
+    gen_h = predict_generation_hours(model, rad)
+    dates = pd.to_datetime(archive_df["날짜"]).dt.strftime("%Y-%m-%d")
+    return [
+        [d, round(float(g), 2), round(float(r), 2)]
+        for d, g, r in zip(dates, gen_h, rad)
+    ]
 
 
 def _normalize_solar_location_row(row: list) -> list:
@@ -1194,41 +1588,66 @@ def _normalize_solar_location_row(row: list) -> list:
     return []
 
 
+@st.cache_resource
+def _solar_sheet_write_locks():
+    return {"guard": threading.Lock(), "locks": {}}
+
+
+def _solar_sheet_write_lock(location: str) -> threading.RLock:
+    """지점 시트 쓰기 잠금 — 읽기·병합·전체 쓰기 사이에 다른 저장이 끼어들어 행이 사라지지 않도록"""
+    reg = _solar_sheet_write_locks()
+    with reg["guard"]:
+        return reg["locks"].setdefault(location, threading.RLock())
+
+
 def append_solar_location_rows(
     sh,
     location: str,
     rows: list,
     overwrite_dates: bool = True,
+    only_new_dates: bool = False,
 ) -> int:
-    """지역별 전용 시트(Solar_지점명)에 일괄 저장"""
+    """
+    지역별 전용 시트(Solar_지점명)에 일괄 저장 (지점별 쓰기 잠금 안에서 읽기→병합→쓰기).
+    only_new_dates=True 면 시트에 이미 있는 날짜는 건너뜀 (자동 채우기용)
+    """
     loc = str(location or "").strip()
     norm_rows = [_normalize_solar_location_row(r) for r in rows]
     norm_rows = [r for r in norm_rows if r and r[0]]
     if not loc or not norm_rows:
         return 0
 
-    ws = get_or_create_solar_location_worksheet(sh, loc)
-    sheet_title = solar_sheet_title(loc)
-    existing = safe_api_call(ws.get_all_values)
-    header = existing[0] if existing else SOLAR_LOCATION_COLUMNS
-    if header[:3] != SOLAR_LOCATION_COLUMNS:
-        header = SOLAR_LOCATION_COLUMNS
-
-    upload_dates = {str(r[0])[:10] for r in norm_rows}
-    merged = [header]
-    if existing and len(existing) > 1:
-        for row in existing[1:]:
-            if not row:
-                continue
-            d = str(row[0]).strip()[:10]
-            if overwrite_dates and d in upload_dates:
-                continue
-            merged.append(row[:3] if len(row) >= 3 else row)
-    merged.extend(norm_rows)
-    _ensure_worksheet_capacity(ws, len(merged))
-    _sheet_batch_update(ws, merged, value_input_option="USER_ENTERED")
+    with _solar_sheet_write_lock(loc):
+        ws = get_or_create_solar_location_worksheet(sh, loc)
+        sheet_title = solar_sheet_title(loc)
+        existing = safe_api_call(ws.get_all_values)
+        header = existing[0] if existing else SOLAR_LOCATION_COLUMNS
+        if header[:3] != SOLAR_LOCATION_COLUMNS:
+            header = SOLAR_LOCATION_COLUMNS
+
+        if only_new_dates and existing and len(existing) > 1:
+            have = {str(row[0]).strip()[:10] for row in existing[1:] if row}
+            norm_rows = [r for r in norm_rows if str(r[0])[:10] not in have]
+            if not norm_rows:
+                return 0
+
+        upload_dates = {str(r[0])[:10] for r in norm_rows}
+        merged = [header]
+        if existing and len(existing) > 1:
+            for row in existing[1:]:
+                if not row:
+                    continue
+                d = str(row[0]).strip()[:10]
+                if overwrite_dates and d in upload_dates:
+                    continue
+                merged.append(row[:3] if len(row) >= 3 else row)
+        merged.extend(norm_rows)
+        _ensure_worksheet_capacity(ws, len(merged))
+        _sheet_batch_update(ws, merged, value_input_option="USER_ENTERED")
+        write_through_solar_store(loc, merged)
     cached_get_all_records.clear()
     cached_get_all_values.clear()
+    invalidate_solar_sheets_fallback()
     clear_file_cache(sheet_title)
     clear_file_cache(SOLAR_LEGACY_SHEET)
     return len(norm_rows)
@@ -1291,6 +1710,71 @@ def migrate_legacy_solar_db_to_location_sheets(sh) -> dict:
     return result
 
 
+def build_monthly_climatology_figure(monthly_cmp: pd.DataFrame, sel_loc: str, baseline_label: str, compare_years: list) -> go.Figure:
+    """월별 일평균 일사량: 10년 월평균(점선) vs 비교 연도(막대)"""
+    fig_m = go.Figure()
+    fig_m.add_trace(
+        go.Scatter(
+            x=monthly_cmp["월"],
+            y=monthly_cmp["기후_월평균_일사량"],
+            mode="lines+markers",
+            name=f"{sel_loc} 10년 월평균 ({baseline_label})",
+            line=dict(color="#ef5350", width=3, dash="dash"),
+        )
+    )
+    palette = ["#1976d2", "#66bb6a", "#ffa726"]
+    for i, yr in enumerate(compare_years):
+        col_name = f"{yr}년_월평균"
+        if col_name in monthly_cmp.columns:
+            fig_m.add_trace(
+                go.Bar(
+                    x=monthly_cmp["월"],
+                    y=monthly_cmp[col_name],
+                    name=f"{yr}년",
+                    marker_color=palette[i % len(palette)],
+                    opacity=0.85,
+                )
+            )
+    fig_m.update_layout(
+        title=f"[{sel_loc}] 월별 일평균 일사량 — 10년 평균 vs 2024·2025",
+        xaxis_title="월",
+        yaxis_title="월평균 일사량 (MJ/m²)",
+        barmode="group",
+        height=420,
+        legend=dict(orientation="h", yanchor="bottom", y=1.02),
+    )
+    return fig_m
+
+
+def build_yearly_climatology_figure(yearly_tbl: pd.DataFrame, sel_loc: str, ref_annual: float) -> go.Figure:
+    """연간일사량 합계 막대 + 10년 연평균합계 기준선"""
+    fig_year = go.Figure()
+    fig_year.add_trace(
+        go.Bar(
+            x=[f"{int(y)}년" for y in yearly_tbl["연도"]],
+            y=yearly_tbl["연합계_일사량"],
+            name="연간합계",
+            marker_color=["#1976d2", "#42a5f5"][: len(yearly_tbl)],
+            text=yearly_tbl["연합계_편차(%)"].apply(lambda v: f"{float(v):+.1f}%"),
+            textposition="outside",
+        )
+    )
+    fig_year.add_hline(
+        y=ref_annual,
+        line_dash="dash",
+        line_color="#ef5350",
+        annotation_text=f"10년 연평균합계 {ref_annual:,.0f} MJ/m²",
+        annotation_position="top right",
+    )
+    fig_year.update_layout(
+        title=f"[{sel_loc}] 연간일사량 합계 vs 10년 평균",
+        yaxis_title="연간 일사량 합계 (MJ/m²)",
+        height=380,
+        showlegend=False,
+    )
+    return fig_year
+
+
 def render_solar_climatology_analysis(sel_loc: str, f_df: pd.DataFrame, df_db: pd.DataFrame):
     """연간일사량 합계 vs 해당 도시 10년 누적 평균 (2024·2025, % 표기)"""
     st.subheader("📈 10년 평균 대비 분석 (2024·2025)")
@@ -1302,8 +1786,9 @@ def render_solar_climatology_analysis(sel_loc: str, f_df: pd.DataFrame, df_db: p
         "10년 기준 데이터가 부족하면 아래 **연도별 데이터 쌓기**에서 1년씩 저장하세요."
     )
 
-    loc_all = df_db[df_db["지점"] == sel_loc].copy() if df_db is not None and not df_db.empty else f_df.copy()
-    coverage = get_location_year_coverage(df_db, sel_loc) if df_db is not None and not df_db.empty else {}
+    loc_all = df_db[df_db["지점"] == sel_loc] if df_db is not None and not df_db.empty else None
+    clim = solar_climatology_tables(sel_loc, loc_all)
+    coverage = climatology_coverage(clim)
     missing_baseline = [y for y in baseline_years if coverage.get(y, 0) < 300]
     present_baseline = [y for y in baseline_years if coverage.get(y, 0) >= 300]
 
@@ -1316,8 +1801,8 @@ def render_solar_climatology_analysis(sel_loc: str, f_df: pd.DataFrame, df_db: p
     if present_baseline:
         st.caption(f"✅ 기준 연도 적재 현황: {', '.join(str(y) for y in present_baseline)}년 ({len(present_baseline)}/{len(baseline_years)})")
 
-    clim_daily = extract_local_climatology_df(df_db, sel_loc, baseline_years)
-    if clim_daily.empty:
+    clim_monthly = build_monthly_climatology(clim, baseline_years)
+    if clim_monthly.empty:
         st.info(f"`{sel_loc}`의 10년 기준({baseline_label}) 데이터가 없습니다. 먼저 연도별로 데이터를 쌓아 주세요.")
         return
     if len(present_baseline) < SOLAR_CLIMATOLOGY_YEARS:
@@ -1326,16 +1811,11 @@ def render_solar_climatology_analysis(sel_loc: str, f_df: pd.DataFrame, df_db: p
             f"(목표 {SOLAR_CLIMATOLOGY_YEARS}년). 나머지 연도를 쌓으면 더 정확해집니다."
         )
 
-    if loc_all.empty:
-        compare_years = []
-    else:
-        compare_years = [y for y in SOLAR_ANALYSIS_FOCUS_YEARS if y in loc_all["날짜"].dt.year.unique()]
-        if not compare_years:
-            yrs = sorted(loc_all["날짜"].dt.year.unique().tolist())
-            compare_years = yrs[-2:] if yrs else []
+    stored_years = sorted(y for y, n in coverage.items() if n > 0)
+    compare_years = [y for y in SOLAR_ANALYSIS_FOCUS_YEARS if y in stored_years] or stored_years[-2:]
 
     yearly_tbl = build_yearly_vs_climatology_table(
-        loc_all, clim_daily, compare_years, baseline_label=f"{sel_loc} {baseline_label}"
+        clim, baseline_years, compare_years, baseline_label=f"{sel_loc} {baseline_label}"
     )
 
     if yearly_tbl.empty:
@@ -1368,71 +1848,27 @@ def render_solar_climatology_analysis(sel_loc: str, f_df: pd.DataFrame, df_db: p
             )
             st.dataframe(summary_tbl, use_container_width=True, hide_index=True)
 
-        clim_monthly = build_monthly_climatology(clim_daily)
-        monthly_cmp = build_monthly_comparison_df(loc_all, clim_monthly, compare_years)
+        monthly_cmp = build_monthly_comparison_df(clim, clim_monthly, compare_years)
         if not monthly_cmp.empty:
             st.markdown("##### 📅 월별 일사량 비교 (막대)")
-            fig_m = go.Figure()
-            fig_m.add_trace(
-                go.Scatter(
-                    x=monthly_cmp["월"],
-                    y=monthly_cmp["기후_월평균_일사량"],
-                    mode="lines+markers",
-                    name=f"{sel_loc} 10년 월평균 ({baseline_label})",
-                    line=dict(color="#ef5350", width=3, dash="dash"),
-                )
-            )
-            palette = ["#1976d2", "#66bb6a", "#ffa726"]
-            for i, yr in enumerate(compare_years):
-                col_name = f"{yr}년_월평균"
-                if col_name in monthly_cmp.columns:
-                    fig_m.add_trace(
-                        go.Bar(
-                            x=monthly_cmp["월"],
-                            y=monthly_cmp[col_name],
-                            name=f"{yr}년",
-                            marker_color=palette[i % len(palette)],
-                            opacity=0.85,
-                        )
-                    )
-            fig_m.update_layout(
-                title=f"[{sel_loc}] 월별 일평균 일사량 — 10년 평균 vs 2024·2025",
-                xaxis_title="월",
-                yaxis_title="월평균 일사량 (MJ/m²)",
-                barmode="group",
-                height=420,
-                legend=dict(orientation="h", yanchor="bottom", y=1.02),
+            fig_m = get_or_build_figure(
+                "solar_monthly_clim",
+                frame_signature(monthly_cmp),
+                {"loc": sel_loc, "baseline": baseline_label, "years": compare_years},
+                lambda: build_monthly_climatology_figure(monthly_cmp, sel_loc, baseline_label, compare_years),
             )
             st.plotly_chart(fig_m, use_container_width=True)
 
         with st.expander("📈 연간합계 막대 차트", expanded=False):
-            fig_year = go.Figure()
-            fig_year.add_trace(
-                go.Bar(
-                    x=[f"{int(y)}년" for y in yearly_tbl["연도"]],
-                    y=yearly_tbl["연합계_일사량"],
-                    name="연간합계",
-                    marker_color=["#1976d2", "#42a5f5"][: len(yearly_tbl)],
-                    text=yearly_tbl["연합계_편차(%)"].apply(lambda v: f"{float(v):+.1f}%"),
-                    textposition="outside",
-                )
-            )
-            fig_year.add_hline(
-                y=ref_annual,
-                line_dash="dash",
-                line_color="#ef5350",
-                annotation_text=f"10년 연평균합계 {ref_annual:,.0f} MJ/m²",
-                annotation_position="top right",
-            )
-            fig_year.update_layout(
-                title=f"[{sel_loc}] 연간일사량 합계 vs 10년 평균",
-                yaxis_title="연간 일사량 합계 (MJ/m²)",
-                height=380,
-                showlegend=False,
+            fig_year = get_or_build_figure(
+                "solar_yearly_clim",
+                frame_signature(yearly_tbl),
+                {"loc": sel_loc},
+                lambda: build_yearly_climatology_figure(yearly_tbl, sel_loc, ref_annual),
             )
             st.plotly_chart(fig_year, use_container_width=True)
 
-        baseline_annual = summarize_yearly_radiation(clim_daily, baseline_years)
+        baseline_annual = summarize_yearly_radiation(clim, baseline_years)
         if not baseline_annual.empty:
             with st.expander(f"📎 10년 기준({baseline_label}) 연도별 합계 참고", expanded=False):
                 ref_tbl = baseline_annual[["연도", "일수", "연합계_일사량"]].rename(
@@ -1441,50 +1877,692 @@ def render_solar_climatology_analysis(sel_loc: str, f_df: pd.DataFrame, df_db: p
                 st.dataframe(ref_tbl, use_container_width=True, hide_index=True)
 
 
-def render_solar_yearly_data_builder(sh, df_db: pd.DataFrame):
-    """지역별 10년+비교연도 데이터를 1년씩 쌓기 → Solar_지점명 시트 저장"""
-    st.subheader("🏗️ 연도별 데이터 쌓기 (1년씩)")
-    st.caption(
-        "선택한 도시의 **10년 기준(2014~2023) + 비교 연도(2024·2025)** 데이터를 "
-        "**1년에 1번** 저장합니다. Open-Meteo 일사량 + 발전시간 추정값이 들어갑니다. "
-        "실측 발전시간이 있으면 시트에서 수정하세요."
-    )
-    preset_locs = sorted(set(list(GEO_FALLBACK_COORDS.keys()) + ["여주"]))
-    db_locs = list_solar_locations(sh, df_db)
-    all_locs = sorted(set(preset_locs + db_locs))
-    new_loc = st.selectbox(
-        "도시(지점) 선택",
-        all_locs,
-        index=all_locs.index("여주") if "여주" in all_locs else 0,
-        key="solar_new_loc_builder",
-    )
+# -------------------------------
+# [분석] P50/P75/P90 초과확률 (지점별 연간·월별, 부트스트랩 신뢰구간)
+# -------------------------------
+EXCEEDANCE_LEVELS = (50, 75, 90)  # Pxx = 해당 값 이상일 확률 xx%
+EXCEEDANCE_BOOTSTRAP = int(os.environ.get("PMS_EXCEEDANCE_BOOTSTRAP", "1000"))
+EXCEEDANCE_CI = (5.0, 95.0)  # 부트스트랩 90% 신뢰구간
+EXCEEDANCE_MIN_YEARS = 3
+EXCEEDANCE_MIN_MONTH_DAYS = 20  # 월별 계산에 쓸 최소 일수
+
+
+def _masked_quantiles(values: np.ndarray, counts: np.ndarray, qs: np.ndarray) -> np.ndarray:
+    """
+    values (..., K): 앞쪽 counts 개만 유효(나머지 NaN). 정렬 후 선형보간 분위수를 한 번에 계산.
+    반환 (..., len(qs)), 유효값 없으면 NaN
+    """
+    v = np.sort(values, axis=-1)  # NaN 은 뒤로
+    n = counts[..., None].astype(float)
+    pos = np.clip(qs * (n - 1.0), 0.0, None)
+    lo = np.floor(pos).astype(int)
+    hi = np.minimum(lo + 1, np.maximum(n.astype(int) - 1, 0))
+    frac = pos - lo
+    lo_v = np.take_along_axis(v, lo, axis=-1)
+    hi_v = np.take_along_axis(v, hi, axis=-1)
+    out = lo_v + (hi_v - lo_v) * frac
+    return np.where(n > 0, out, np.nan)
+
+
+def bootstrap_exceedance(values: np.ndarray, levels=EXCEEDANCE_LEVELS, n_boot: int = None, seed: int = 0) -> dict:
+    """
+    values (S, K): 계열별 연도 값 (NaN = 없음). 모든 계열을 한 번에 부트스트랩.
+    반환: {"est": (S, L), "lo": (S, L), "hi": (S, L), "n": (S,)}
+    """
+    n_boot = int(n_boot or EXCEEDANCE_BOOTSTRAP)
+    vals = np.asarray(values, dtype=float)
+    # 유효값을 앞으로 모음
+    order = np.argsort(np.isnan(vals), axis=1, kind="stable")
+    vals = np.take_along_axis(vals, order, axis=1)
+    n = (~np.isnan(vals)).sum(axis=1)
+    S, K = vals.shape
+    qs = 1.0 - np.asarray(levels, dtype=float) / 100.0
+    est = _masked_quantiles(vals, n, qs)
+    if K == 0 or S == 0:
+        empty = np.full((S, len(qs)), np.nan)
+        return {"est": empty, "lo": empty, "hi": empty, "n": n}
+    rng = np.random.default_rng(seed)
+    # 계열별 자기 연도 수만큼 복원추출 (K 칸 중 n 이후는 NaN 처리)
+    idx = np.floor(rng.random((S, n_boot, K)) * np.maximum(n, 1)[:, None, None]).astype(int)
+    samples = vals[np.arange(S)[:, None, None], idx]
+    samples = np.where(np.arange(K)[None, None, :] < n[:, None, None], samples, np.nan)
+    boot = _masked_quantiles(samples, np.broadcast_to(n[:, None], (S, n_boot)), qs)  # (S, B, L)
+    lo = np.percentile(boot, EXCEEDANCE_CI[0], axis=1)
+    hi = np.percentile(boot, EXCEEDANCE_CI[1], axis=1)
+    return {"est": est, "lo": lo, "hi": hi, "n": n}
+
+
+def _exceedance_matrices(clim_by_loc: dict) -> dict:
+    """
+    지점별 기후 요약표 → 지표별 (지점, 연도) 행렬. 올해는 제외.
+    연간: 일평균 × 365 (일수 SOLAR_BACKFILL_MIN_DAYS 이상 연도), 월별: 월 일평균 (일수 EXCEEDANCE_MIN_MONTH_DAYS 이상)
+    """
+    locs = sorted(clim_by_loc)
+    this_year = datetime.date.today().year
+    years = sorted({int(y) for c in clim_by_loc.values() for y in c if int(y) < this_year})
+    S, K = len(locs), len(years)
+    out = {"locations": locs, "years": years}
+    for key, n_key, s_key in (("일사량", "n", "rad"), ("발전시간", "gen_n", "gen")):
+        n = np.zeros((S, 12, K))
+        tot = np.zeros((S, 12, K))
+        days = np.zeros((S, K))
+        for i, loc in enumerate(locs):
+            for j, yr in enumerate(years):
+                agg = clim_by_loc[loc].get(yr)
+                if agg:
+                    n[i, :, j] = agg[n_key]
+                    tot[i, :, j] = agg[s_key]
+                    days[i, j] = agg.get("days", 0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            annual = tot.sum(axis=1) / n.sum(axis=1) * 365.0
+            monthly = tot / n
+        annual[days < SOLAR_BACKFILL_MIN_DAYS] = np.nan
+        monthly[n < EXCEEDANCE_MIN_MONTH_DAYS] = np.nan
+        out[key] = {"annual": annual, "monthly": monthly}
+    return out
+
+
+def compute_solar_exceedance(clim_by_loc: dict, n_boot: int = None) -> pd.DataFrame:
+    """
+    전 지점 P50/P75/P90 (연간 합계·월 일평균, 일사량·발전시간) + 부트스트랩 신뢰구간.
+    반환 컬럼: 지점 | 지표 | 기간 | 연도수 | P50 | P50_하한 | P50_상한 | P75 ... | P90 ...
+    """
+    if not clim_by_loc:
+        return pd.DataFrame()
+    mats = _exceedance_matrices(clim_by_loc)
+    locs = mats["locations"]
+    frames = []
+    for metric in ("일사량", "발전시간"):
+        annual, monthly = mats[metric]["annual"], mats[metric]["monthly"]
+        # 연간(S 계열) + 월별(S×12 계열)을 한 번에 부트스트랩
+        series = np.concatenate([annual, monthly.reshape(-1, monthly.shape[-1])], axis=0)
+        res = bootstrap_exceedance(series, n_boot=n_boot)
+        periods = ["연간"] * len(locs) + [f"{m}월" for _ in locs for m in range(1, 13)]
+        loc_col = list(locs) + [loc for loc in locs for _ in range(12)]
+        df = pd.DataFrame({"지점": loc_col, "지표": metric, "기간": periods, "연도수": res["n"]})
+        for li, lv in enumerate(EXCEEDANCE_LEVELS):
+            df[f"P{lv}"] = res["est"][:, li]
+            df[f"P{lv}_하한"] = res["lo"][:, li]
+            df[f"P{lv}_상한"] = res["hi"][:, li]
+        frames.append(df)
+    out = pd.concat(frames, ignore_index=True)
+    out = out[out["연도수"] >= EXCEEDANCE_MIN_YEARS]
+    num_cols = [c for c in out.columns if c.startswith("P")]
+    out[num_cols] = out[num_cols].round(2)
+    return out.reset_index(drop=True)
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _cached_solar_exceedance(data_version: str, locations: tuple, n_boot: int, _hist: pd.DataFrame = None) -> pd.DataFrame:
+    """요약표는 캐시가 없을 때만 만듦 (저장소: manifest 집계, 미사용: 통합 이력을 지점별로 나눠 1회 집계)"""
+    clim_by_loc = {}
+    if _hist is None:
+        for loc in locations:
+            clim = solar_climatology_tables(loc)
+            if clim:
+                clim_by_loc[loc] = clim
+    elif not _hist.empty:
+        wanted = set(locations)
+        for loc, g in _hist.groupby(_hist["지점"].astype(str), sort=True):
+            if loc in wanted:
+                clim = solar_climatology_tables(loc, g)
+                if clim:
+                    clim_by_loc[loc] = clim
+    return compute_solar_exceedance(clim_by_loc, n_boot=n_boot)
+
+
+def get_solar_exceedance(sh, locations: list) -> pd.DataFrame:
+    """
+    데이터 버전별로 1회만 계산.
+    저장소 사용 시 버전 = manifest 의 지점·연도별 파티션 해시 (요약표를 매번 직렬화하지 않음)
+    """
+    locations = tuple(sorted({str(x) for x in (locations or [])}))
+    if SOLAR_STORE_ENABLED:
+        manifest = _load_solar_manifest()
+        parts = {
+            loc: sorted(
+                (yr, (meta or {}).get("hash"))
+                for yr, meta in ((manifest["locations"].get(loc) or {}).get("years") or {}).items()
+            )
+            for loc in locations
+        }
+        version = hashlib.md5(json.dumps(parts, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+        return _cached_solar_exceedance(version, locations, EXCEEDANCE_BOOTSTRAP)
+    hist = load_solar_db_df(sh)
+    version = frame_signature(hist[[c for c in SOLAR_UNIFIED_COLUMNS if c in hist.columns]])
+    return _cached_solar_exceedance(version, locations, EXCEEDANCE_BOOTSTRAP, hist)
+
 
+def render_solar_exceedance(sh, sel_loc: str, locations: list) -> None:
+    """선택 지점 P50/P75/P90 표 + 전 지점 연간 비교"""
+    if not st.toggle("초과확률 계산", key="solar_exceedance_on"):
+        return
+    try:
+        exc = get_solar_exceedance(sh, locations)
+    except Exception as e:
+        st.warning(f"초과확률을 계산하지 못했습니다: {e}")
+        return
+    if exc.empty:
+        st.info(f"초과확률 계산에는 지점별로 완전한 연도가 {EXCEEDANCE_MIN_YEARS}년 이상 필요합니다. 연도별 데이터를 더 쌓아 주세요.")
+        return
     st.caption(
-        f"저장 위치: 구글 시트 **`{SOLAR_SHEET_PREFIX}지점명`** (예: `{solar_sheet_title('여주')}`) — 지역마다 시트 분리"
+        "Pxx = 해당 값 이상일 확률 xx% · 연간은 일평균×365 · 괄호는 연도 복원추출 "
+        f"{EXCEEDANCE_BOOTSTRAP}회 부트스트랩 {int(EXCEEDANCE_CI[1] - EXCEEDANCE_CI[0])}% 신뢰구간"
     )
 
-    with st.expander("🔄 기존 Solar_DB → 지역별 시트로 분리", expanded=False):
-        st.caption(
-            "통합 `Solar_DB` 시트가 **6000행 한도**에 걸렸을 때 사용합니다. "
-            "지점별로 `Solar_부산`, `Solar_여주` … 시트를 만들고 데이터를 옮깁니다. (기존 Solar_DB는 그대로 둡니다.)"
-        )
-        if st.button("지역별 시트로 마이그레이션", key="solar_migrate_legacy", use_container_width=True):
-            with st.spinner("Solar_DB 분리 중…"):
-                mig = migrate_legacy_solar_db_to_location_sheets(sh)
-            if mig.get("error"):
-                st.error(f"마이그레이션 오류: {mig['error']}")
-            elif mig["locations"] == 0:
-                st.info("옮길 데이터가 없거나 Solar_DB가 비어 있습니다.")
-            else:
-                st.success(
-                    f"**{mig['locations']}개** 지역, **{mig['rows']}행**을 지역별 시트로 옮겼습니다. 페이지를 새로고침하세요."
-                )
-                time.sleep(1)
-                st.rerun()
+    def _fmt(df):
+        view = df[["기간", "연도수"]].copy()
+        for lv in EXCEEDANCE_LEVELS:
+            view[f"P{lv}"] = [
+                f"{v:,.2f} ({lo:,.2f}~{hi:,.2f})"
+                for v, lo, hi in zip(df[f"P{lv}"], df[f"P{lv}_하한"], df[f"P{lv}_상한"])
+            ]
+        return view
 
-    target_years = solar_stack_target_years()
-    baseline_years = solar_baseline_years()
-    coverage = get_location_year_coverage(df_db, new_loc) if df_db is not None and not df_db.empty else {}
+    mine = exc[exc["지점"] == sel_loc]
+    if mine.empty:
+        st.info(f"`{sel_loc}` 지점은 완전한 연도가 부족해 초과확률을 계산하지 않았습니다.")
+    else:
+        c1, c2 = st.columns(2)
+        with c1:
+            st.markdown("##### ☀️ 일사량 (연간 MJ/m², 월 MJ/m²/일)")
+            st.dataframe(_fmt(mine[mine["지표"] == "일사량"]), use_container_width=True, hide_index=True)
+        with c2:
+            st.markdown("##### ⚡ 발전시간 (연간 h, 월 h/일)")
+            st.dataframe(_fmt(mine[mine["지표"] == "발전시간"]), use_container_width=True, hide_index=True)
+
+    annual = exc[exc["기간"] == "연간"]
+    if annual["지점"].nunique() > 1:
+        st.markdown("##### 🗺️ 전 지점 연간 P50 / P90")
+        cmp_tbl = annual.pivot_table(index="지점", columns="지표", values=["P50", "P90"], aggfunc="first")
+        cmp_tbl.columns = [f"{metric}_{p}" for p, metric in cmp_tbl.columns]
+        st.dataframe(cmp_tbl.round(1), use_container_width=True)
+
+
+# -------------------------------
+# [백필] 여러 지점·연도 누락분 일괄 적재 (연속 연도는 한 번에 조회, 지점별 1회 저장, 이어하기)
+# -------------------------------
+SOLAR_BACKFILL_WORKERS = int(os.environ.get("PMS_BACKFILL_WORKERS", "3"))  # Open-Meteo 동시 요청 수
+SOLAR_BACKFILL_STATE = CACHE_DIR / "solar_backfill_state.json"
+SOLAR_BACKFILL_MIN_DAYS = 300  # 연도별 적재 일수가 이보다 적으면 누락으로 간주
+SOLAR_ARCHIVE_LAG_DAYS = 5  # Archive API 는 최근 며칠 데이터가 없음
+
+
+def _contiguous_year_ranges(years: list) -> list:
+    """[2014, 2015, 2016, 2019] → [(2014, 2016), (2019, 2019)]"""
+    ranges = []
+    for y in sorted(set(int(v) for v in years)):
+        if ranges and y == ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], y)
+        else:
+            ranges.append((y, y))
+    return ranges
+
+
+def plan_solar_backfill(locations: list, years: list, df_db: pd.DataFrame = None, index: dict = None) -> list:
+    """
+    적재 현황에서 누락된 (지점, 연도) 쌍을 찾아 지점별 연속 구간으로 묶음.
+    반환: [{"location", "years": [...], "ranges": [(시작연도, 끝연도), ...]}]
+    """
+    this_year = datetime.date.today().year
+    plan = []
+    for loc in locations or []:
+        coverage = get_location_year_coverage(df_db, loc, index)
+        missing = [int(y) for y in years if int(y) <= this_year and coverage.get(int(y), 0) < SOLAR_BACKFILL_MIN_DAYS]
+        if missing:
+            plan.append({"location": loc, "years": missing, "ranges": _contiguous_year_ranges(missing)})
+    return plan
+
+
+def _load_backfill_state() -> dict:
+    loaded = _load_file_cache(SOLAR_BACKFILL_STATE, 30 * 24 * 3600)
+    return loaded if isinstance(loaded, dict) else {}
+
+
+def _save_backfill_state(state: dict) -> None:
+    state["updated_at"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    _save_file_cache(SOLAR_BACKFILL_STATE, state)
+
+
+def pending_solar_backfill() -> list:
+    """중단된 백필 작업의 남은 계획 (완료 지점·연도 제외)"""
+    state = _load_backfill_state()
+    done = {loc: set(ys) for loc, ys in (state.get("done") or {}).items()}
+    remaining = []
+    for item in state.get("plan") or []:
+        years = [y for y in item.get("years", []) if y not in done.get(item.get("location"), set())]
+        if years:
+            remaining.append({"location": item["location"], "years": years, "ranges": _contiguous_year_ranges(years)})
+    return remaining
+
+
+def _fetch_backfill_range(lat: float, lon: float, y0: int, y1: int) -> pd.DataFrame:
+    end = min(datetime.date(int(y1), 12, 31), datetime.date.today() - datetime.timedelta(days=SOLAR_ARCHIVE_LAG_DAYS))
+    start = datetime.date(int(y0), 1, 1)
+    if end < start:
+        return pd.DataFrame(columns=["날짜", "일사량합계"])
+    archive = fetch_open_meteo_archive_daily(lat, lon, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))
+    return archive_json_to_daily_df(archive)
+
+
+def run_solar_backfill(sh, plan: list, ref_df: pd.DataFrame = None, progress_cb=None, max_workers: int = None, resume: bool = False) -> dict:
+    """
+    백필 계획 실행: 지점·연속 구간별 Archive 조회는 제한된 스레드 풀로 동시에,
+    한 지점의 구간이 모두 도착하면 그 지점 시트에 1회만 저장. 지점 저장마다 진행 상태를 파일에 기록(이어하기).
+    반환: {"locations": 저장 지점 수, "rows": 저장 행 수, "failed": {지점: 사유}}
+    """
+    result = {"locations": 0, "rows": 0, "failed": {}}
+    if not plan:
+        return result
+    state = _load_backfill_state() if resume else {}
+    if not state.get("plan"):
+        state = {"plan": plan, "done": {}, "started_at": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+    state.setdefault("done", {})
+    _save_backfill_state(state)
+
+    coords = {}
+    for item in plan:
+        lat, lon, _ = get_location_lat_lon(item["location"])
+        if lat is None:
+            result["failed"][item["location"]] = "좌표 없음"
+        else:
+            coords[item["location"]] = (lat, lon)
+
+    jobs = [(item["location"], y0, y1) for item in plan if item["location"] in coords for (y0, y1) in item["ranges"]]
+    remaining = collections.Counter(loc for loc, _, _ in jobs)
+    frames = collections.defaultdict(list)
+    model = get_generation_model(ref_df) if ref_df is not None and not ref_df.empty else None
+    years_by_loc = {item["location"]: item["years"] for item in plan}
+    total = len(jobs)
+    done = 0
+
+    workers = min(max(1, total), max_workers or SOLAR_BACKFILL_WORKERS)
+    with _bounded_thread_pool(workers, name_prefix="solar-backfill") as pool:
+        futures = {
+            pool.submit(_fetch_backfill_range, coords[loc][0], coords[loc][1], y0, y1): (loc, y0, y1)
+            for loc, y0, y1 in jobs
+        }
+        for fut in concurrent.futures.as_completed(futures):
+            loc, y0, y1 = futures[fut]
+            try:
+                frames[loc].append(fut.result())
+            except Exception as e:
+                result["failed"][loc] = f"{y0}~{y1}년 조회 실패: {e}"
+            done += 1
+            remaining[loc] -= 1
+            if progress_cb is not None:
+                progress_cb(done, total, f"{loc} {y0}~{y1}")
+            if remaining[loc] > 0 or loc in result["failed"]:
+                continue
+            archive_df = pd.concat([f for f in frames.pop(loc, []) if not f.empty] or [pd.DataFrame(columns=["날짜", "일사량합계"])], ignore_index=True)
+            if archive_df.empty:
+                result["failed"][loc] = "조회 결과 없음"
+                continue
+            rows = build_solar_db_rows_from_archive(loc, archive_df, model=model)
+            try:
+                result["rows"] += append_solar_location_rows(sh, loc, rows, overwrite_dates=True)
+                result["locations"] += 1
+                state["done"][loc] = sorted(set(state["done"].get(loc, [])) | set(years_by_loc.get(loc, [])))
+                _save_backfill_state(state)
+            except Exception as e:
+                result["failed"][loc] = f"시트 저장 실패: {e}"
+    state["failed"] = result["failed"]
+    _save_backfill_state(state)
+    return result
+
+
+# -------------------------------
+# [백필] 누락 날짜 구간 색인 + 백그라운드 자동 채우기 (하루 요청 예산 안에서, 낮은 우선순위)
+# -------------------------------
+SOLAR_GAP_BACKFILL_ENABLED = os.environ.get("PMS_GAP_BACKFILL", "false").strip().lower() in ("1", "true", "yes", "on")  # 명시적으로 켤 때만
+SOLAR_GAP_BACKFILL_BUDGET = int(os.environ.get("PMS_GAP_BACKFILL_BUDGET", "20"))  # 하루 Archive 요청 수
+SOLAR_GAP_BACKFILL_INTERVAL = int(os.environ.get("PMS_GAP_BACKFILL_INTERVAL", "1800"))  # 초. 다음 점검까지 대기
+SOLAR_GAP_BACKFILL_PAUSE = 5.0  # 요청 사이 쉬는 시간(초)
+SOLAR_GAP_STATE = CACHE_DIR / "solar_gap_backfill_state.json"
+logger = logging.getLogger("pms.solar")
+
+
+def _missing_day_ranges(days, year: int) -> list:
+    """연도 안에서 저장되지 않은 날짜의 연속 구간 [[시작, 끝], ...] (ISO 문자열, 12/31 까지)"""
+    y0 = np.datetime64(f"{int(year):04d}-01-01", "D").astype("int64")
+    y1 = np.datetime64(f"{int(year):04d}-12-31", "D").astype("int64")
+    d = np.asarray(days)
+    if d.dtype.kind == "M":
+        d = d.astype("datetime64[D]").astype("int64")
+    full = np.arange(y0, y1 + 1)
+    missing = full[~np.isin(full, d.astype("int64"))]
+    if not len(missing):
+        return []
+    breaks = np.where(np.diff(missing) != 1)[0]
+    starts = np.r_[missing[0], missing[breaks + 1]]
+    ends = np.r_[missing[breaks], missing[-1]]
+    return [
+        [str(np.datetime64(int(s), "D")), str(np.datetime64(int(e), "D"))]
+        for s, e in zip(starts, ends)
+    ]
+
+
+def solar_coverage_gaps(location: str, years: list = None, loc_df: pd.DataFrame = None) -> list:
+    """
+    지점 누락 날짜 구간 [{"year", "start", "end", "days"}] (Archive 지연일 이후는 제외).
+    저장소 사용 시 manifest 의 연도별 색인(파티션을 다시 쓸 때 갱신)을 그대로 사용
+    """
+    years = sorted(int(y) for y in (years or solar_stack_target_years()))
+    last_day = datetime.date.today() - datetime.timedelta(days=SOLAR_ARCHIVE_LAG_DAYS)
+    by_year = {}
+    if SOLAR_STORE_ENABLED:
+        state = _solar_store_state()
+        with state["lock"]:
+            manifest = _load_solar_manifest()
+            entry = manifest["locations"].get(location) or {}
+            dirty = False
+            for yr, meta in (entry.get("years") or {}).items():
+                if int(yr) not in years:
+                    continue
+                gaps = (meta or {}).get("gaps")
+                if gaps is None:
+                    arr = _read_solar_partition(_solar_partition_path(location, int(yr)))
+                    if arr is None:
+                        continue
+                    gaps = _missing_day_ranges(arr["d"], int(yr))
+                    meta["gaps"] = gaps
+                    dirty = True
+                by_year[int(yr)] = gaps
+            if dirty:
+                _save_solar_manifest(manifest)
+    elif loc_df is not None and not loc_df.empty:
+        yrs = loc_df["날짜"].dt.year.to_numpy()
+        days = loc_df["날짜"].to_numpy(dtype="datetime64[D]")
+        for yr in set(years) & set(int(y) for y in np.unique(yrs)):
+            by_year[yr] = _missing_day_ranges(days[yrs == yr], yr)
+    out = []
+    for yr in years:
+        if yr > last_day.year:
+            continue
+        ranges = by_year.get(yr, [[f"{yr:04d}-01-01", f"{yr:04d}-12-31"]])
+        for s, e in ranges:
+            s_d, e_d = datetime.date.fromisoformat(s), min(datetime.date.fromisoformat(e), last_day)
+            if s_d <= e_d:
+                out.append({"year": yr, "start": s_d, "end": e_d, "days": (e_d - s_d).days + 1})
+    return out
+
+
+def _load_gap_state() -> dict:
+    loaded = _load_file_cache(SOLAR_GAP_STATE, 30 * 24 * 3600)
+    state = loaded if isinstance(loaded, dict) else {}
+    today = datetime.date.today().isoformat()
+    if state.get("date") != today:
+        state = {
+            "date": today, "used": 0, "filled": {}, "errors": {},
+            "last_run": state.get("last_run"), "worker_error": state.get("worker_error"),
+        }
+    return state
+
+
+@st.cache_resource
+def _gap_backfill_lock():
+    return threading.Lock()
+
+
+def run_solar_gap_backfill_once(sh, locations: list = None, budget: int = None, pause: float = 0.0) -> dict:
+    """
+    누락 구간 채우기 1회: 10년 기준 연도를 먼저, 지점·연도마다 누락 구간 전체를 1회 요청으로 조회해
+    누락 날짜만 골라 지점 시트에 1회 저장. 하루 예산(요청 수)을 넘지 않음.
+    반환: {"requests", "rows", "remaining_budget"}
+    """
+    result = {"requests": 0, "rows": 0, "remaining_budget": 0}
+    lock = _gap_backfill_lock()
+    if not lock.acquire(blocking=False):
+        return result
+    try:
+        state = _load_gap_state()
+        limit = SOLAR_GAP_BACKFILL_BUDGET if budget is None else int(budget)
+        remaining = max(0, limit - int(state.get("used") or 0))
+        if locations is None:
+            locations = sorted(_load_solar_manifest()["locations"]) if SOLAR_STORE_ENABLED else []
+        baseline = set(solar_baseline_years())
+        for loc in locations:
+            if remaining <= 0:
+                break
+            gaps = solar_coverage_gaps(loc)
+            if not gaps:
+                continue
+            lat, lon, _ = get_location_lat_lon(loc)
+            if lat is None or lon is None:
+                state["errors"][loc] = "좌표 없음"
+                continue
+            by_year = collections.defaultdict(list)
+            for g in gaps:
+                by_year[g["year"]].append(g)
+            order = sorted(by_year, key=lambda y: (y not in baseline, y))
+            hist = read_solar_store(loc) if SOLAR_STORE_ENABLED else None
+            model = fit_generation_model(hist)  # 지점 자체 이력으로 1회 적합, 모든 구간에 재사용
+            rows = []
+            for yr in order:
+                if remaining <= 0:
+                    break
+                yg = by_year[yr]
+                try:
+                    archive_df = archive_json_to_daily_df(
+                        fetch_open_meteo_archive_daily(
+                            lat, lon, yg[0]["start"].isoformat(), yg[-1]["end"].isoformat()
+                        )
+                    )
+                except Exception as e:
+                    logger.warning("solar gap backfill: %s %s archive fetch failed: %s", loc, yr, e)
+                    state["errors"][loc] = f"{yr}년 조회 실패: {e}"
+                    continue
+                finally:
+                    remaining -= 1
+                    result["requests"] += 1
+                    state["used"] = int(state.get("used") or 0) + 1
+                wanted = np.zeros(len(archive_df), dtype=bool)
+                dates = archive_df["날짜"].dt.date
+                for g in yg:
+                    wanted |= ((dates >= g["start"]) & (dates <= g["end"])).to_numpy()
+                rows.extend(build_solar_db_rows_from_archive(loc, archive_df[wanted], model=model))
+                if pause:
+                    time.sleep(pause)
+            if rows:
+                try:
+                    # 조회하는 동안 사용자가 같은 날짜를 저장했을 수 있으므로 시트에 없는 날짜만 추가
+                    n = append_solar_location_rows(sh, loc, rows, overwrite_dates=False, only_new_dates=True)
+                    result["rows"] += n
+                    state["filled"][loc] = int(state["filled"].get(loc, 0)) + n
+                    state["errors"].pop(loc, None)
+                except Exception as e:
+                    logger.warning("solar gap backfill: %s sheet write failed: %s", loc, e)
+                    state["errors"][loc] = f"시트 저장 실패: {e}"
+        state["last_run"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        _save_file_cache(SOLAR_GAP_STATE, state)
+        result["remaining_budget"] = remaining
+        return result
+    finally:
+        lock.release()
+
+
+def _record_gap_worker_error(message: str) -> None:
+    try:
+        state = _load_gap_state()
+        state["worker_error"] = {"at": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "message": message}
+        _save_file_cache(SOLAR_GAP_STATE, state)
+    except Exception:
+        logger.exception("solar gap backfill: could not record worker error")
+
+
+def _gap_backfill_loop(stop: threading.Event) -> None:
+    while not stop.is_set():
+        try:
+            if int(_load_gap_state().get("used") or 0) < SOLAR_GAP_BACKFILL_BUDGET:
+                client = get_client()
+                if client is None:
+                    raise RuntimeError("구글 클라우드 연결 실패 (서비스 계정 확인)")
+                sh = safe_api_call(client.open, "pms_db")
+                run_solar_gap_backfill_once(sh, pause=SOLAR_GAP_BACKFILL_PAUSE)
+                state = _load_gap_state()
+                if state.get("worker_error"):
+                    state["worker_error"] = None
+                    _save_file_cache(SOLAR_GAP_STATE, state)
+        except Exception as e:
+            logger.exception("solar gap backfill worker run failed")
+            _record_gap_worker_error(str(e))
+        stop.wait(SOLAR_GAP_BACKFILL_INTERVAL)
+
+
+@st.cache_resource
+def ensure_solar_gap_backfill_worker():
+    """프로세스당 1개 데몬 스레드 — 주기적으로 누락 구간을 예산 안에서 채움"""
+    stop = threading.Event()
+    if not (SOLAR_GAP_BACKFILL_ENABLED and SOLAR_STORE_ENABLED):
+        return {"thread": None, "stop": stop}
+    th = threading.Thread(target=_gap_backfill_loop, args=(stop,), name="solar-gap-backfill", daemon=True)
+    th.start()
+    return {"thread": th, "stop": stop}
+
+
+def render_solar_gap_status(sh, location: str) -> None:
+    """선택 지점 누락 날짜 구간 + 자동 채우기 상태"""
+    if not SOLAR_STORE_ENABLED:
+        st.caption("누락 구간 색인과 자동 채우기는 로컬 저장소(PMS_SOLAR_STORE)를 켠 경우에만 동작합니다.")
+        return
+    gaps = solar_coverage_gaps(location)
+    state = _load_gap_state()
+    worker = "켜짐" if SOLAR_GAP_BACKFILL_ENABLED and SOLAR_STORE_ENABLED else "꺼짐 (PMS_GAP_BACKFILL=on 으로 사용)"
+    st.caption(
+        f"자동 채우기 {worker} · 오늘 요청 {state.get('used', 0)}/{SOLAR_GAP_BACKFILL_BUDGET}회 · "
+        f"마지막 점검 {state.get('last_run') or '-'}"
+    )
+    worker_error = state.get("worker_error")
+    if worker_error:
+        st.error(f"자동 채우기 실행 실패 ({worker_error.get('at')}): {worker_error.get('message')}")
+    errors = state.get("errors") or {}
+    if errors:
+        st.warning("오늘 채우기 오류 — " + " · ".join(f"{loc}: {msg}" for loc, msg in sorted(errors.items())))
+    if not gaps:
+        st.success(f"`{location}` 대상 연도에 누락된 날짜가 없습니다.")
+        return
+    total = sum(g["days"] for g in gaps)
+    st.caption(f"누락 {len(gaps)}개 구간 · 총 {total:,}일")
+    st.dataframe(
+        pd.DataFrame(
+            [{"연도": g["year"], "시작": g["start"], "끝": g["end"], "일수": g["days"]} for g in gaps[:200]]
+        ),
+        use_container_width=True,
+        hide_index=True,
+    )
+    if st.button("🩹 이 지점 누락 구간 지금 채우기", key=f"gap_fill_{location}", use_container_width=True):
+        with st.spinner("누락 구간 조회·저장 중..."):
+            res = run_solar_gap_backfill_once(sh, locations=[location])
+        if res["requests"] == 0:
+            st.warning("오늘 요청 예산을 모두 썼거나 다른 채우기 작업이 진행 중입니다.")
+        else:
+            st.success(f"{res['requests']}회 조회, {res['rows']}일 저장 (남은 예산 {res['remaining_budget']}회)")
+
+
+def render_solar_backfill_planner(sh, all_locs: list, df_db: pd.DataFrame = None, index: dict = None, ref_df: pd.DataFrame = None):
+    """여러 지점·연도 누락분을 한 번에 채우는 백필 UI"""
+    st.caption(
+        "선택한 지점·연도 중 **누락분만** 찾아, 연속 연도는 한 번의 요청으로 묶어 조회하고 지점마다 시트에 **한 번만** 저장합니다. "
+        "중간에 멈춰도 저장이 끝난 지점은 기록되어 **이어서 실행**할 수 있습니다."
+    )
+    target_years = solar_stack_target_years()
+    b1, b2 = st.columns(2)
+    with b1:
+        bf_locs = st.multiselect("대상 지점", all_locs, default=[loc for loc in all_locs if loc in (index or {})][:6], key="solar_backfill_locs")
+    with b2:
+        bf_years = st.multiselect("대상 연도", target_years, default=target_years, key="solar_backfill_years")
+
+    plan = plan_solar_backfill(bf_locs, bf_years, df_db, index)
+    if plan:
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    {
+                        "지점": p["location"],
+                        "누락 연도 수": len(p["years"]),
+                        "조회 구간": ", ".join(f"{a}~{b}" if a != b else f"{a}" for a, b in p["ranges"]),
+                    }
+                    for p in plan
+                ]
+            ),
+            use_container_width=True,
+            hide_index=True,
+        )
+        st.caption(f"요청 {sum(len(p['ranges']) for p in plan)}회 · 시트 저장 {len(plan)}회 예정")
+    else:
+        st.success("선택한 지점·연도는 모두 적재되어 있습니다.")
+
+    pending = pending_solar_backfill()
+    c_run, c_resume = st.columns(2)
+    with c_run:
+        run_clicked = st.button("🚚 누락분 일괄 채우기", type="primary", disabled=not plan, key="solar_backfill_run", use_container_width=True)
+    with c_resume:
+        resume_clicked = st.button(
+            f"⏯️ 이전 작업 이어서 실행 ({len(pending)}개 지점 남음)" if pending else "⏯️ 이어서 실행할 작업 없음",
+            disabled=not pending,
+            key="solar_backfill_resume",
+            use_container_width=True,
+        )
+    if run_clicked or resume_clicked:
+        bar, cb = _portfolio_progress_callback("Open-Meteo 과거 데이터 조회·저장 중")
+        res = run_solar_backfill(sh, pending if resume_clicked else plan, ref_df=ref_df, progress_cb=cb, resume=resume_clicked)
+        bar.empty()
+        if res["locations"]:
+            st.success(f"**{res['locations']}개** 지점, **{res['rows']:,}행** 저장 완료.")
+        for loc, why in res["failed"].items():
+            st.warning(f"`{loc}`: {why} — **이어서 실행**으로 다시 시도할 수 있습니다.")
+        if res["locations"] and not res["failed"]:
+            time.sleep(1)
+            st.rerun()
+
+
+def render_solar_yearly_data_builder(sh, df_db: pd.DataFrame = None, index: dict = None):
+    """
+    지역별 10년+비교연도 데이터를 1년씩 쌓기 → Solar_지점명 시트 저장.
+    index(지점 메타데이터 색인)를 주면 적재 현황은 색인에서, 참조 지점 데이터는 필요할 때만 조회
+    """
+    st.subheader("🏗️ 연도별 데이터 쌓기 (1년씩)")
+    st.caption(
+        "선택한 도시의 **10년 기준(2014~2023) + 비교 연도(2024·2025)** 데이터를 "
+        "**1년에 1번** 저장합니다. Open-Meteo 일사량 + 발전시간 추정값이 들어갑니다. "
+        "실측 발전시간이 있으면 시트에서 수정하세요."
+    )
+    preset_locs = sorted(set(list(GEO_FALLBACK_COORDS.keys()) + ["여주"]))
+    db_locs = list_solar_locations(sh, df_db, index)
+    all_locs = sorted(set(preset_locs + db_locs))
+    new_loc = st.selectbox(
+        "도시(지점) 선택",
+        all_locs,
+        index=all_locs.index("여주") if "여주" in all_locs else 0,
+        key="solar_new_loc_builder",
+    )
+
+    st.caption(
+        f"저장 위치: 구글 시트 **`{SOLAR_SHEET_PREFIX}지점명`** (예: `{solar_sheet_title('여주')}`) — 지역마다 시트 분리"
+    )
+
+    with st.expander("🔄 기존 Solar_DB → 지역별 시트로 분리", expanded=False):
+        st.caption(
+            "통합 `Solar_DB` 시트가 **6000행 한도**에 걸렸을 때 사용합니다. "
+            "지점별로 `Solar_부산`, `Solar_여주` … 시트를 만들고 데이터를 옮깁니다. (기존 Solar_DB는 그대로 둡니다.)"
+        )
+        if st.button("지역별 시트로 마이그레이션", key="solar_migrate_legacy", use_container_width=True):
+            with st.spinner("Solar_DB 분리 중…"):
+                mig = migrate_legacy_solar_db_to_location_sheets(sh)
+            if mig.get("error"):
+                st.error(f"마이그레이션 오류: {mig['error']}")
+            elif mig["locations"] == 0:
+                st.info("옮길 데이터가 없거나 Solar_DB가 비어 있습니다.")
+            else:
+                st.success(
+                    f"**{mig['locations']}개** 지역, **{mig['rows']}행**을 지역별 시트로 옮겼습니다. 페이지를 새로고침하세요."
+                )
+                time.sleep(1)
+                st.rerun()
+
+    target_years = solar_stack_target_years()
+    baseline_years = solar_baseline_years()
+    coverage = get_location_year_coverage(df_db, new_loc, index)
 
     status_rows = []
     for y in target_years:
@@ -1507,11 +2585,20 @@ def render_solar_yearly_data_builder(sh, df_db: pd.DataFrame):
     prog = done_baseline / len(baseline_years) if baseline_years else 0
     st.progress(prog, text=f"10년 기준 적재: {done_baseline}/{len(baseline_years)}년")
 
+    with st.expander("🩹 누락 날짜 구간 · 자동 채우기", expanded=False):
+        render_solar_gap_status(sh, new_loc)
+
     ref_opts = ["PR 0.8 추정"] + [loc for loc in db_locs if loc != new_loc]
     ref_loc = st.selectbox("발전시간 추정 참조", ref_opts, key="solar_gen_ref")
     ref_df = None
-    if ref_loc != "PR 0.8 추정" and df_db is not None and not df_db.empty:
-        ref_df = df_db[df_db["지점"] == ref_loc].copy()
+    if ref_loc != "PR 0.8 추정":
+        if df_db is not None and not df_db.empty:
+            ref_df = df_db[df_db["지점"] == ref_loc].copy()
+        else:
+            ref_df = load_solar_db_df(sh, location=ref_loc)
+
+    with st.expander("🚚 여러 지점·연도 한 번에 채우기 (백필)", expanded=False):
+        render_solar_backfill_planner(sh, all_locs, df_db, index, ref_df)
 
     lat, lon, _ = get_location_lat_lon(new_loc)
     if lat is None:
@@ -1575,15 +2662,22 @@ def render_solar_yearly_data_builder(sh, df_db: pd.DataFrame):
                     st.rerun()
 
 
-def fit_predict_generation_hours(hist_df: pd.DataFrame, radiation_mj_m2: float):
+GENERATION_FALLBACK_PR = 0.8  # 참조 데이터가 없을 때 PR 0.8 가정
+
+
+def fit_generation_model(hist_df: pd.DataFrame) -> dict:
     """
-    과거(실제) 데이터를 활용해 '일사량합계(MJ/m²) -> 발전시간(h)'로 회귀/비율 기반 예측
-    반환: (pred_hours, method, r2_or_none)
+    과거(실제) 데이터로 '일사량합계(MJ/m²) -> 발전시간(h)' 모델 1회 적합.
+    반환: {"method", "a", "b", "ratio", "r2", "n"} — predict_generation_hours 로 배열 단위 예측
     """
+    model = {"method": "fallback_pr0.8", "a": None, "b": None, "ratio": GENERATION_FALLBACK_PR, "r2": None, "n": 0}
+    if hist_df is None or hist_df.empty:
+        return model
     try:
         x = pd.to_numeric(hist_df.get("일사량합계"), errors="coerce")
         y = pd.to_numeric(hist_df.get("발전시간"), errors="coerce")
         m = x.notna() & y.notna()
+        model["n"] = int(m.sum())
         if m.sum() >= 12:
             # 1차 선형회귀
             a, b = np.polyfit(x[m].to_numpy(), y[m].to_numpy(), 1)
@@ -1591,1368 +2685,3695 @@ def fit_predict_generation_hours(hist_df: pd.DataFrame, radiation_mj_m2: float):
             ss_res = float(((y[m] - yhat) ** 2).sum())
             ss_tot = float(((y[m] - y[m].mean()) ** 2).sum())
             r2 = None if ss_tot <= 0 else (1.0 - (ss_res / ss_tot))
-            pred = float(a * radiation_mj_m2 + b)
-            pred = max(0.0, min(24.0, pred))
-            return pred, "linear_regression", r2
+            model.update(method="linear_regression", a=float(a), b=float(b), r2=r2)
+            return model
 
         # 비율 기반(발전시간 / (kWh/m²)) 평균으로 추정
         if m.sum() >= 5:
             kwh_m2 = (x[m] / 3.6).replace([np.inf, -np.inf], np.nan)
             ratio = (y[m] / kwh_m2).replace([np.inf, -np.inf], np.nan).dropna()
             if len(ratio) >= 5:
-                r = float(ratio.clip(lower=0).median())
-                pred = float((radiation_mj_m2 / 3.6) * r)
-                pred = max(0.0, min(24.0, pred))
-                return pred, "ratio_median", None
-
-        # 마지막 fallback (기존 로직과 유사)
-        pred = float((radiation_mj_m2 / 3.6) * 0.8)
-        pred = max(0.0, min(24.0, pred))
-        return pred, "fallback_pr0.8", None
+                model.update(method="ratio_median", ratio=float(ratio.clip(lower=0).median()))
+                return model
     except Exception:
-        pred = float((radiation_mj_m2 / 3.6) * 0.8)
-        pred = max(0.0, min(24.0, pred))
-        return pred, "fallback_pr0.8", None
-
-def calc_planned_progress(start, end, target_date=None):
-    if target_date is None: 
-        target_date = datetime.date.today()
-    try:
-        s = pd.to_datetime(start).date()
-        e = pd.to_datetime(end).date()
-        if pd.isna(s) or pd.isna(e): 
-            return 0.0
-        if target_date < s: 
-            return 0.0
-        if target_date > e: 
-            return 100.0
-        total_days = (e - s).days
-        if total_days <= 0: 
-            return 100.0
-        passed_days = (target_date - s).days
-        return min(100.0, max(0.0, (passed_days / total_days) * 100))
-    except: 
-        return 0.0
+        pass
+    return model
 
 
-def _task_duration_days(start, end) -> float:
-    """공정 1건의 가중치 = 일정 기간(일). 날짜 없으면 1일."""
-    try:
-        s = pd.to_datetime(start, errors="coerce")
-        e = pd.to_datetime(end, errors="coerce")
-        if pd.isna(s) or pd.isna(e):
-            return 1.0
-        days = abs((pd.Timestamp(e) - pd.Timestamp(s)).days)
-        return float(max(1, days))
-    except Exception:
-        return 1.0
+@st.cache_data(show_spinner=False, max_entries=64)
+def _cached_generation_model(data_version: str, _hist_df: pd.DataFrame) -> dict:
+    return fit_generation_model(_hist_df)
 
 
-def calc_weighted_progress_mean(df: pd.DataFrame, progress_values: pd.Series) -> float:
-    """
-    공정 진행률의 기간 가중 평균.
-    실적% = Σ(진행률 × 공정일수) / Σ(공정일수)
-    """
-    if df is None or df.empty or progress_values is None or len(progress_values) == 0:
-        return 0.0
-    p = pd.to_numeric(progress_values, errors="coerce").fillna(0).astype(float)
-    if len(df) != len(p):
-        return float(p.mean())
-    weights = df.apply(
-        lambda r: _task_duration_days(r.get("시작일"), r.get("종료일")),
-        axis=1,
-    ).astype(float)
-    total_w = float(weights.sum())
-    if total_w <= 0:
-        return float(p.mean())
-    return float((p * weights).sum() / total_w)
+def get_generation_model(hist_df: pd.DataFrame) -> dict:
+    """참조 데이터 버전(내용 해시)별로 1회만 적합해 재사용"""
+    if hist_df is None or hist_df.empty:
+        return fit_generation_model(None)
+    cols = [c for c in ("일사량합계", "발전시간") if c in hist_df.columns]
+    return _cached_generation_model(frame_signature(hist_df[cols]), hist_df)
 
 
-def calc_weighted_actual_progress(df: pd.DataFrame) -> float:
-    """실적(실행) 진행률 — 기간 가중 평균"""
-    if df.empty or "진행률" not in df.columns:
-        return 0.0
-    return round(calc_weighted_progress_mean(df, df["진행률"]), 1)
+def predict_generation_hours(model: Optional[dict], radiation_mj_m2) -> np.ndarray:
+    """일사량 배열 → 발전시간 배열 (0~24h 범위, 한 번의 배열 연산)"""
+    rad = np.asarray(radiation_mj_m2, dtype=float)
+    model = model or fit_generation_model(None)
+    if model["method"] == "linear_regression":
+        pred = model["a"] * rad + model["b"]
+    else:
+        pred = (rad / 3.6) * model["ratio"]
+    return np.clip(pred, 0.0, 24.0)
 
 
-def calc_weighted_planned_progress(df: pd.DataFrame, target_date=None) -> float:
-    """계획 진행률 — 기간 가중 평균"""
-    if df.empty:
-        return 0.0
-    planned = df.apply(
-        lambda r: calc_planned_progress(r.get("시작일"), r.get("종료일"), target_date),
-        axis=1,
-    )
-    return round(calc_weighted_progress_mean(df, planned), 1)
+def fit_predict_generation_hours(hist_df: pd.DataFrame, radiation_mj_m2: float):
+    """
+    과거(실제) 데이터를 활용해 '일사량합계(MJ/m²) -> 발전시간(h)'로 회귀/비율 기반 예측
+    반환: (pred_hours, method, r2_or_none)
+    """
+    try:
+        model = get_generation_model(hist_df)
+    except Exception:
+        model = fit_generation_model(None)
+    pred = float(predict_generation_hours(model, radiation_mj_m2))
+    return pred, model["method"], model["r2"]
+
+FORECAST_DAILY_FIELDS = {
+    "shortwave_radiation_sum": "일사량",
+    "cloud_cover_mean": "운량",
+    "temperature_2m_max": "최고기온",
+    "temperature_2m_min": "최저기온",
+    "precipitation_sum": "강수량",
+}
 
 
-def navigate_to_project(p_name):
-    st.session_state.selected_menu = "프로젝트 상세"
-    st.session_state.selected_pjt = p_name
+def build_location_forecast(location: str, hist_df: pd.DataFrame, lat=None, lon=None, geo=None, sh=None) -> dict:
+    """
+    지점 예보 서비스 (한 화면에서 1회 생성해 모든 곳에서 공유):
+    좌표 1회 확정 → 7일 예보 1회 조회 → 발전 모델 1회 적합 → 날짜별 예측.
+    반환: {"location", "lat", "lon", "geo", "model", "base_model", "days", "error"}
+      model: 등록된 다변수 모델(현재 데이터 버전, sh 로 지점 전체 이력 기준 확인) 또는 일사량 단일 모델(base_model)
+      days: 날짜(date) | 일사량 | 운량 | 최고기온 | 최저기온 | 강수량 | 예측_발전시간
+    """
+    svc = {
+        "location": location, "lat": None, "lon": None, "geo": geo,
+        "model": None, "base_model": None, "days": pd.DataFrame(), "error": None,
+    }
+    if lat is None or lon is None:
+        try:
+            lat, lon, geo = get_location_lat_lon(location)
+        except Exception:
+            lat, lon, geo = None, None, None
+        svc["geo"] = geo
+    if lat is None or lon is None:
+        svc["error"] = "좌표를 확인할 수 없습니다."
+        return svc
+    svc["lat"], svc["lon"] = float(lat), float(lon)
+    try:
+        svc["base_model"] = get_generation_model(hist_df)
+    except Exception:
+        svc["base_model"] = fit_generation_model(None)
+    try:
+        svc["model"] = get_registered_generation_model(sh, location) or svc["base_model"]
+    except Exception:
+        svc["model"] = svc["base_model"]
+    try:
+        fc = fetch_open_meteo_daily_forecast(svc["lat"], svc["lon"], timezone="Asia/Seoul")
+    except Exception as e:
+        svc["error"] = str(e)
+        return svc
+    daily = (fc or {}).get("daily") or {}
+    times = daily.get("time") or []
+    if not times:
+        svc["error"] = "예보 응답에 날짜가 없습니다."
+        return svc
+    days = pd.DataFrame({"날짜": pd.to_datetime(times, errors="coerce").date})
+    for key, col in FORECAST_DAILY_FIELDS.items():
+        vals = list(daily.get(key) or [])
+        vals = (vals + [None] * len(times))[: len(times)]
+        days[col] = pd.to_numeric(pd.Series(vals, dtype="object"), errors="coerce").to_numpy()
+    days["예측_발전시간"] = predict_generation_frame(svc["model"], days, fallback=svc["base_model"])
+    days.loc[days["일사량"].isna(), "예측_발전시간"] = np.nan
+    svc["days"] = days
+    return svc
+
+
+def forecast_for_day(service: dict, target_date: datetime.date) -> Optional[dict]:
+    """예보 서비스에서 특정 날짜 1행(dict). 없으면 None"""
+    days = (service or {}).get("days")
+    if days is None or days.empty:
+        return None
+    hit = days[days["날짜"] == target_date]
+    if hit.empty:
+        return None
+    row = hit.iloc[0]
+    return {k: (None if pd.isna(v) else (v if k == "날짜" else float(v))) for k, v in row.items()}
 
-def set_top_menu(menu_name: str):
-    """상단 메뉴 클릭 시 선택 메뉴 변경 (콜백 종료 후 Streamlit이 자동 리런)"""
-    st.session_state.selected_menu = menu_name
 
+@st.cache_data(ttl=3600, show_spinner=False)
+def fetch_open_meteo_multi_forecast(coords: tuple, timezone: str = "Asia/Seoul") -> list:
+    """
+    여러 좌표의 7일 예보를 좌표 묶음당 1회 요청 (Open-Meteo 다중 위치: 위도·경도 쉼표 구분).
+    coords: ((lat, lon), ...) → 같은 순서의 예보 JSON 목록
+    """
+    out = []
+    for i in range(0, len(coords), max(1, OPEN_METEO_MULTI_MAX)):
+        chunk = coords[i : i + max(1, OPEN_METEO_MULTI_MAX)]
+        params = {
+            "latitude": ",".join(f"{float(lat):.4f}" for lat, _ in chunk),
+            "longitude": ",".join(f"{float(lon):.4f}" for _, lon in chunk),
+            "daily": ",".join(FORECAST_DAILY_FIELDS.keys()),
+            "forecast_days": 7,
+            "timezone": timezone,
+        }
+        j = cached_http_get_json("forecast", OPEN_METEO_FORECAST_URL, params, timeout=30)
+        out.extend(j if isinstance(j, list) else [j])
+    return out
 
-SCHEDULE_COLUMNS = ["시작일", "종료일", "대분류", "구분", "진행상태", "비고", "진행률"]
 
+def build_portfolio_forecast(sh, locations: list) -> pd.DataFrame:
+    """
+    전 지점 7일 × N지점 발전시간 예보 (긴 표).
+    좌표 확정 → 다중 위치 예보 1회 → 전 지점 이력 1회 로드 후 지점별로 나눠 모델(캐시) → 전체 행 한 번의 배열 연산으로 예측.
+    """
+    sites = []
+    for loc in locations:
+        try:
+            lat, lon, _ = get_location_lat_lon(loc)
+        except Exception:
+            lat, lon = None, None
+        if lat is not None and lon is not None:
+            sites.append((loc, round(float(lat), 4), round(float(lon), 4)))
+    if not sites:
+        return pd.DataFrame()
 
-def _sheet_data_signature(data: list) -> str:
-    """구글 시트 원본 데이터 변경 여부 감지용 (엑셀 업로드 후 화면 갱신)"""
+    responses = fetch_open_meteo_multi_forecast(tuple((lat, lon) for _, lat, lon in sites))
     try:
-        payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
-        return hashlib.md5(payload.encode("utf-8")).hexdigest()
+        hist = load_solar_db_df(sh)
+        wanted = {loc for loc, _, _ in sites}
+        hist_by_loc = {
+            str(k): g for k, g in hist.groupby(hist["지점"].astype(str), sort=False) if str(k) in wanted
+        }
     except Exception:
-        return str(time.time())
-
-
-def invalidate_process_edit_cache(project_names=None):
-    """엑셀 업로드·시트 동기화 후 프로젝트 상세 편집기 세션 캐시 무효화"""
-    if project_names is None:
-        st.session_state.pop("process_edit_df", None)
-        st.session_state.pop("process_edit_pjt", None)
-        st.session_state.pop("process_edit_invalidated_pjts", None)
-        return
-    names = {str(p).strip() for p in project_names if str(p).strip()}
-    if not names:
-        return
-    invalidated = set(st.session_state.get("process_edit_invalidated_pjts") or [])
-    invalidated.update(names)
-    st.session_state["process_edit_invalidated_pjts"] = invalidated
-    if st.session_state.get("process_edit_pjt") in names:
-        st.session_state.pop("process_edit_df", None)
-        st.session_state.pop("process_edit_pjt", None)
-
-
-def _excel_cell_to_sheet_str(val) -> str:
-    if val is None or (isinstance(val, float) and pd.isna(val)):
-        return ""
-    if isinstance(val, (datetime.date, datetime.datetime)):
-        return val.strftime("%Y-%m-%d")
-    if hasattr(val, "strftime"):
+        hist_by_loc = {}
+    frames, models, mv_models = [], {}, {}
+    for (loc, lat, lon), fc in zip(sites, responses):
+        daily = (fc or {}).get("daily") or {}
+        times = daily.get("time") or []
+        if not times:
+            continue
+        part = pd.DataFrame({"날짜": pd.to_datetime(times, errors="coerce").date})
+        for key, col in FORECAST_DAILY_FIELDS.items():
+            vals = (list(daily.get(key) or []) + [None] * len(times))[: len(times)]
+            part[col] = pd.to_numeric(pd.Series(vals, dtype="object"), errors="coerce").to_numpy()
+        part["지점"], part["위도"], part["경도"] = loc, lat, lon
+        frames.append(part)
+        site_hist = hist_by_loc.get(loc)
         try:
-            return val.strftime("%Y-%m-%d")
+            models[loc] = get_generation_model(site_hist)
         except Exception:
-            pass
-    s = str(val).strip()
-    if not s or s.lower() in ("nan", "none", "nat"):
-        return ""
-    if len(s) >= 10 and s[4] == "-" and s[7] == "-":
-        return s[:10]
+            models[loc] = fit_generation_model(None)
+        try:
+            mv = get_registered_generation_model(sh, loc, site_hist)
+        except Exception:
+            mv = None
+        if mv is not None:
+            mv_models[loc] = mv
+    if not frames:
+        return pd.DataFrame()
+
+    out = pd.concat(frames, ignore_index=True)
+    # 지점별 계수를 행에 펼쳐 전체를 한 번에 예측
+    loc_col = out["지점"]
+    method = loc_col.map(lambda x: models[x]["method"]).to_numpy()
+    a = loc_col.map(lambda x: models[x]["a"] if models[x]["a"] is not None else np.nan).to_numpy(dtype=float)
+    b = loc_col.map(lambda x: models[x]["b"] if models[x]["b"] is not None else np.nan).to_numpy(dtype=float)
+    ratio = loc_col.map(lambda x: models[x]["ratio"]).to_numpy(dtype=float)
+    rad = out["일사량"].to_numpy(dtype=float)
+    pred = np.where(method == "linear_regression", a * rad + b, (rad / 3.6) * ratio)
+    out["예측_발전시간"] = np.clip(pred, 0.0, 24.0)
+    out["예측모델"] = method
+    out["R2"] = loc_col.map(lambda x: models[x]["r2"])
+    # 다변수 모델이 등록된 지점은 지점 단위 배열 연산으로 덮어씀
+    for loc, mv in mv_models.items():
+        sel = (loc_col == loc).to_numpy()
+        out.loc[sel, "예측_발전시간"] = predict_generation_frame(mv, out.loc[sel], fallback=models[loc])
+        out.loc[sel, "예측모델"] = "multivariate"
+        out.loc[sel, "R2"] = mv.get("r2")
+    return out[
+        ["날짜", "지점", "위도", "경도", "일사량", "예측_발전시간", "예측모델", "R2", "운량", "최고기온", "최저기온", "강수량"]
+    ]
+
+
+def get_or_create_solar_forecast_worksheet(sh):
     try:
-        parsed = pd.to_datetime(s, errors="coerce")
-        if pd.notna(parsed):
-            return parsed.strftime("%Y-%m-%d")
-    except Exception:
-        pass
-    return s
+        return safe_api_call(sh.worksheet, SOLAR_FORECAST_SHEET)
+    except WorksheetNotFound:
+        ws = safe_api_call(sh.add_worksheet, title=SOLAR_FORECAST_SHEET, rows="2000", cols="20")
+        safe_api_call(ws.append_row, SOLAR_FORECAST_COLUMNS)
+        return ws
 
 
-def _normalize_excel_schedule_df(df_up: pd.DataFrame) -> pd.DataFrame:
-    """엑셀 시트 → 공정표 A~G열 DataFrame (헤더·빈행·날짜 형식 정리)"""
-    if df_up is None or df_up.empty:
-        return pd.DataFrame(columns=SCHEDULE_COLUMNS)
+def _solar_forecast_row(date_str, loc, lat, lon, rad, pred_h, method, r2, cloud, tmax, precip, now_str, user) -> list:
+    def _num(v):
+        return "" if v is None or pd.isna(v) else float(v)
+    return [
+        date_str, str(loc), float(lat), float(lon), _num(rad), _num(pred_h), str(method), _num(r2),
+        _num(cloud), _num(tmax), _num(precip), now_str, user,
+    ]
 
-    df = df_up.copy()
-    df.columns = [str(c).strip() for c in df.columns]
-    rename_map = {}
-    for i, col in enumerate(df.columns):
-        if col in SCHEDULE_COLUMNS:
-            rename_map[col] = col
-        elif i < len(SCHEDULE_COLUMNS):
-            rename_map[col] = SCHEDULE_COLUMNS[i]
-    df = df.rename(columns=rename_map)
-    for col in SCHEDULE_COLUMNS:
-        if col not in df.columns:
-            df[col] = ""
-    df = df[SCHEDULE_COLUMNS]
-    df = df.dropna(how="all")
-    df = df[~df.apply(lambda r: str(r.get("시작일", "")).strip() == "시작일", axis=1)]
 
-    for col in ("시작일", "종료일"):
-        df[col] = df[col].apply(_excel_cell_to_sheet_str)
-    for col in ("대분류", "구분", "진행상태", "비고"):
-        df[col] = df[col].apply(
-            lambda v: "" if pd.isna(v) else str(v).strip().replace("nan", "").replace("None", "")
+def write_portfolio_forecast(sh, fc_df: pd.DataFrame, user: str = "") -> int:
+    """전 지점 예보 표를 Solar_Forecast 에 한 번의 append_rows 로 저장"""
+    if fc_df is None or fc_df.empty:
+        return 0
+    ws = get_or_create_solar_forecast_worksheet(sh)
+    now_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    rows = [
+        _solar_forecast_row(
+            pd.Timestamp(r["날짜"]).strftime("%Y-%m-%d"), r["지점"], r["위도"], r["경도"], r["일사량"],
+            None if pd.isna(r["예측_발전시간"]) else round(float(r["예측_발전시간"]), 4),
+            r["예측모델"], r["R2"], r["운량"], r["최고기온"], r["강수량"], now_str, user,
         )
-    df["진행률"] = pd.to_numeric(df["진행률"], errors="coerce").fillna(0)
-    return df.reset_index(drop=True)
+        for r in fc_df.to_dict("records")
+        if pd.notna(r["일사량"])
+    ]
+    if not rows:
+        return 0
+    safe_api_call(ws.append_rows, rows, value_input_option="RAW")
+    cached_get_all_values.clear()
+    clear_file_cache(SOLAR_FORECAST_SHEET)
+    return len(rows)
 
 
-def _extract_pm_weekly_from_sheet_rows(existing_rows: list):
-    pm, this_w, next_w = "", "", ""
-    if len(existing_rows) > 1:
-        row = existing_rows[1]
-        if len(row) > 7:
-            pm = str(row[7]).strip()
-        if len(row) > 8:
-            this_w = str(row[8]).strip()
-        if len(row) > 9:
-            next_w = str(row[9]).strip()
-    return pm, this_w, next_w
+@st.cache_resource
+def _portfolio_forecast_lock():
+    return threading.Lock()
 
 
-def _schedule_df_to_sheet_rows(df: pd.DataFrame, pm: str = "", this_w: str = "", next_w: str = "") -> list:
-    """공정표 DataFrame → 구글 시트 A1 형식 (헤더 + PM/금주/차주 열 포함)"""
-    header = SCHEDULE_COLUMNS + ["PM", "금주", "차주"]
-    rows = [header]
-    if df.empty:
-        rows.append([""] * 7 + [pm, this_w, next_w])
-        return rows
-    for i, (_, row) in enumerate(df.iterrows()):
-        r7 = [_excel_cell_to_sheet_str(row[c]) for c in SCHEDULE_COLUMNS]
-        r7[6] = str(int(row["진행률"])) if pd.notna(row["진행률"]) else "0"
-        if i == 0:
-            r7.extend([pm, this_w, next_w])
-        else:
-            r7.extend([pm, "", ""])
-        rows.append(r7)
-    return rows
+def run_daily_portfolio_forecast(sh, locations: list, user: str = "", force: bool = False) -> dict:
+    """하루 1회 전 지점 예보 저장 (상태 파일로 같은 날 중복 실행 방지). 반환: {"ran", "rows", "last_run"}"""
+    today = datetime.date.today().isoformat()
+    lock = _portfolio_forecast_lock()
+    if not lock.acquire(blocking=False):
+        return {"ran": False, "rows": 0, "last_run": None}
+    try:
+        state = _load_file_cache(PORTFOLIO_FORECAST_STATE, 30 * 24 * 3600) or {}
+        if not force and state.get("last_run") == today:
+            return {"ran": False, "rows": int(state.get("rows") or 0), "last_run": today}
+        n = write_portfolio_forecast(sh, build_portfolio_forecast(sh, locations), user=user)
+        state = {"last_run": today, "rows": n, "locations": len(locations)}
+        _save_file_cache(PORTFOLIO_FORECAST_STATE, state)
+        return {"ran": True, "rows": n, "last_run": today}
+    finally:
+        lock.release()
+
+
+def _portfolio_forecast_loop(stop: threading.Event) -> None:
+    while not stop.is_set():
+        try:
+            state = _load_file_cache(PORTFOLIO_FORECAST_STATE, 30 * 24 * 3600) or {}
+            if state.get("last_run") != datetime.date.today().isoformat():
+                client = get_client()
+                if client is None:
+                    raise RuntimeError("구글 클라우드 연결 실패 (서비스 계정 확인)")
+                sh = safe_api_call(client.open, "pms_db")
+                locations = list_solar_locations(sh, index=solar_location_index(sh))
+                run_daily_portfolio_forecast(sh, locations, user="auto")
+        except Exception as e:
+            logger.exception("portfolio forecast worker run failed")
+            state = _load_file_cache(PORTFOLIO_FORECAST_STATE, 30 * 24 * 3600) or {}
+            state["worker_error"] = {"at": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "message": str(e)}
+            _save_file_cache(PORTFOLIO_FORECAST_STATE, state)
+        stop.wait(PORTFOLIO_FORECAST_CHECK_INTERVAL)
 
 
-def sync_worksheet_from_excel_df(ws, df_up: pd.DataFrame) -> int:
-    """엑셀 DataFrame을 프로젝트 시트 형식에 맞게 업로드 (PM·금주·차주 유지)"""
-    existing = safe_api_call(ws.get_all_values)
-    pm, this_w, next_w = _extract_pm_weekly_from_sheet_rows(existing)
-    df_norm = _normalize_excel_schedule_df(df_up)
-    full_data = _schedule_df_to_sheet_rows(df_norm, pm, this_w, next_w)
-    safe_api_call(ws.clear)
-    safe_api_call(ws.update, "A1", full_data)
-    return len(df_norm)
+@st.cache_resource
+def ensure_portfolio_forecast_worker():
+    """PMS_PORTFOLIO_FORECAST_AUTO 일 때 프로세스당 1개 데몬 스레드 — 하루 1회 전 지점 예보 저장 (화면 렌더링과 분리)"""
+    stop = threading.Event()
+    if not PORTFOLIO_FORECAST_AUTO:
+        return {"thread": None, "stop": stop}
+    th = threading.Thread(target=_portfolio_forecast_loop, args=(stop,), name="portfolio-forecast", daemon=True)
+    th.start()
+    return {"thread": th, "stop": stop}
+
+
+def render_portfolio_forecast(sh, locations: list) -> None:
+    """전 지점 7일 예측 발전시간 (지점 × 날짜 표) + 일괄 저장"""
+    if not locations:
+        st.caption("등록된 지점이 없습니다.")
+        return
+    if PORTFOLIO_FORECAST_AUTO:
+        state = _load_file_cache(PORTFOLIO_FORECAST_STATE, 30 * 24 * 3600) or {}
+        if state.get("last_run"):
+            st.caption(f"🕘 전 지점 예보 자동 저장: 마지막 {state['last_run']} ({int(state.get('rows') or 0)}행)")
+        if state.get("worker_error"):
+            err = state["worker_error"]
+            st.warning(f"전 지점 예보 자동 저장 실패 ({err.get('at')}): {err.get('message')}")
+    # 접힌 상태에서도 본문이 실행되므로 켤 때만 조회
+    if not st.toggle("전 지점 7일 예보 불러오기", key="portfolio_fc_on"):
+        return
+    try:
+        fc_df = build_portfolio_forecast(sh, locations)
+    except Exception as e:
+        st.warning(f"전 지점 예보를 불러오지 못했습니다: {e}")
+        return
+    if fc_df.empty:
+        st.info("예보를 받을 수 있는 지점이 없습니다. (좌표 변환 실패)")
+        return
+    pivot = fc_df.pivot_table(index="지점", columns="날짜", values="예측_발전시간", aggfunc="first")
+    pivot.columns = [pd.Timestamp(c).strftime("%m/%d") for c in pivot.columns]
+    st.dataframe(pivot.round(2), use_container_width=True)
+    missing = sorted(set(locations) - set(fc_df["지점"]))
+    cap = f"{fc_df['지점'].nunique()}개 지점 × 7일 · 예보 요청 {-(-fc_df['지점'].nunique() // max(1, OPEN_METEO_MULTI_MAX))}회"
+    if missing:
+        cap += f" | 좌표 없음: {', '.join(missing)}"
+    st.caption(cap)
+    if st.button("💾 전 지점 7일 예보 시트에 일괄 저장", use_container_width=True, key="portfolio_fc_save"):
+        try:
+            n = write_portfolio_forecast(sh, fc_df, user=st.session_state.get("user_id", ""))
+            st.success(f"{n}행 저장 완료!")
+        except Exception as e:
+            st.error(f"저장 중 오류: {e}")
 
 
-def _gantt_month_labels(min_d: pd.Timestamp, max_d: pd.Timestamp) -> list:
-    """간트 상단 월 눈금 라벨 (26.4 형식)"""
-    start = pd.Timestamp(year=min_d.year, month=min_d.month, day=1)
-    end = pd.Timestamp(year=max_d.year, month=max_d.month, day=1)
-    months = pd.date_range(start, end, freq="MS")
-    if len(months) == 0:
-        return [f"{min_d.year % 100}.{min_d.month}"]
-    return [f"{d.year % 100}.{d.month}" for d in months]
+# -------------------------------
+# [예측] 다변수 발전 모델 (일사량·온도 감쇠·운량·계절) — 지점·데이터 버전별 등록부에 저장, 화면에서는 계수로 점수만 계산
+# -------------------------------
+GENERATION_MODEL_REGISTRY = CACHE_DIR / "generation_models.json"
+GENERATION_MV_FEATURES = ["일사량", "온도감쇠", "운량", "계절_sin", "계절_cos"]
+GENERATION_MV_MIN_ROWS = 60
+GENERATION_MV_RIDGE = 1.0
+GENERATION_MV_REF_TEMP = 25.0  # 온도감쇠 = 일사량 × (평균기온 - 25℃)
+ARCHIVE_WEATHER_FIELDS = "shortwave_radiation_sum,cloud_cover_mean,temperature_2m_max,temperature_2m_min,precipitation_sum"
 
 
-def _render_gantt_month_ruler(min_d: pd.Timestamp, max_d: pd.Timestamp) -> None:
-    """차트 본문 스크롤 시에도 남는 상단 월(년.월) 눈금 — 엑셀 틀 고정 상단 행과 유사"""
-    labels = _gantt_month_labels(min_d, max_d)
-    cells = "".join(f'<span class="gantt-month-cell">{lbl}</span>' for lbl in labels)
-    st.markdown(
-        f"""
-        <div class="gantt-freeze-panel">
-            <div class="gantt-month-ruler-wrap">
-                <div class="gantt-month-ruler-spacer" title="공정명 영역"></div>
-                <div class="gantt-month-ruler-track">{cells}</div>
-            </div>
-        </div>
-        """,
-        unsafe_allow_html=True,
-    )
+@st.cache_resource
+def _generation_registry_lock():
+    return threading.Lock()
 
 
-def render_print_button():
-    """자바스크립트를 이용해 브라우저 인쇄(PDF 저장) 창을 띄우는 버튼"""
-    components.html(
-        """
-        <script>
-            function printApp() {
-                window.parent.print();
-            }
-        </script>
-        <style>
-            body { margin: 0; padding: 0; background-color: transparent; }
-            .print-btn {
-                float: right;
-                background-color: #f8f9fa;
-                color: #212529;
-                border: 1px solid #dee2e6;
-                padding: 6px 14px;
-                border-radius: 6px;
-                font-size: 13px;
-                font-weight: bold;
-                cursor: pointer;
-                font-family: sans-serif;
-                box-shadow: 0 1px 2px rgba(0,0,0,0.05);
-                transition: all 0.2s;
-            }
-            .print-btn:hover {
-                background-color: #e9ecef;
-                border-color: #ced4da;
-            }
-        </style>
-        <button class="print-btn" onclick="printApp()">🖨️ PDF 저장 / 인쇄</button>
-        """,
-        height=40
-    )
+def load_generation_model_registry() -> dict:
+    try:
+        with open(GENERATION_MODEL_REGISTRY, "r", encoding="utf-8") as f:
+            reg = json.load(f)
+        return reg if isinstance(reg, dict) else {}
+    except Exception:
+        return {}
 
-# ---------------------------------------------------------
-# [SECTION 2] 뷰(View) 함수
-# ---------------------------------------------------------
 
-def build_project_status_report_df(pjt_list):
-    """
-    구글 시트 프로젝트 탭과 동일 규칙으로 집계 (통합 대시보드와 동일 데이터 소스).
-    - PM/금주/차주: 2행 H,I,J
-    - 진행률: 공정표 '진행률' 열 기간(일정) 가중 평균, 계획: 시작~종료일 기준 calc_planned_progress 기간 가중 평균
-    """
-    def _extract_capacity_mw(project_name: str):
-        """
-        프로젝트명 끝의 용량 표기에서 MW 추출.
-        예) '..._1MW', '..._0.4MW', '... 2MW' -> 1.0, 0.4, 2.0
-        """
-        s = str(project_name or "").strip()
-        if not s:
-            return ""
-        m = re.search(r"(?:[_\s-])(\d+(?:\.\d+)?)\s*mw\s*$", s, flags=re.IGNORECASE)
-        if not m:
-            return ""
-        try:
-            return float(m.group(1))
-        except Exception:
-            return ""
+def _save_generation_model_registry(reg: dict) -> None:
+    try:
+        GENERATION_MODEL_REGISTRY.parent.mkdir(parents=True, exist_ok=True)
+        tmp = GENERATION_MODEL_REGISTRY.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(reg, f, ensure_ascii=False)
+        os.replace(tmp, GENERATION_MODEL_REGISTRY)
+    except Exception:
+        pass
 
-    rows = []
-    for p_name in pjt_list:
-        try:
-            data = cached_get_head("pms_db", p_name, max_rows=200)
-            pm_name = "미지정"
-            this_w = "금주 실적 미입력"
-            next_w = "차주 계획 미입력"
-            if len(data) > 0:
-                header = data[0][:7]
-                df = (
-                    pd.DataFrame([r[:7] for r in data[1:]], columns=header)
-                    if len(data) > 1
-                    else pd.DataFrame(columns=header)
-                )
-                if len(data) > 1 and len(data[1]) > 7 and str(data[1][7]).strip():
-                    pm_name = str(data[1][7]).strip()
-                if len(data) > 1 and len(data[1]) > 8 and str(data[1][8]).strip():
-                    this_w = str(data[1][8]).strip()
-                if len(data) > 1 and len(data[1]) > 9 and str(data[1][9]).strip():
-                    next_w = str(data[1][9]).strip()
-            else:
-                df = pd.DataFrame()
-            if not df.empty and "진행률" in df.columns:
-                avg_act = calc_weighted_actual_progress(df)
-                avg_plan = calc_weighted_planned_progress(df)
-            else:
-                avg_act = 0.0
-                avg_plan = 0.0
-            status_ui = "정상"
-            if (avg_plan - avg_act) >= 10:
-                status_ui = "지연"
-            elif avg_act >= 100:
-                status_ui = "완료"
-            rows.append(
-                {
-                    "프로젝트명": p_name,
-                    "용량(MW)": _extract_capacity_mw(p_name),
-                    "담당자": pm_name,
-                    "진행률_실적%": avg_act,
-                    "계획진행률%": avg_plan,
-                    "상태": status_ui,
-                    "금주_주요": this_w,
-                    "차주_주요": next_w,
-                }
-            )
-        except Exception:
-            pass
-    return pd.DataFrame(rows)
 
+def solar_location_data_version(location: str, hist_df: pd.DataFrame = None) -> str:
+    """지점 이력 버전 — 저장소 파티션 해시 기준 (없으면 이력 내용 해시)"""
+    if SOLAR_STORE_ENABLED and location:
+        entry = _load_solar_manifest()["locations"].get(location) or {}
+        if entry.get("years"):
+            parts = [f"{y}:{(v or {}).get('hash', '')}" for y, v in sorted(entry["years"].items())]
+            return hashlib.md5("|".join(parts).encode("utf-8")).hexdigest()
+    if hist_df is None or hist_df.empty:
+        return ""
+    return frame_signature(hist_df[[c for c in ("날짜", "발전시간", "일사량합계") if c in hist_df.columns]])
 
-def _gemini_api_key():
-    """Cloud Secrets / 로컬 secrets.toml / 환경변수 순으로 후보를 읽음 (이름 오타·앱 혼동 완화)."""
 
-    def _clean(val):
-        if val is None:
-            return ""
-        s = str(val).strip()
-        if not s or s.lower() in ("none", "null", "your-api-key-here"):
-            return ""
-        return s
+def generation_model_version(sh, location: str, site_hist: pd.DataFrame = None) -> str:
+    """
+    다변수 모델 버전 키 — 학습·조회가 같은 기준(지점 전체 이력)으로 계산.
+    저장소 manifest 에 지점이 있으면 파티션 해시, 없으면 지점 전체 이력을 불러와 내용 해시
+    """
+    in_store = SOLAR_STORE_ENABLED and bool((_load_solar_manifest()["locations"].get(location) or {}).get("years"))
+    if site_hist is None and not in_store and sh is not None:
+        site_hist = load_solar_db_df(sh, location=location)
+    return solar_location_data_version(location, site_hist)
+
+
+def _generation_feature_matrix(df: pd.DataFrame) -> np.ndarray:
+    """날짜·일사량·최고/최저기온·운량 → 특징 행렬 (N, len(GENERATION_MV_FEATURES))"""
+    rad = pd.to_numeric(df["일사량"], errors="coerce").to_numpy(dtype=float)
+    tmean = (
+        pd.to_numeric(df["최고기온"], errors="coerce").to_numpy(dtype=float)
+        + pd.to_numeric(df["최저기온"], errors="coerce").to_numpy(dtype=float)
+    ) / 2.0
+    cloud = pd.to_numeric(df["운량"], errors="coerce").to_numpy(dtype=float) / 100.0
+    doy = pd.to_datetime(df["날짜"]).dt.dayofyear.to_numpy(dtype=float)
+    ang = 2.0 * np.pi * doy / 365.25
+    return np.column_stack([rad, rad * (tmean - GENERATION_MV_REF_TEMP), cloud, np.sin(ang), np.cos(ang)])
+
+
+def fit_multivariate_generation_model(train_df: pd.DataFrame) -> Optional[dict]:
+    """
+    train_df: 날짜 | 일사량 | 최고기온 | 최저기온 | 운량 | 발전시간 → 표준화 릿지 회귀 계수 dict (행 부족 시 None)
+    """
+    if train_df is None or train_df.empty:
+        return None
+    X = _generation_feature_matrix(train_df)
+    y = pd.to_numeric(train_df["발전시간"], errors="coerce").to_numpy(dtype=float)
+    ok = np.isfinite(X).all(axis=1) & np.isfinite(y)
+    X, y = X[ok], y[ok]
+    if len(y) < GENERATION_MV_MIN_ROWS:
+        return None
+    mu = X.mean(axis=0)
+    sd = X.std(axis=0)
+    sd[sd == 0] = 1.0
+    Z = (X - mu) / sd
+    coef = np.linalg.solve(Z.T @ Z + GENERATION_MV_RIDGE * np.eye(Z.shape[1]), Z.T @ (y - y.mean()))
+    yhat = Z @ coef + y.mean()
+    ss_tot = float(((y - y.mean()) ** 2).sum())
+    r2 = None if ss_tot <= 0 else 1.0 - float(((y - yhat) ** 2).sum()) / ss_tot
+    return {
+        "method": "multivariate",
+        "features": list(GENERATION_MV_FEATURES),
+        "mean": mu.tolist(),
+        "std": sd.tolist(),
+        "coef": coef.tolist(),
+        "intercept": float(y.mean()),
+        "r2": r2,
+        "n": int(len(y)),
+    }
 
-    k = _clean(os.environ.get("GEMINI_API_KEY"))
-    if k:
-        return k
 
-    try:
-        if "GEMINI_API_KEY" in st.secrets:
-            k = _clean(st.secrets["GEMINI_API_KEY"])
-            if k:
-                return k
-        g = st.secrets.get("gemini") or {}
-        if isinstance(g, dict):
-            k = _clean(g.get("api_key"))
-            if k:
-                return k
-        if "GOOGLE_API_KEY" in st.secrets:
-            k = _clean(st.secrets["GOOGLE_API_KEY"])
-            if k:
-                return k
-    except Exception:
-        pass
-    return ""
+def build_generation_training_frame(location: str, hist_df: pd.DataFrame) -> pd.DataFrame:
+    """지점 이력 + 같은 기간 Open-Meteo Archive 기상(기온·운량) 결합"""
+    if hist_df is None or hist_df.empty:
+        return pd.DataFrame()
+    lat, lon, _ = get_location_lat_lon(location)
+    if lat is None or lon is None:
+        return pd.DataFrame()
+    start = hist_df["날짜"].min().date()
+    end = min(hist_df["날짜"].max().date(), datetime.date.today() - datetime.timedelta(days=SOLAR_ARCHIVE_LAG_DAYS))
+    if end < start:
+        return pd.DataFrame()
+    arch = fetch_open_meteo_archive_daily(
+        lat, lon, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"), daily=ARCHIVE_WEATHER_FIELDS
+    )
+    daily = (arch or {}).get("daily") or {}
+    if not daily.get("time"):
+        return pd.DataFrame()
+    weather = pd.DataFrame({"날짜": pd.to_datetime(daily["time"])})
+    for key, col in FORECAST_DAILY_FIELDS.items():
+        if key != "shortwave_radiation_sum":
+            weather[col] = pd.to_numeric(pd.Series(daily.get(key) or [], dtype="object"), errors="coerce")
+    hist = hist_df[["날짜", "발전시간", "일사량합계"]].rename(columns={"일사량합계": "일사량"})
+    return hist.merge(weather, on="날짜", how="inner")
 
 
-def _gemini_key_debug_hint() -> str:
-    """키 값은 노출하지 않고, 어떤 경로에 값이 있는지만 표시 (Cloud 설정 확인용)."""
-    parts = []
-    env_set = bool((os.environ.get("GEMINI_API_KEY") or "").strip())
-    parts.append(f"- 환경변수 `GEMINI_API_KEY`: {'있음' if env_set else '없음'}")
-    try:
-        sk = st.secrets.get("GEMINI_API_KEY")
-        parts.append(
-            f"- Secrets 최상위 `GEMINI_API_KEY`: {'있음(비어 있지 않음)' if sk is not None and str(sk).strip() else '없음 또는 빈 값'}"
-        )
-        g = st.secrets.get("gemini")
-        if isinstance(g, dict):
-            ga = g.get("api_key")
-            parts.append(
-                f"- `[gemini]` → `api_key`: {'있음' if ga is not None and str(ga).strip() else '없음'}"
-            )
-        gk = st.secrets.get("GOOGLE_API_KEY")
-        parts.append(
-            f"- `GOOGLE_API_KEY` (별칭): {'있음' if gk is not None and str(gk).strip() else '없음'}"
-        )
-    except Exception as e:
-        parts.append(f"- Secrets 읽기 예외: `{e}`")
-    parts.append(
-        f"**→ 앱이 실제 사용할 키: {'인식됨' if _gemini_api_key() else '아직 없음'}**"
+def train_generation_models(sh, locations: list, force: bool = False) -> dict:
+    """
+    오프라인 학습: 지점별 이력 버전이 등록부와 다를 때만 다시 적합해 저장.
+    반환: {"trained": [...], "skipped": [...], "failed": {지점: 사유}}
+    """
+    result = {"trained": [], "skipped": [], "failed": {}}
+    with _generation_registry_lock():
+        reg = load_generation_model_registry()
+        for loc in locations or []:
+            try:
+                hist = load_solar_db_df(sh, location=loc)
+                version = generation_model_version(sh, loc, hist)
+                if not force and (reg.get(loc) or {}).get("version") == version:
+                    result["skipped"].append(loc)
+                    continue
+                model = fit_multivariate_generation_model(build_generation_training_frame(loc, hist))
+                if model is None:
+                    result["failed"][loc] = f"학습 데이터 부족 (기상 결합 {GENERATION_MV_MIN_ROWS}일 미만)"
+                    continue
+                model["version"] = version
+                model["trained_at"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                reg[loc] = model
+                result["trained"].append(loc)
+            except Exception as e:
+                result["failed"][loc] = str(e)
+        _save_generation_model_registry(reg)
+    return result
+
+
+def get_registered_generation_model(sh, location: str, site_hist: pd.DataFrame = None) -> Optional[dict]:
+    """
+    등록부에서 현재 데이터 버전의 다변수 모델 조회 (적합 없음). 버전이 다르면 None.
+    site_hist: 지점 전체 이력 (기간으로 자른 표를 주면 버전이 맞지 않음)
+    """
+    model = load_generation_model_registry().get(location)
+    if not model or model.get("version") != generation_model_version(sh, location, site_hist):
+        return None
+    return model
+
+
+def predict_generation_frame(model: Optional[dict], days_df: pd.DataFrame, fallback: Optional[dict] = None) -> np.ndarray:
+    """
+    일별 기상 표(날짜·일사량·최고/최저기온·운량) → 발전시간 배열.
+    다변수 모델은 계수 곱 한 번, 기상값이 빠진 행은 fallback(일사량 단일 모델)로 채움
+    """
+    rad = pd.to_numeric(days_df["일사량"], errors="coerce").to_numpy(dtype=float)
+    base = predict_generation_hours(fallback, rad)
+    if not model or model.get("method") != "multivariate":
+        return predict_generation_hours(model, rad) if model else base
+    X = _generation_feature_matrix(days_df)
+    pred = ((X - np.asarray(model["mean"])) / np.asarray(model["std"])) @ np.asarray(model["coef"]) + model["intercept"]
+    pred = np.where(np.isfinite(pred), np.clip(pred, 0.0, 24.0), base)
+    return np.where(np.isnan(rad), np.nan, pred)
+
+
+def render_generation_model_registry(sh, sel_loc: str, locations: list) -> None:
+    """다변수 모델 학습 버튼 + 등록 현황"""
+    st.caption(
+        "일사량·온도 감쇠·운량·계절(연중 일자)로 발전시간을 예측하는 지점별 모델입니다. "
+        "학습은 여기서만 수행되고, 예측 화면은 저장된 계수로 계산만 합니다. 데이터가 바뀐 지점만 다시 학습합니다."
     )
-    return "\n".join(parts)
+    c1, c2 = st.columns(2)
+    run_locs = None
+    if c1.button(f"🧠 {sel_loc} 모델 학습", use_container_width=True, key="mv_train_one"):
+        run_locs = [sel_loc]
+    if c2.button("🧠 전 지점 모델 학습", use_container_width=True, key="mv_train_all"):
+        run_locs = list(locations)
+    if run_locs:
+        with st.spinner("기상 이력 조회 및 학습 중..."):
+            res = train_generation_models(sh, run_locs)
+        if res["trained"]:
+            st.success(f"학습 완료: {', '.join(res['trained'])}")
+        if res["skipped"]:
+            st.caption(f"변경 없음(건너뜀): {', '.join(res['skipped'])}")
+        for loc, why in res["failed"].items():
+            st.warning(f"{loc}: {why}")
+    reg = load_generation_model_registry()
+    if not reg:
+        st.info("등록된 다변수 모델이 없습니다.")
+        return
+    rows = []
+    for loc in sorted(reg):
+        m = reg[loc]
+        rows.append(
+            {
+                "지점": loc,
+                "R²": None if m.get("r2") is None else round(float(m["r2"]), 3),
+                "학습일수": m.get("n"),
+                "학습시각": m.get("trained_at"),
+                "최신 데이터": "✅" if m.get("version") == generation_model_version(sh, loc) else "재학습 필요",
+            }
+        )
+    st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
 
 
-def _gemini_user_facing_error(exc: BaseException) -> str:
-    """화면에 키·전체 URL이 노출되지 않도록 정리 (스크린샷 유출 방지)."""
-    if isinstance(exc, requests.HTTPError) and exc.response is not None:
-        code = exc.response.status_code
-        if code == 429:
-            return (
-                "Gemini **요청 한도(429)**에 걸렸습니다. API 키는 이미 전달된 상태입니다. "
-                "1~5분 뒤 다시 시도하거나, [Google AI Studio](https://aistudio.google.com/)에서 "
-                "**사용량·무료 한도**를 확인하세요. (테스트를 짧은 간격으로 많이 누르면 자주 발생합니다.)"
-            )
-        if code == 403:
-            return "Gemini **접근 거부(403)**입니다. API 키 활성화·제한(지역/IP)을 확인하세요."
-        if code == 400:
-            return "Gemini **요청 오류(400)**입니다. 잠시 후 다시 시도해 주세요."
-        return f"Gemini HTTP 오류 ({code}). 잠시 후 다시 시도해 주세요."
-    s = str(exc)
-    s = re.sub(r"key=AIza[A-Za-z0-9_-]{10,}", "key=(숨김)", s)
-    s = re.sub(r"\?key=[^&\s\"']+", "?key=(숨김)", s)
-    return f"Gemini API 오류: {s}"
+# -------------------------------
+# [예측] 백테스트 — Solar_Forecast 저장 예측 vs 지점 시트 실적 (지점·모델·리드타임별 오차)
+# -------------------------------
+BACKTEST_MAPE_MIN_ACTUAL = 0.5  # 실적 발전시간이 이보다 작은 날은 MAPE 에서 제외 (0 나눗셈·과대 왜곡 방지)
 
 
-def call_gemini_summarize_table(df_report: pd.DataFrame):
+def load_solar_forecast_df() -> pd.DataFrame:
+    """Solar_Forecast → 예측 표 (대상일·저장일·리드타임(일) 포함)"""
+    values = cached_get_all_values("pms_db", SOLAR_FORECAST_SHEET)
+    if not values or len(values) < 2:
+        return pd.DataFrame()
+    header = [str(h).strip() for h in values[0]]
+    body = [list(r) + [""] * (len(header) - len(r)) for r in values[1:] if r and any(str(c).strip() for c in r)]
+    df = pd.DataFrame([r[: len(header)] for r in body], columns=header)
+    need = {"날짜", "지점", "예측_발전시간(h)", "예측모델", "저장시각"}
+    if not need.issubset(df.columns):
+        return pd.DataFrame()
+    out = pd.DataFrame(
+        {
+            "날짜": pd.to_datetime(df["날짜"], errors="coerce").dt.normalize(),
+            "지점": df["지점"].astype(str).str.strip(),
+            "예측모델": df["예측모델"].astype(str).str.strip().replace("", "unknown"),
+            "예측_발전시간": pd.to_numeric(df["예측_발전시간(h)"], errors="coerce"),
+            "예보_일사량": pd.to_numeric(df.get("예보_일사량(MJ/m²)"), errors="coerce"),
+            "저장시각": pd.to_datetime(df["저장시각"], errors="coerce"),
+        }
+    ).dropna(subset=["날짜", "예측_발전시간", "저장시각"])
+    out["리드타임"] = (out["날짜"] - out["저장시각"].dt.normalize()).dt.days.astype(int)
+    # 같은 대상일·지점·모델·리드타임을 여러 번 저장했으면 마지막 저장만 사용
+    out = out.sort_values("저장시각").drop_duplicates(subset=["지점", "날짜", "예측모델", "리드타임"], keep="last")
+    return out.reset_index(drop=True)
+
+
+def compute_forecast_scorecard(fc_df: pd.DataFrame, actual_df: pd.DataFrame) -> pd.DataFrame:
     """
-    금주/차주 텍스트를 핵심 위주로 짧게 요약한 열을 추가한 표 반환.
-    secrets: GEMINI_API_KEY 또는 [gemini] api_key
+    예측·실적 결합 후 지점 × 예측모델 × 리드타임 오차를 한 번의 groupby 로 계산.
+    반환 컬럼: 지점 | 예측모델 | 리드타임 | 건수 | MAE | MAPE(%) | 편향 | 일사량_MAE | 일사량_편향
+    (편향 = 예측 - 실적 평균, 양수면 과대예측)
     """
-    key = _gemini_api_key()
-    if not key:
-        return (
-            None,
-            "Gemini API 키를 찾지 못했습니다. **같은 앱**(예: `pjt`의 Secrets)에 "
-            "`GEMINI_API_KEY = \"...\"` 가 있는지 확인하고, 저장 후 **Reboot** 하세요. "
-            "아래 Expander의 진단 표를 참고하세요.",
+    if fc_df is None or fc_df.empty or actual_df is None or actual_df.empty:
+        return pd.DataFrame()
+    act = actual_df[["지점", "날짜", "발전시간", "일사량합계"]].copy()
+    act["날짜"] = pd.to_datetime(act["날짜"]).dt.normalize()
+    j = fc_df.merge(act, on=["지점", "날짜"], how="inner")
+    if j.empty:
+        return pd.DataFrame()
+    err = j["예측_발전시간"].to_numpy(dtype=float) - j["발전시간"].to_numpy(dtype=float)
+    actual = j["발전시간"].to_numpy(dtype=float)
+    j["오차"] = err
+    j["절대오차"] = np.abs(err)
+    j["APE"] = np.where(actual >= BACKTEST_MAPE_MIN_ACTUAL, np.abs(err) / np.where(actual > 0, actual, 1.0) * 100.0, np.nan)
+    rad_err = j["예보_일사량"].to_numpy(dtype=float) - j["일사량합계"].to_numpy(dtype=float)
+    j["일사량_오차"] = rad_err
+    j["일사량_절대오차"] = np.abs(rad_err)
+    card = (
+        j.groupby(["지점", "예측모델", "리드타임"])
+        .agg(
+            건수=("오차", "size"),
+            MAE=("절대오차", "mean"),
+            **{"MAPE(%)": ("APE", "mean")},
+            편향=("오차", "mean"),
+            일사량_MAE=("일사량_절대오차", "mean"),
+            일사량_편향=("일사량_오차", "mean"),
         )
-    if df_report.empty:
-        return None, "요약할 데이터가 없습니다."
-    payload = df_report[
-        ["프로젝트명", "담당자", "진행률_실적%", "금주_주요", "차주_주요"]
-    ].to_dict(orient="records")
-    prompt = (
-        "다음은 프로젝트 주간보고 표(JSON)입니다. 각 항목에 대해 "
-        "'금주_주요_요약', '차주_주요_요약'을 각각 불릿 2~4개 이내로 한국어로 압축하세요. "
-        "원문에 없는 내용은 만들지 마세요. "
-        "응답은 반드시 JSON 배열만 출력하세요. 키: 프로젝트명, 금주_주요_요약, 차주_주요_요약.\n\n"
-        + json.dumps(payload, ensure_ascii=False)
+        .reset_index()
     )
-    url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
-    j = None
-    for attempt in range(5):
-        try:
-            r = requests.post(
-                url,
-                params={"key": key},
-                json={
-                    "contents": [{"parts": [{"text": prompt}]}],
-                    "generationConfig": {"temperature": 0.2, "maxOutputTokens": 8192},
-                },
-                timeout=120,
-            )
-            if r.status_code == 429:
-                if attempt < 4:
-                    time.sleep(min(45, 3 * (2**attempt)))
-                    continue
-                he = requests.HTTPError()
-                he.response = r
-                return None, _gemini_user_facing_error(he)
-            r.raise_for_status()
-            j = r.json()
-            break
-        except requests.HTTPError as e:
-            if e.response is not None and e.response.status_code == 429 and attempt < 4:
-                time.sleep(min(45, 3 * (2**attempt)))
-                continue
-            return None, _gemini_user_facing_error(e)
-        except Exception as e:
-            return None, _gemini_user_facing_error(e)
-    if j is None:
-        return None, "Gemini 응답을 받지 못했습니다."
+    num_cols = ["MAE", "MAPE(%)", "편향", "일사량_MAE", "일사량_편향"]
+    card[num_cols] = card[num_cols].round(3)
+    return card
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _cached_forecast_scorecard(data_version: str, _fc_df: pd.DataFrame, _actual_df: pd.DataFrame) -> pd.DataFrame:
+    return compute_forecast_scorecard(_fc_df, _actual_df)
+
+
+def get_forecast_scorecard(sh) -> tuple:
+    """(scorecard, 예측 행 수) — 예측 시트 버전 + 지점별 실적 버전이 같으면 캐시 재사용"""
+    fc_df = load_solar_forecast_df()
+    if fc_df.empty:
+        return pd.DataFrame(), 0
+    frames, versions = [], [get_snapshot_version("pms_db", SOLAR_FORECAST_SHEET, "values") or frame_signature(fc_df)]
+    start, end = fc_df["날짜"].min(), fc_df["날짜"].max()
+    for loc in sorted(fc_df["지점"].unique()):
+        part = load_solar_db_df(sh, location=loc, start=start, end=end)
+        if part is not None and not part.empty:
+            frames.append(part)
+        versions.append(f"{loc}:{solar_location_data_version(loc, part)}")
+    actual = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    version = hashlib.md5("|".join(versions).encode("utf-8")).hexdigest()
+    return _cached_forecast_scorecard(version, fc_df, actual), len(fc_df)
+
+
+def render_forecast_backtest(sh) -> None:
+    """저장된 예측의 지점·모델·리드타임별 정확도"""
+    if not st.toggle("백테스트 실행", key="forecast_backtest_on"):
+        return
     try:
-        text = j["candidates"][0]["content"]["parts"][0]["text"]
-    except (KeyError, IndexError, TypeError) as e:
-        return None, _gemini_user_facing_error(e)
-    text = text.strip()
-    if text.startswith("```"):
-        text = text.split("\n", 1)[-1]
-        if "```" in text:
-            text = text.rsplit("```", 1)[0]
-        text = text.strip()
+        card, n_fc = get_forecast_scorecard(sh)
+    except Exception as e:
+        st.warning(f"백테스트를 실행하지 못했습니다: {e}")
+        return
+    if card.empty:
+        st.info("실적과 맞춰 볼 수 있는 저장 예측이 없습니다. (Solar_Forecast 의 대상일 실적이 지점 시트에 쌓이면 계산됩니다)")
+        return
+    st.caption(
+        f"저장 예측 {n_fc}건 중 실적과 결합된 {int(card['건수'].sum())}건 · 편향 = 예측 − 실적 (양수: 과대예측) · "
+        f"MAPE 는 실적 {BACKTEST_MAPE_MIN_ACTUAL}h 미만인 날 제외"
+    )
+    horizons = sorted(card["리드타임"].unique().tolist())
+    sel_h = st.multiselect("리드타임(일)", horizons, default=horizons, key="forecast_backtest_h")
+    sub = card[card["리드타임"].isin(sel_h)] if sel_h else card
+    if sub.empty:
+        return
+    # 지점 × 모델 요약 (건수 가중 평균)
+    w = sub["건수"].to_numpy(dtype=float)
+    tmp = sub.assign(
+        _mae=sub["MAE"] * w,
+        _bias=sub["편향"] * w,
+        _mape=sub["MAPE(%)"].fillna(0) * w,
+        _mape_w=np.where(sub["MAPE(%)"].notna(), w, 0.0),
+    )
+    summary = tmp.groupby(["지점", "예측모델"]).agg(
+        건수=("건수", "sum"), _mae=("_mae", "sum"), _bias=("_bias", "sum"), _mape=("_mape", "sum"), _mape_w=("_mape_w", "sum")
+    ).reset_index()
+    summary["MAE"] = (summary["_mae"] / summary["건수"]).round(3)
+    summary["편향"] = (summary["_bias"] / summary["건수"]).round(3)
+    summary["MAPE(%)"] = (summary["_mape"] / summary["_mape_w"].where(summary["_mape_w"] > 0)).round(1)
+    summary["지점 내 최선"] = summary["MAE"] == summary.groupby("지점")["MAE"].transform("min")
+    summary["지점 내 최선"] = summary["지점 내 최선"].map({True: "⭐", False: ""})
+    st.markdown("##### 🏆 지점 × 예측모델")
+    st.dataframe(
+        summary[["지점", "예측모델", "건수", "MAE", "MAPE(%)", "편향", "지점 내 최선"]],
+        use_container_width=True,
+        hide_index=True,
+    )
+    with st.expander("리드타임별 상세", expanded=False):
+        st.dataframe(sub, use_container_width=True, hide_index=True)
+
+
+def calc_planned_progress(start, end, target_date=None):
+    if target_date is None: 
+        target_date = datetime.date.today()
     try:
-        arr = json.loads(text)
-    except json.JSONDecodeError:
-        return None, "Gemini 응답을 JSON으로 파싱하지 못했습니다. 다시 시도해 주세요."
-    sum_df = pd.DataFrame(arr)
-    if sum_df.empty or "프로젝트명" not in sum_df.columns:
-        return None, "요약 결과 형식이 올바르지 않습니다."
-    out = df_report.merge(
-        sum_df[["프로젝트명", "금주_주요_요약", "차주_주요_요약"]],
-        on="프로젝트명",
-        how="left",
+        s = pd.to_datetime(start).date()
+        e = pd.to_datetime(end).date()
+        if pd.isna(s) or pd.isna(e): 
+            return 0.0
+        if target_date < s: 
+            return 0.0
+        if target_date > e: 
+            return 100.0
+        total_days = (e - s).days
+        if total_days <= 0: 
+            return 100.0
+        passed_days = (target_date - s).days
+        return min(100.0, max(0.0, (passed_days / total_days) * 100))
+    except: 
+        return 0.0
+
+
+def _task_duration_days(start, end) -> float:
+    """공정 1건의 가중치 = 일정 기간(일). 날짜 없으면 1일."""
+    try:
+        s = pd.to_datetime(start, errors="coerce")
+        e = pd.to_datetime(end, errors="coerce")
+        if pd.isna(s) or pd.isna(e):
+            return 1.0
+        days = abs((pd.Timestamp(e) - pd.Timestamp(s)).days)
+        return float(max(1, days))
+    except Exception:
+        return 1.0
+
+
+def calc_weighted_progress_mean(df: pd.DataFrame, progress_values: pd.Series) -> float:
+    """
+    공정 진행률의 기간 가중 평균.
+    실적% = Σ(진행률 × 공정일수) / Σ(공정일수)
+    """
+    if df is None or df.empty or progress_values is None or len(progress_values) == 0:
+        return 0.0
+    p = pd.to_numeric(progress_values, errors="coerce").fillna(0).astype(float)
+    if len(df) != len(p):
+        return float(p.mean())
+    weights = df.apply(
+        lambda r: _task_duration_days(r.get("시작일"), r.get("종료일")),
+        axis=1,
+    ).astype(float)
+    total_w = float(weights.sum())
+    if total_w <= 0:
+        return float(p.mean())
+    return float((p * weights).sum() / total_w)
+
+
+def calc_weighted_actual_progress(df: pd.DataFrame) -> float:
+    """실적(실행) 진행률 — 기간 가중 평균"""
+    if df.empty or "진행률" not in df.columns:
+        return 0.0
+    return round(calc_weighted_progress_mean(df, df["진행률"]), 1)
+
+
+def calc_weighted_planned_progress(df: pd.DataFrame, target_date=None) -> float:
+    """계획 진행률 — 기간 가중 평균"""
+    if df.empty:
+        return 0.0
+    planned = df.apply(
+        lambda r: calc_planned_progress(r.get("시작일"), r.get("종료일"), target_date),
+        axis=1,
     )
-    return out, None
+    return round(calc_weighted_progress_mean(df, planned), 1)
+
+
+def _extract_capacity_mw(project_name: str):
+    """
+    프로젝트명 끝의 용량 표기에서 MW 추출.
+    예) '..._1MW', '..._0.4MW', '... 2MW' -> 1.0, 0.4, 2.0
+    """
+    s = str(project_name or "").strip()
+    if not s:
+        return ""
+    m = re.search(r"(?:[_\s-])(\d+(?:\.\d+)?)\s*mw\s*$", s, flags=re.IGNORECASE)
+    if not m:
+        return ""
+    try:
+        return float(m.group(1))
+    except Exception:
+        return ""
+
+
+def _parse_project_head(data: list):
+    """프로젝트 시트 값 → (공정표 DataFrame, PM, 금주, 차주). 대시보드·주간보고 공통 규칙 (2행 H,I,J)"""
+    pm_name = "미지정"
+    this_w = "금주 실적 미입력"
+    next_w = "차주 계획 미입력"
+    if not data:
+        return pd.DataFrame(), pm_name, this_w, next_w
+    header = data[0][:7]
+    df = (
+        pd.DataFrame([r[:7] for r in data[1:]], columns=header)
+        if len(data) > 1
+        else pd.DataFrame(columns=header)
+    )
+    if len(data) > 1 and len(data[1]) > 7 and str(data[1][7]).strip():
+        pm_name = str(data[1][7]).strip()
+    if len(data) > 1 and len(data[1]) > 8 and str(data[1][8]).strip():
+        this_w = str(data[1][8]).strip()
+    if len(data) > 1 and len(data[1]) > 9 and str(data[1][9]).strip():
+        next_w = str(data[1][9]).strip()
+    return df, pm_name, this_w, next_w
+
+
+def _status_from_progress(avg_plan: float, avg_act: float) -> str:
+    """계획−실적 10%p 이상 지연, 실적 100% 완료, 그 외 정상 (대시보드와 동일 규칙)"""
+    if (avg_plan - avg_act) >= 10:
+        return "지연"
+    if avg_act >= 100:
+        return "완료"
+    return "정상"
+
+
+# -------------------------------
+# [포트폴리오] 용량(MW) 가중 진척 롤업 + 주간 S-Curve
+# -------------------------------
+
+def _planned_progress_matrix(starts, ends, dates) -> np.ndarray:
+    """
+    공정(행) × 기준일(열) 계획 진행률(%) — calc_planned_progress 와 같은 규칙을 배열 연산 한 번으로 계산.
+    날짜가 없는 공정은 0%.
+    """
+    s = pd.to_datetime(pd.Series(starts), errors="coerce").to_numpy(dtype="datetime64[D]")
+    e = pd.to_datetime(pd.Series(ends), errors="coerce").to_numpy(dtype="datetime64[D]")
+    t = pd.to_datetime(pd.Series(dates), errors="coerce").to_numpy(dtype="datetime64[D]")
+    valid = ~(np.isnat(s) | np.isnat(e))
+    s_d = np.where(valid, s, np.datetime64(0, "D")).astype("int64")[:, None]
+    e_d = np.where(valid, e, np.datetime64(0, "D")).astype("int64")[:, None]
+    t_d = t.astype("int64")[None, :]
+    total = e_d - s_d
+    with np.errstate(divide="ignore", invalid="ignore"):
+        frac = np.where(total > 0, (t_d - s_d) / np.where(total > 0, total, 1) * 100.0, 100.0)
+    out = np.clip(frac, 0.0, 100.0)
+    # 스칼라와 같은 우선순위: t < 시작 이 t > 종료 보다 먼저 (시작·종료가 뒤바뀐 공정 포함)
+    out = np.where(t_d > e_d, 100.0, out)
+    out = np.where(t_d < s_d, 0.0, out)
+    out[~valid, :] = 0.0
+    return out
+
+
+def _task_duration_weights(starts, ends) -> np.ndarray:
+    """_task_duration_days 벡터 버전 (날짜 없으면 1일)"""
+    s = pd.to_datetime(pd.Series(starts), errors="coerce")
+    e = pd.to_datetime(pd.Series(ends), errors="coerce")
+    days = (e - s).dt.days.abs()
+    return days.clip(lower=1).fillna(1.0).astype(float).to_numpy()
+
+
+def build_portfolio_task_frame(snapshots: dict) -> pd.DataFrame:
+    """프로젝트 스냅샷 묶음 → 전 공정 1개 표 (프로젝트명·대분류·시작일·종료일·진행률·가중치)"""
+    frames = []
+    for p_name, data in (snapshots or {}).items():
+        df, _, _, _ = _parse_project_head(data)
+        if df.empty:
+            continue
+        part = pd.DataFrame(
+            {
+                "프로젝트명": p_name,
+                "대분류": df["대분류"].astype(str).str.strip() if "대분류" in df.columns else "",
+                "시작일": pd.to_datetime(df["시작일"], errors="coerce") if "시작일" in df.columns else pd.NaT,
+                "종료일": pd.to_datetime(df["종료일"], errors="coerce") if "종료일" in df.columns else pd.NaT,
+                "진행률": pd.to_numeric(df["진행률"], errors="coerce").fillna(0).astype(float)
+                if "진행률" in df.columns
+                else 0.0,
+            }
+        )
+        frames.append(part)
+    if not frames:
+        return pd.DataFrame(columns=["프로젝트명", "대분류", "시작일", "종료일", "진행률", "가중치"])
+    out = pd.concat(frames, ignore_index=True)
+    out["가중치"] = _task_duration_weights(out["시작일"], out["종료일"])
+    return out
+
+
+def _mw_weighted_rollup(proj_df: pd.DataFrame, by: str = None) -> pd.DataFrame:
+    """용량(MW) 가중 실적·계획 (그룹 내 용량 표기가 하나도 없으면 단순 평균)"""
+    df = proj_df.copy()
+    cap = pd.to_numeric(df["용량(MW)"], errors="coerce").fillna(0.0)
+    df["_w"] = cap
+    df["_wa"] = cap * df["실적%"]
+    df["_wp"] = cap * df["계획%"]
+    key = by or "_전체"
+    if not by:
+        df[key] = "전체"
+    g = df.groupby(key, sort=True)
+    out = pd.DataFrame(
+        {
+            "프로젝트수": g.size(),
+            "용량합계(MW)": g["_w"].sum(),
+            "_wa": g["_wa"].sum(),
+            "_wp": g["_wp"].sum(),
+            "_ma": g["실적%"].mean(),
+            "_mp": g["계획%"].mean(),
+        }
+    )
+    has_w = out["용량합계(MW)"] > 0
+    denom = out["용량합계(MW)"].where(has_w, 1.0)
+    out["실적%(MW가중)"] = np.where(has_w, out["_wa"] / denom, out["_ma"]).round(1)
+    out["계획%(MW가중)"] = np.where(has_w, out["_wp"] / denom, out["_mp"]).round(1)
+    out["계획−실적(%p)"] = (out["계획%(MW가중)"] - out["실적%(MW가중)"]).round(1)
+    out["용량합계(MW)"] = out["용량합계(MW)"].round(2)
+    out = out.drop(columns=["_wa", "_wp", "_ma", "_mp"]).reset_index()
+    return out.rename(columns={key: by or "구분"})
+
+
+def _portfolio_snapshot_version(snapshots: dict, kind: str = "head_all") -> str:
+    """스냅샷 묶음 버전 — 롤업 캐시 키 (프로젝트별 조회 시점 버전을 이어 붙여 해시)"""
+    parts = [
+        f"{name}:{_sheet_data_signature(data, 'pms_db', str(name), kind)}"
+        for name, data in sorted((snapshots or {}).items(), key=lambda kv: str(kv[0]))
+    ]
+    return hashlib.md5("|".join(parts).encode("utf-8")).hexdigest()
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def compute_portfolio_rollup(version: str, _snapshots: dict, target_date: datetime.date = None) -> dict:
+    """
+    포트폴리오 롤업 (스냅샷 버전별 캐시 — 같은 데이터면 N개 프로젝트 재계산 없음).
+    반환: projects(프로젝트별), total(전체), by_pm(PM별), by_status(상태별), s_curve(주간 계획/실적)
+    """
+    today = target_date or datetime.date.today()
+    snapshots = _snapshots or {}
+    task_df = build_portfolio_task_frame(snapshots)
+
+    meta_rows = []
+    for p_name, data in snapshots.items():
+        _, pm_name, _, _ = _parse_project_head(data)
+        cap = _extract_capacity_mw(p_name)
+        meta_rows.append({"프로젝트명": p_name, "담당자": pm_name, "용량(MW)": cap if cap != "" else np.nan})
+    proj = pd.DataFrame(meta_rows, columns=["프로젝트명", "담당자", "용량(MW)"])
+    if proj.empty:
+        return {"projects": proj, "total": pd.DataFrame(), "by_pm": pd.DataFrame(), "by_status": pd.DataFrame(), "s_curve": pd.DataFrame()}
+
+    if not task_df.empty:
+        w = task_df["가중치"].to_numpy()
+        plan_now = _planned_progress_matrix(task_df["시작일"], task_df["종료일"], [today])[:, 0]
+        agg = pd.DataFrame(
+            {
+                "프로젝트명": task_df["프로젝트명"].to_numpy(),
+                "_w": w,
+                "_wa": task_df["진행률"].to_numpy() * w,
+                "_wp": plan_now * w,
+            }
+        ).groupby("프로젝트명").sum()
+        agg["실적%"] = (agg["_wa"] / agg["_w"]).round(1)
+        agg["계획%"] = (agg["_wp"] / agg["_w"]).round(1)
+        proj = proj.merge(agg[["실적%", "계획%"]], left_on="프로젝트명", right_index=True, how="left")
+    else:
+        proj["실적%"] = np.nan
+        proj["계획%"] = np.nan
+    proj[["실적%", "계획%"]] = proj[["실적%", "계획%"]].fillna(0.0)
+    proj["상태"] = [_status_from_progress(p, a) for p, a in zip(proj["계획%"], proj["실적%"])]
+
+    s_curve = pd.DataFrame(columns=["기준일", "계획%(MW가중)"])
+    dated = task_df.dropna(subset=["시작일", "종료일"]) if not task_df.empty else task_df
+    if not dated.empty:
+        weeks = pd.date_range(dated["시작일"].min(), dated["종료일"].max(), freq="W-MON")
+        if len(weeks) > 0:
+            mat = _planned_progress_matrix(task_df["시작일"], task_df["종료일"], weeks)
+            w = task_df["가중치"].to_numpy()
+            codes, names = pd.factorize(task_df["프로젝트명"])
+            num = np.zeros((len(names), len(weeks)))
+            np.add.at(num, codes, mat * w[:, None])
+            den = np.bincount(codes, weights=w, minlength=len(names))
+            per_proj = num / np.where(den > 0, den, 1.0)[:, None]
+            cap = (
+                pd.to_numeric(proj.set_index("프로젝트명")["용량(MW)"], errors="coerce")
+                .reindex(names)
+                .fillna(0.0)
+                .to_numpy()
+            )
+            if cap.sum() <= 0:
+                cap = np.ones(len(names))
+            s_curve = pd.DataFrame(
+                {
+                    "기준일": weeks.date,
+                    "계획%(MW가중)": np.round(cap @ per_proj / cap.sum(), 2),
+                }
+            )
+
+    return {
+        "projects": proj,
+        "total": _mw_weighted_rollup(proj),
+        "by_pm": _mw_weighted_rollup(proj, "담당자"),
+        "by_status": _mw_weighted_rollup(proj, "상태"),
+        "s_curve": s_curve,
+    }
+
+
+# -------------------------------
+# [진척 이력] 프로젝트별 공정 진행률 스냅샷 (변경 공정만 저장하는 델타 인코딩)
+# -------------------------------
+# progress_history 시트 1행 = 프로젝트 1개 시점
+# - 유형 K(전체): 공정진행률 = [10,50,100,...] (행 순서)
+# - 유형 D(변경): 공정진행률 = {"n": 공정수, "c": {"행번호": 진행률}} — 직전 상태 대비 바뀐 공정만
+
+def _compact_pct(v):
+    try:
+        r = round(float(v), 1)
+    except Exception:
+        return 0
+    return int(r) if r.is_integer() else r
+
+
+def _get_progress_history_worksheet(sh):
+    try:
+        return safe_api_call(sh.worksheet, PROGRESS_HISTORY_SHEET)
+    except WorksheetNotFound:
+        ws = safe_api_call(sh.add_worksheet, title=PROGRESS_HISTORY_SHEET, rows="2000", cols=str(len(PROGRESS_HISTORY_COLUMNS)))
+        safe_api_call(ws.append_row, PROGRESS_HISTORY_COLUMNS)
+        return ws
+
+
+def load_progress_history_df() -> pd.DataFrame:
+    """progress_history 시트 전체 (시트가 없으면 빈 표)"""
+    try:
+        raw = cached_get_all_records("pms_db", PROGRESS_HISTORY_SHEET)
+    except Exception:
+        raw = []
+    if not raw:
+        return pd.DataFrame(columns=PROGRESS_HISTORY_COLUMNS)
+    df = pd.DataFrame(raw)
+    for col in PROGRESS_HISTORY_COLUMNS:
+        if col not in df.columns:
+            df[col] = ""
+    df["날짜"] = df["날짜"].astype(str).str[:10]
+    df["프로젝트명"] = df["프로젝트명"].astype(str).str.strip()
+    return df[PROGRESS_HISTORY_COLUMNS]
+
+
+def _replay_progress_rows(rows: pd.DataFrame):
+    """시간순 이력 행을 재생 → [(행, 공정진행률 목록)], 마지막 K 이후 D 건수"""
+    state = None
+    since_key = 0
+    out = []
+    for _, r in rows.iterrows():
+        try:
+            payload = json.loads(str(r.get("공정진행률", "") or "null"))
+        except Exception:
+            payload = None
+        if str(r.get("유형", "")).strip() == "K" and isinstance(payload, list):
+            state = list(payload)
+            since_key = 0
+        elif state is not None and isinstance(payload, dict):
+            n = int(payload.get("n", len(state)))
+            state = (state + [0] * n)[:n]
+            for k, v in (payload.get("c") or {}).items():
+                i = int(k)
+                if 0 <= i < n:
+                    state[i] = v
+            since_key += 1
+        out.append((r, list(state) if state is not None else None))
+    return out, since_key
+
+
+def decode_progress_history(hist_df: pd.DataFrame, project_name: str) -> pd.DataFrame:
+    """프로젝트 진척 이력 복원 → 날짜별(하루 마지막 기록) 실적%·계획%·지연(%p)·공정진행률"""
+    cols = ["날짜", "실적%", "계획%", "지연(%p)", "공정진행률"]
+    if hist_df is None or hist_df.empty or not project_name:
+        return pd.DataFrame(columns=cols)
+    sub = hist_df[hist_df["프로젝트명"] == str(project_name).strip()]
+    if sub.empty:
+        return pd.DataFrame(columns=cols)
+    replayed, _ = _replay_progress_rows(sub)
+    out = pd.DataFrame(
+        [
+            {
+                "날짜": str(r["날짜"])[:10],
+                "실적%": pd.to_numeric(r.get("실적%"), errors="coerce"),
+                "계획%": pd.to_numeric(r.get("계획%"), errors="coerce"),
+                "공정진행률": values,
+            }
+            for r, values in replayed
+        ]
+    )
+    out = out.drop_duplicates(subset=["날짜"], keep="last").sort_values("날짜").reset_index(drop=True)
+    out["지연(%p)"] = (out["계획%"] - out["실적%"]).round(1)
+    return out[cols]
+
+
+def _build_progress_history_row(hist_df, project_name, schedule_df, today_iso, now_str, force):
+    """기록할 행 1개 (변경 없음·오늘 이미 기록 시 None)"""
+    values = [
+        _compact_pct(v)
+        for v in pd.to_numeric(schedule_df.get("진행률", pd.Series(dtype=float)), errors="coerce").fillna(0)
+    ]
+    act = calc_weighted_actual_progress(schedule_df) if not schedule_df.empty else 0.0
+    plan = calc_weighted_planned_progress(schedule_df) if not schedule_df.empty else 0.0
+    sub = hist_df[hist_df["프로젝트명"] == project_name] if hist_df is not None and not hist_df.empty else None
+    prev, since_key, last_date = None, 0, None
+    if sub is not None and not sub.empty:
+        replayed, since_key = _replay_progress_rows(sub)
+        prev = replayed[-1][1]
+        last_date = str(replayed[-1][0]["날짜"])[:10]
+    if not force and last_date == today_iso:
+        return None
+    if prev is None or since_key >= PROGRESS_KEYFRAME_EVERY:
+        kind, payload = "K", values
+    else:
+        changed = {str(i): v for i, v in enumerate(values) if i >= len(prev) or prev[i] != v}
+        if force and not changed and len(prev) == len(values) and last_date == today_iso:
+            return None
+        kind, payload = "D", {"n": len(values), "c": changed}
+    return [
+        today_iso,
+        project_name,
+        act,
+        plan,
+        kind,
+        json.dumps(payload, ensure_ascii=False, separators=(",", ":")),
+        now_str,
+    ]
+
+
+def record_progress_snapshots(sh, schedule_frames: dict, force: bool = False) -> int:
+    """
+    프로젝트별 공정표 DataFrame → progress_history 에 1회 일괄 추가.
+    force=False: 오늘 기록이 없는 프로젝트만 (일 1회), force=True: 저장 시점 기록 (변경 공정만)
+    """
+    if not schedule_frames:
+        return 0
+    hist_df = load_progress_history_df()
+    today_iso = datetime.date.today().strftime("%Y-%m-%d")
+    now_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    new_rows = []
+    for p_name, sdf in schedule_frames.items():
+        if sdf is None:
+            continue
+        row = _build_progress_history_row(hist_df, str(p_name).strip(), sdf, today_iso, now_str, force)
+        if row:
+            new_rows.append(row)
+    if not new_rows:
+        return 0
+    ws = _get_progress_history_worksheet(sh)
+    safe_api_call(ws.append_rows, new_rows, value_input_option="RAW")
+    cached_get_all_records.clear()
+    clear_file_cache(PROGRESS_HISTORY_SHEET)
+    return len(new_rows)
+
+
+def record_daily_progress_snapshots(sh, snapshots: dict) -> int:
+    """대시보드 로드 시 하루 1번 전체 프로젝트 진척 스냅샷 기록 (실패해도 화면에는 영향 없음)"""
+    today_iso = datetime.date.today().strftime("%Y-%m-%d")
+    marker = _load_file_cache(PROGRESS_SNAPSHOT_DAY_CACHE, 24 * 3600) or {}
+    if marker.get("date") == today_iso:
+        return 0
+    try:
+        frames = {name: _parse_project_head(data)[0] for name, data in (snapshots or {}).items()}
+        cnt = record_progress_snapshots(sh, frames, force=False)
+    except Exception:
+        return 0
+    _save_file_cache(PROGRESS_SNAPSHOT_DAY_CACHE, {"date": today_iso})
+    return cnt
+
+
+# -------------------------------
+# [EVM] SPI·일정편차(일)·예상 완료일 — 프로젝트 / 대분류 단위 일괄 계산
+# -------------------------------
+# - SPI = 실적%(EV) / 계획%(PV), 모두 기간 가중 (calc_weighted_* 와 동일 규칙)
+# - 일정편차(일) = ES − 오늘. ES(Earned Schedule): 계획 곡선이 현재 실적%에 도달하는 날짜
+# - 예상 완료일: 진척 이력(최근 8주 실적 증가 속도)이 있으면 이력 기준, 없으면 ES 방식(시작 + 계획기간 × 경과/ES)
+
+EVM_HISTORY_WINDOW_DAYS = 56
+
+
+def _evm_group_metrics(task_df: pd.DataFrame, keys: list, today: datetime.date) -> pd.DataFrame:
+    """공정 표 → keys(프로젝트명 / 프로젝트명+대분류) 단위 EVM 지표 (주간 격자 배열 연산)"""
+    cols = keys + ["계획%", "실적%", "SPI", "SV(일)", "계획시작일", "계획완료일", "예상완료일(ES)"]
+    if task_df is None or task_df.empty:
+        return pd.DataFrame(columns=cols)
+    today_ts = pd.Timestamp(today)
+    t_min = task_df["시작일"].min()
+    t_max = task_df["종료일"].max()
+    if pd.isna(t_min) or pd.isna(t_max):
+        t_min = t_max = today_ts
+    grid = pd.date_range(min(t_min, today_ts) - pd.Timedelta(days=7), max(t_max, today_ts) + pd.Timedelta(days=7), freq="7D")
+    mat = _planned_progress_matrix(task_df["시작일"], task_df["종료일"], grid)
+    plan_now = _planned_progress_matrix(task_df["시작일"], task_df["종료일"], [today_ts])[:, 0]
+    w = task_df["가중치"].to_numpy()
+
+    group_index = pd.MultiIndex.from_frame(task_df[keys].astype(str))
+    codes, uniques = pd.factorize(group_index)
+    n_g = len(uniques)
+    den = np.bincount(codes, weights=w, minlength=n_g)
+    den = np.where(den > 0, den, 1.0)
+    curve = np.zeros((n_g, len(grid)))
+    np.add.at(curve, codes, mat * w[:, None])
+    curve /= den[:, None]
+    pv = np.bincount(codes, weights=plan_now * w, minlength=n_g) / den
+    ev = np.bincount(codes, weights=task_df["진행률"].to_numpy() * w, minlength=n_g) / den
+
+    starts = pd.Series(task_df["시작일"].to_numpy()).groupby(codes).min().reindex(range(n_g))
+    ends = pd.Series(task_df["종료일"].to_numpy()).groupby(codes).max().reindex(range(n_g))
+
+    # ES: 단조 증가 계획 곡선에서 실적%를 처음 넘는 격자 구간을 찾아 선형 보간
+    grid_d = grid.to_numpy(dtype="datetime64[D]").astype("int64").astype(float)
+    k = (curve < ev[:, None]).sum(axis=1)
+    k_hi = np.clip(k, 0, len(grid) - 1)
+    k_lo = np.clip(k - 1, 0, len(grid) - 1)
+    c_lo = curve[np.arange(n_g), k_lo]
+    c_hi = curve[np.arange(n_g), k_hi]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        frac = np.where(c_hi > c_lo, (ev - c_lo) / (c_hi - c_lo), 0.0)
+    es_d = grid_d[k_lo] + np.clip(frac, 0.0, 1.0) * (grid_d[k_hi] - grid_d[k_lo])
+    today_d = float(np.datetime64(today, "D").astype("int64"))
+    start_d = starts.to_numpy(dtype="datetime64[D]").astype("int64").astype(float)
+    end_d = ends.to_numpy(dtype="datetime64[D]").astype("int64").astype(float)
+    has_dates = ~(starts.isna().to_numpy() | ends.isna().to_numpy())
+    not_started = ev <= 0
+    es_d = np.where(not_started, np.where(pv <= 0, today_d, start_d), es_d)
+    done = ev >= 100
+    sv = es_d - today_d
+    sv = np.where(done, np.maximum(sv, 0.0), sv)
+    sv = np.where(has_dates, sv, np.nan)
+
+    # ES 방식 예상 완료일 = 시작 + 계획기간 × 경과일 / 획득일정
+    elapsed = today_d - start_d
+    earned = es_d - start_d
+    planned_dur = end_d - start_d
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ieac = np.where(earned > 0, start_d + planned_dur * elapsed / earned, np.nan)
+    ieac = np.where(today_d <= start_d, end_d, ieac)
+    ieac = np.where(done | ~has_dates, np.nan, ieac)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        spi = np.where(pv > 0, ev / pv, np.where(ev > 0, np.nan, 1.0))
+
+    def _to_dates(arr):
+        return pd.to_datetime(np.where(np.isnan(arr), np.nan, arr), unit="D", errors="coerce").date
+
+    out = pd.DataFrame(list(uniques), columns=keys)
+    out["계획%"] = np.round(pv, 1)
+    out["실적%"] = np.round(ev, 1)
+    out["SPI"] = np.round(spi, 2)
+    out["SV(일)"] = np.round(sv, 0)
+    out["계획시작일"] = starts.dt.date.to_numpy()
+    out["계획완료일"] = ends.dt.date.to_numpy()
+    out["예상완료일(ES)"] = _to_dates(ieac)
+    return out[cols]
+
+
+def _history_completion_forecast(hist_df: pd.DataFrame, today: datetime.date) -> pd.DataFrame:
+    """진척 이력 최근 8주 실적 증가 속도(%/일)로 프로젝트별 예상 완료일"""
+    cols = ["프로젝트명", "실적속도(%/일)", "예상완료일(이력)"]
+    if hist_df is None or hist_df.empty:
+        return pd.DataFrame(columns=cols)
+    h = hist_df[["프로젝트명", "날짜", "실적%"]].copy()
+    h["날짜"] = pd.to_datetime(h["날짜"], errors="coerce")
+    h["실적%"] = pd.to_numeric(h["실적%"], errors="coerce")
+    h = h.dropna()
+    h = h[h["날짜"] >= pd.Timestamp(today) - pd.Timedelta(days=EVM_HISTORY_WINDOW_DAYS)]
+    if h.empty:
+        return pd.DataFrame(columns=cols)
+    h = h.sort_values(["프로젝트명", "날짜"])
+    g = h.groupby("프로젝트명")
+    span = (g["날짜"].last() - g["날짜"].first()).dt.days.astype(float)
+    gain = g["실적%"].last() - g["실적%"].first()
+    last_act = g["실적%"].last()
+    rate = (gain / span.where(span >= 7)).where(lambda r: r > 0)
+    days_left = ((100.0 - last_act).clip(lower=0) / rate).round()
+    out = pd.DataFrame({"실적속도(%/일)": rate.round(3)})
+    out["예상완료일(이력)"] = [
+        (pd.Timestamp(today) + pd.Timedelta(days=float(d))).date() if pd.notna(d) else None
+        for d in days_left
+    ]
+    return out.reset_index()[cols]
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def compute_portfolio_evm(version: str, history_version: str, _snapshots: dict, _hist_df: pd.DataFrame, today: datetime.date) -> dict:
+    """
+    포트폴리오 EVM (스냅샷·이력 버전별 캐시).
+    반환: projects(프로젝트별 SPI·SV·예상완료일), groups(대분류별)
+    """
+    task_df = build_portfolio_task_frame(_snapshots)
+    projects = _evm_group_metrics(task_df, ["프로젝트명"], today)
+    groups = _evm_group_metrics(task_df, ["프로젝트명", "대분류"], today)
+    hist_fc = _history_completion_forecast(_hist_df, today)
+    projects = projects.merge(hist_fc, on="프로젝트명", how="left")
+    if "예상완료일(이력)" not in projects.columns:
+        projects["예상완료일(이력)"] = None
+    use_hist = projects["예상완료일(이력)"].notna() & (projects["실적%"] < 100)
+    projects["예상완료일"] = np.where(use_hist, projects["예상완료일(이력)"], projects["예상완료일(ES)"])
+    projects["예측근거"] = np.where(use_hist, "실적이력", np.where(projects["예상완료일(ES)"].notna(), "ES", "-"))
+    groups = groups.rename(columns={"예상완료일(ES)": "예상완료일"})
+    return {"projects": projects, "groups": groups}
+
+
+def _progress_history_version(hist_df: pd.DataFrame) -> str:
+    if hist_df is None or hist_df.empty:
+        return "0"
+    last = hist_df.iloc[-1]
+    return f"{len(hist_df)}:{last.get('저장시각', '')}"
+
+
+def get_portfolio_evm(snapshots: dict) -> dict:
+    """대시보드·주간보고 공용 EVM 조회 (스냅샷 버전·이력 버전·오늘 날짜로 캐시)"""
+    hist_df = load_progress_history_df()
+    return compute_portfolio_evm(
+        _portfolio_snapshot_version(snapshots),
+        _progress_history_version(hist_df),
+        snapshots,
+        hist_df,
+        datetime.date.today(),
+    )
+
+
+def _format_evm_caption(evm_row) -> str:
+    if evm_row is None:
+        return ""
+    parts = []
+    spi = evm_row.get("SPI")
+    if spi is not None and pd.notna(spi):
+        parts.append(f"SPI {float(spi):.2f}")
+    sv = evm_row.get("SV(일)")
+    if sv is not None and pd.notna(sv):
+        parts.append(f"일정편차 {int(sv):+d}일")
+    fc = evm_row.get("예상완료일")
+    if fc is not None and pd.notna(fc):
+        parts.append(f"예상완료 {pd.Timestamp(fc).strftime('%Y-%m-%d')}")
+    return " | ".join(parts)
+
+
+def navigate_to_project(p_name):
+    st.session_state.selected_menu = "프로젝트 상세"
+    st.session_state.selected_pjt = p_name
+
+def set_top_menu(menu_name: str):
+    """상단 메뉴 클릭 시 선택 메뉴 변경 (콜백 종료 후 Streamlit이 자동 리런)"""
+    st.session_state.selected_menu = menu_name
+
+
+SCHEDULE_COLUMNS = ["시작일", "종료일", "대분류", "구분", "진행상태", "비고", "진행률"]
+
+
+def _sheet_data_signature(data: list, spreadsheet_name: str = None, worksheet_name: str = None, kind: str = "values") -> str:
+    """
+    구글 시트 원본 데이터 변경 여부 감지용 (엑셀 업로드 후 화면 갱신).
+    시트 이름을 주면 조회 시점에 등록된 스냅샷 버전을 그대로 사용 (없을 때만 직접 해시)
+    """
+    if spreadsheet_name and worksheet_name:
+        version = get_snapshot_version(spreadsheet_name, worksheet_name, kind)
+        if version:
+            return version
+    return _data_content_hash(data)
+
+
+def invalidate_process_edit_cache(project_names=None):
+    """엑셀 업로드·시트 동기화 후 프로젝트 상세 편집기 세션 캐시 무효화"""
+    if project_names is None:
+        st.session_state.pop("process_edit_df", None)
+        st.session_state.pop("process_edit_pjt", None)
+        st.session_state.pop("process_edit_invalidated_pjts", None)
+        return
+    names = {str(p).strip() for p in project_names if str(p).strip()}
+    if not names:
+        return
+    invalidated = set(st.session_state.get("process_edit_invalidated_pjts") or [])
+    invalidated.update(names)
+    st.session_state["process_edit_invalidated_pjts"] = invalidated
+    if st.session_state.get("process_edit_pjt") in names:
+        st.session_state.pop("process_edit_df", None)
+        st.session_state.pop("process_edit_pjt", None)
+
+
+def _excel_cell_to_sheet_str(val) -> str:
+    if val is None or (isinstance(val, float) and pd.isna(val)):
+        return ""
+    if isinstance(val, (datetime.date, datetime.datetime)):
+        return val.strftime("%Y-%m-%d")
+    if hasattr(val, "strftime"):
+        try:
+            return val.strftime("%Y-%m-%d")
+        except Exception:
+            pass
+    s = str(val).strip()
+    if not s or s.lower() in ("nan", "none", "nat"):
+        return ""
+    if len(s) >= 10 and s[4] == "-" and s[7] == "-":
+        return s[:10]
+    try:
+        parsed = pd.to_datetime(s, errors="coerce")
+        if pd.notna(parsed):
+            return parsed.strftime("%Y-%m-%d")
+    except Exception:
+        pass
+    return s
+
+
+def _normalize_excel_schedule_df(df_up: pd.DataFrame) -> pd.DataFrame:
+    """엑셀 시트 → 공정표 A~G열 DataFrame (헤더·빈행·날짜 형식 정리)"""
+    if df_up is None or df_up.empty:
+        return pd.DataFrame(columns=SCHEDULE_COLUMNS)
+
+    df = df_up.copy()
+    df.columns = [str(c).strip() for c in df.columns]
+    rename_map = {}
+    for i, col in enumerate(df.columns):
+        if col in SCHEDULE_COLUMNS:
+            rename_map[col] = col
+        elif i < len(SCHEDULE_COLUMNS):
+            rename_map[col] = SCHEDULE_COLUMNS[i]
+    df = df.rename(columns=rename_map)
+    for col in SCHEDULE_COLUMNS:
+        if col not in df.columns:
+            df[col] = ""
+    df = df[SCHEDULE_COLUMNS]
+    df = df.dropna(how="all")
+    df = df[~df.apply(lambda r: str(r.get("시작일", "")).strip() == "시작일", axis=1)]
+
+    for col in ("시작일", "종료일"):
+        df[col] = df[col].apply(_excel_cell_to_sheet_str)
+    for col in ("대분류", "구분", "진행상태", "비고"):
+        df[col] = df[col].apply(
+            lambda v: "" if pd.isna(v) else str(v).strip().replace("nan", "").replace("None", "")
+        )
+    df["진행률"] = pd.to_numeric(df["진행률"], errors="coerce").fillna(0)
+    return df.reset_index(drop=True)
+
+
+def _extract_pm_weekly_from_sheet_rows(existing_rows: list):
+    pm, this_w, next_w = "", "", ""
+    if len(existing_rows) > 1:
+        row = existing_rows[1]
+        if len(row) > 7:
+            pm = str(row[7]).strip()
+        if len(row) > 8:
+            this_w = str(row[8]).strip()
+        if len(row) > 9:
+            next_w = str(row[9]).strip()
+    return pm, this_w, next_w
+
+
+def _schedule_df_to_sheet_rows(df: pd.DataFrame, pm: str = "", this_w: str = "", next_w: str = "") -> list:
+    """공정표 DataFrame → 구글 시트 A1 형식 (헤더 + PM/금주/차주 열 포함)"""
+    header = SCHEDULE_COLUMNS + ["PM", "금주", "차주"]
+    rows = [header]
+    if df.empty:
+        rows.append([""] * 7 + [pm, this_w, next_w])
+        return rows
+    for i, (_, row) in enumerate(df.iterrows()):
+        r7 = [_excel_cell_to_sheet_str(row[c]) for c in SCHEDULE_COLUMNS]
+        r7[6] = str(int(row["진행률"])) if pd.notna(row["진행률"]) else "0"
+        if i == 0:
+            r7.extend([pm, this_w, next_w])
+        else:
+            r7.extend([pm, "", ""])
+        rows.append(r7)
+    return rows
+
+
+def sync_worksheet_from_excel_df(ws, df_up: pd.DataFrame) -> int:
+    """엑셀 DataFrame을 프로젝트 시트 형식에 맞게 업로드 (PM·금주·차주 유지)"""
+    existing = safe_api_call(ws.get_all_values)
+    pm, this_w, next_w = _extract_pm_weekly_from_sheet_rows(existing)
+    df_norm = _normalize_excel_schedule_df(df_up)
+    full_data = _schedule_df_to_sheet_rows(df_norm, pm, this_w, next_w)
+    safe_api_call(ws.clear)
+    safe_api_call(ws.update, "A1", full_data)
+    return len(df_norm)
+
+
+def _gantt_month_labels(min_d: pd.Timestamp, max_d: pd.Timestamp) -> list:
+    """간트 상단 월 눈금 라벨 (26.4 형식)"""
+    start = pd.Timestamp(year=min_d.year, month=min_d.month, day=1)
+    end = pd.Timestamp(year=max_d.year, month=max_d.month, day=1)
+    months = pd.date_range(start, end, freq="MS")
+    if len(months) == 0:
+        return [f"{min_d.year % 100}.{min_d.month}"]
+    return [f"{d.year % 100}.{d.month}" for d in months]
+
+
+def _render_gantt_month_ruler(min_d: pd.Timestamp, max_d: pd.Timestamp) -> None:
+    """차트 본문 스크롤 시에도 남는 상단 월(년.월) 눈금 — 엑셀 틀 고정 상단 행과 유사"""
+    labels = _gantt_month_labels(min_d, max_d)
+    cells = "".join(f'<span class="gantt-month-cell">{lbl}</span>' for lbl in labels)
+    st.markdown(
+        f"""
+        <div class="gantt-freeze-panel">
+            <div class="gantt-month-ruler-wrap">
+                <div class="gantt-month-ruler-spacer" title="공정명 영역"></div>
+                <div class="gantt-month-ruler-track">{cells}</div>
+            </div>
+        </div>
+        """,
+        unsafe_allow_html=True,
+    )
+
+
+# -------------------------------
+# [간트] 대분류 요약 + 펼치기, 대량 공정은 WebGL 선분 + 행 창(window) 렌더링
+# -------------------------------
+GANTT_ROW_CAP = int(os.environ.get("PMS_GANTT_ROW_CAP", "120"))  # 한 번에 그리는 최대 행 수
+GANTT_SUMMARY_AUTO_ROWS = int(os.environ.get("PMS_GANTT_SUMMARY_ROWS", "60"))  # 공정 수가 이보다 많으면 대분류 요약으로 시작
+GANTT_GL_MIN_ROWS = 60  # 표시 행이 이 이상이면 Scattergl 선분으로 그림 (막대 대비 JSON·렌더링 부담 작음)
+GANTT_LABEL_MAX_LEN = 14
+
+# 진행률별 색상 대비 강화 (0=빨강, 30=주황, 60=노랑·연두, 100=초록)
+GANTT_PROGRESS_COLORSCALE = [
+    [0.0, 'rgb(200, 60, 60)'],
+    [0.2, 'rgb(230, 100, 80)'],
+    [0.4, 'rgb(255, 180, 60)'],
+    [0.6, 'rgb(180, 210, 90)'],
+    [0.8, 'rgb(100, 180, 100)'],
+    [1.0, 'rgb(50, 140, 70)'],
+]
+# WebGL 모드: 진행률 구간별 트레이스 1개씩 (연속 색상 대신 5단계)
+GANTT_PROGRESS_BINS = [
+    (0, 20, 'rgb(200, 60, 60)', "0~20%"),
+    (20, 40, 'rgb(230, 100, 80)', "20~40%"),
+    (40, 60, 'rgb(255, 180, 60)', "40~60%"),
+    (60, 80, 'rgb(180, 210, 90)', "60~80%"),
+    (80, 101, 'rgb(50, 140, 70)', "80~100%"),
+]
+
+
+def _truncate_gantt_label(text: str, max_len: int = GANTT_LABEL_MAX_LEN) -> str:
+    return text if len(text) <= max_len else text[:max_len] + "…"
+
+
+def prepare_gantt_frame(df: pd.DataFrame):
+    """일정 표 → 간트용 표 (날짜·진행률 변환, 잘못된 날짜 행 제외). 반환: (cdf, 제외 행 수)"""
+    cdf = df.copy()
+    original_len = len(cdf)
+    cdf['시작일'] = pd.to_datetime(cdf['시작일'], errors='coerce')
+    cdf['종료일'] = pd.to_datetime(cdf['종료일'], errors='coerce')
+    cdf = cdf.dropna(subset=['시작일', '종료일']).reset_index(drop=True)
+    dropped = original_len - len(cdf)
+    if '대분류' in cdf.columns:
+        cdf['대분류'] = cdf['대분류'].astype(str).replace({'nan': '미지정', '': '미지정', 'None': '미지정'})
+    else:
+        cdf['대분류'] = '미지정'
+    if '구분' not in cdf.columns:
+        cdf['구분'] = '내용 없음'
+    if '진행률' not in cdf.columns:
+        cdf['진행률'] = 0
+    cdf['진행률'] = pd.to_numeric(cdf['진행률'], errors='coerce').fillna(0).astype(float)
+    cdf['행번호'] = np.arange(1, len(cdf) + 1)
+    return cdf, dropped
+
+
+def summarize_gantt_groups(cdf: pd.DataFrame) -> pd.DataFrame:
+    """대분류별 요약 막대: 최소 시작일 ~ 최대 종료일, 기간 가중 진행률"""
+    if cdf.empty:
+        return pd.DataFrame(columns=['대분류', '시작일', '종료일', '공정수', '진행률'])
+    w = (cdf['종료일'] - cdf['시작일']).dt.days.clip(lower=1).astype(float)
+    g = cdf.assign(_w=w, _wp=w * cdf['진행률']).groupby('대분류', sort=False)
+    out = g.agg(
+        시작일=('시작일', 'min'),
+        종료일=('종료일', 'max'),
+        공정수=('구분', 'size'),
+        _w=('_w', 'sum'),
+        _wp=('_wp', 'sum'),
+    ).reset_index()
+    out['진행률'] = (out['_wp'] / out['_w']).round(1)
+    return out.drop(columns=['_w', '_wp'])
+
+
+def build_gantt_rows(cdf: pd.DataFrame, summary_mode: bool, expanded: Optional[list] = None) -> pd.DataFrame:
+    """
+    화면에 그릴 행 목록 (위→아래 순서).
+    요약 모드: 대분류 요약 행 + 펼친 대분류의 세부 공정 행. 전체 모드: 세부 공정 행만.
+    """
+    cols = ['대분류', '라벨', '시작일', '종료일', '진행률', '구분', '수준']
+    tasks = cdf.assign(
+        라벨=(cdf['행번호'].astype(str) + ". " + cdf['구분'].astype(str).str.strip()).map(_truncate_gantt_label),
+        수준=1,
+    )
+    if not summary_mode:
+        return tasks[cols].reset_index(drop=True)
+    expanded = set(expanded or [])
+    summary = summarize_gantt_groups(cdf)
+    summary = summary.assign(
+        라벨=summary['공정수'].map(lambda n: f"▣ 전체 ({n}개)"),
+        구분=summary['대분류'],
+        수준=0,
+    )
+    parts = []
+    for _, srow in summary.iterrows():
+        parts.append(srow.to_frame().T[cols])
+        if srow['대분류'] in expanded:
+            parts.append(tasks.loc[tasks['대분류'] == srow['대분류'], cols])
+    rows = pd.concat(parts, ignore_index=True)
+    rows['시작일'] = pd.to_datetime(rows['시작일'])
+    rows['종료일'] = pd.to_datetime(rows['종료일'])
+    rows['진행률'] = rows['진행률'].astype(float)
+    rows['수준'] = rows['수준'].astype(int)
+    return rows
+
+
+def _gantt_hover_text(rows: pd.DataFrame) -> pd.Series:
+    return (
+        "<b>[" + rows['대분류'].astype(str) + "] " + rows['구분'].astype(str) + "</b><br>시작: "
+        + rows['시작일'].dt.strftime('%Y-%m-%d') + " ~ 종료: " + rows['종료일'].dt.strftime('%Y-%m-%d')
+        + "<br>진행률: " + rows['진행률'].round(0).astype(int).astype(str) + "%"
+    )
+
+
+def _gantt_bar_traces(rows: pd.DataFrame) -> list:
+    """행 수가 적을 때: 대분류/공정 2단 카테고리 막대 (연속 색상)"""
+    duration = (rows['종료일'] - rows['시작일']).dt.total_seconds() * 1000
+    duration = duration.where(duration > 0, 86400000.0)
+    is_group = rows['수준'].to_numpy() == 0
+    return [go.Bar(
+        base=rows['시작일'],
+        x=duration,
+        y=[rows['대분류'].tolist(), rows['라벨'].tolist()],
+        orientation='h',
+        marker=dict(
+            color=rows['진행률'],
+            colorscale=GANTT_PROGRESS_COLORSCALE,
+            cmin=0,
+            cmax=100,
+            showscale=True,
+            colorbar=dict(
+                title=dict(text="진행률(%)", font=dict(size=12)),
+                thickness=18,
+                len=0.7,
+                tickfont=dict(size=11),
+                outlinewidth=1,
+            ),
+            line=dict(
+                width=np.where(is_group, 2.2, 1.2).tolist(),
+                color=np.where(is_group, 'rgba(30,30,30,0.85)', 'rgba(60,60,60,0.5)').tolist(),
+            ),
+        ),
+        text=_gantt_hover_text(rows),
+        hovertemplate="%{text}<extra></extra>",
+        textposition='none',
+    )]
+
+
+def _gantt_gl_traces(rows: pd.DataFrame, line_px: int) -> list:
+    """행 수가 많을 때: 진행률 구간별 Scattergl 굵은 선분 (None 으로 구분한 한 트레이스)"""
+    traces = []
+    pos = np.arange(len(rows), dtype=float)
+    prog = rows['진행률'].to_numpy()
+    hover = _gantt_hover_text(rows).to_numpy()
+    starts = rows['시작일'].to_numpy()
+    ends = rows['종료일'].to_numpy()
+    ends = np.where(ends > starts, ends, starts + np.timedelta64(1, 'D'))
+    for lo, hi, color, name in GANTT_PROGRESS_BINS:
+        idx = np.flatnonzero((prog >= lo) & (prog < hi))
+        if len(idx) == 0:
+            continue
+        n = len(idx)
+        xs = np.empty(n * 3, dtype=object)
+        xs[0::3] = pd.to_datetime(starts[idx])
+        xs[1::3] = pd.to_datetime(ends[idx])
+        xs[2::3] = None
+        ys = np.empty(n * 3, dtype=object)
+        ys[0::3] = pos[idx]
+        ys[1::3] = pos[idx]
+        ys[2::3] = None
+        texts = np.empty(n * 3, dtype=object)
+        texts[0::3] = hover[idx]
+        texts[1::3] = hover[idx]
+        texts[2::3] = None
+        traces.append(go.Scattergl(
+            x=xs,
+            y=ys,
+            mode='lines',
+            line=dict(color=color, width=line_px),
+            name=name,
+            text=texts,
+            hovertemplate="%{text}<extra></extra>",
+            connectgaps=False,
+        ))
+    return traces
+
+
+def build_gantt_figure(rows: pd.DataFrame, use_gl: bool) -> go.Figure:
+    """간트 Figure (rows 순서대로 위→아래). use_gl 이면 WebGL 선분, 아니면 막대"""
+    row_px = 24 if use_gl else 40
+    fig = go.Figure()
+    if use_gl:
+        fig.add_traces(_gantt_gl_traces(rows, line_px=max(6, int(row_px * 0.6))))
+        labels = np.where(
+            rows['수준'].to_numpy() == 0,
+            "<b>" + rows['대분류'].astype(str) + "</b>",
+            "  " + rows['라벨'].astype(str),
+        )
+        fig.update_yaxes(
+            tickmode='array',
+            tickvals=list(range(len(rows))),
+            ticktext=labels.tolist(),
+            range=[len(rows) - 0.5, -0.5],
+        )
+    else:
+        fig.add_traces(_gantt_bar_traces(rows))
+        fig.update_yaxes(
+            autorange="reversed",
+            type="multicategory",
+            categoryorder="trace",
+            dividercolor='rgba(120, 120, 120, 0.6)',
+            dividerwidth=1.2,
+        )
+
+    today_ms = pd.Timestamp.now().normalize().timestamp() * 1000
+    fig.add_vline(
+        x=today_ms,
+        line_width=2.5,
+        line_dash="dash",
+        line_color="rgb(120, 60, 180)",
+        annotation_text=" 오늘 ",
+        annotation_position="bottom",
+        annotation_font=dict(color="rgb(120, 60, 180)", size=12, weight="bold"),
+        annotation_bgcolor="rgba(240,230,255,0.9)",
+        annotation_borderpad=4,
+    )
+    fig.update_xaxes(
+        type="date",
+        side="top",
+        dtick="M1",
+        tickformat="%y.%-m",
+        tickangle=0,
+        tickfont=dict(size=11),
+        showticklabels=False,
+        showgrid=True,
+        gridwidth=1,
+        gridcolor='rgba(200, 200, 200, 0.7)',
+        showline=True,
+        linewidth=1,
+        linecolor='rgba(180, 180, 180, 0.8)',
+        mirror=True,
+        title_text="",
+    )
+    fig.update_yaxes(
+        tickfont=dict(size=10),
+        showgrid=True,
+        gridwidth=1,
+        gridcolor='rgba(200, 200, 200, 0.7)',
+        showline=True,
+        linewidth=1,
+        linecolor='rgba(180, 180, 180, 0.8)',
+        mirror=True,
+        title_text="",
+    )
+    # 좌측 여백 축소 → 차트 영역 확대 (모바일에서 그래프가 크게 보이도록)
+    fig.update_layout(
+        height=max(500 if not use_gl else 360, len(rows) * row_px + 80),
+        bargap=0.25,
+        bargroupgap=0.08,
+        plot_bgcolor='rgb(252,252,252)',
+        paper_bgcolor='white',
+        margin=dict(l=78 if not use_gl else 150, r=88, t=28, b=28),
+        font=dict(family="Pretendard, sans-serif", size=10),
+        showlegend=use_gl,
+        legend=dict(orientation="h", yanchor="bottom", y=1.0, xanchor="right", x=1.0, title_text="진행률"),
+        hovermode="closest",
+    )
+    return fig
+
+
+def render_project_gantt(df: pd.DataFrame, selected_pjt: str, data_sig: str) -> None:
+    """프로젝트 상세 간트 탭: 대분류 요약/전체 모드, 펼치기, 행 창(window) 단위 렌더링"""
+    cdf, dropped_len = prepare_gantt_frame(df)
+    if dropped_len > 0:
+        st.warning(f"⚠️ 날짜 형식 오류(예: 2월 30일 등 존재하지 않는 날짜)로 인해 {dropped_len}개의 항목이 차트에서 제외되었습니다.")
+    if cdf.empty:
+        st.info("차트를 그릴 수 있는 유효한 날짜 데이터가 부족합니다. 편집기에서 날짜를 확인해 주세요.")
+        return
+
+    # 프로젝트 기간 년.월 (26.1 ~ 27.3 형식)
+    min_d = cdf['시작일'].min()
+    max_d = cdf['종료일'].max()
+    period_start = f"{min_d.year % 100}.{min_d.month}"
+    period_end = f"{max_d.year % 100}.{max_d.month}"
+
+    # 상단 고정: 프로젝트 기간 + 월 눈금(스크롤해도 유지)
+    st.markdown(
+        f'<div class="gantt-sticky-header">📅 프로젝트 기간: <strong>{period_start}</strong> ~ <strong>{period_end}</strong></div>',
+        unsafe_allow_html=True
+    )
+    _render_gantt_month_ruler(min_d, max_d)
+
+    groups = list(dict.fromkeys(cdf['대분류'].tolist()))
+    mode_opts = ["대분류 요약", "전체 공정"]
+    c_mode, c_expand = st.columns([1, 3])
+    with c_mode:
+        mode = st.radio(
+            "표시 방식",
+            mode_opts,
+            index=0 if len(cdf) > GANTT_SUMMARY_AUTO_ROWS else 1,
+            horizontal=True,
+            key=f"gantt_mode_{selected_pjt}",
+        )
+    summary_mode = mode == mode_opts[0]
+    expanded = []
+    if summary_mode:
+        with c_expand:
+            expanded = st.multiselect(
+                "펼칠 대분류 (세부 공정 표시)",
+                groups,
+                key=f"gantt_expand_{selected_pjt}",
+            )
+
+    rows = build_gantt_rows(cdf, summary_mode, expanded)
+    total_rows = len(rows)
+    start = 0
+    if total_rows > GANTT_ROW_CAP:
+        windows = list(range(0, total_rows, GANTT_ROW_CAP))
+        labels = [f"{s + 1}~{min(s + GANTT_ROW_CAP, total_rows)}" for s in windows]
+        sel = st.select_slider(
+            f"표시 구간 (전체 {total_rows}행 중 {GANTT_ROW_CAP}행씩)",
+            options=labels,
+            key=f"gantt_window_{selected_pjt}_{mode}",
+        )
+        start = windows[labels.index(sel)]
+        rows = rows.iloc[start:start + GANTT_ROW_CAP].reset_index(drop=True)
+    st.caption("↕ 공정이 많으면 아래 차트 영역만 스크롤됩니다. 상단 기간·월 눈금은 고정됩니다.")
+
+    use_gl = len(rows) >= GANTT_GL_MIN_ROWS
+    fig = get_or_build_figure(
+        "gantt",
+        data_sig,
+        {
+            "mode": mode,
+            "expanded": sorted(expanded),
+            "start": start,
+            "cap": GANTT_ROW_CAP,
+            "today": datetime.date.today(),
+        },
+        lambda: build_gantt_figure(rows, use_gl),
+    )
+    chart_h = fig.layout.height
+    gantt_panel_h = min(720, max(380, min(chart_h, len(rows) * 36 + 90)))
+    with st.container(height=gantt_panel_h, border=True):
+        st.plotly_chart(
+            fig,
+            use_container_width=True,
+            key=f"gantt_chart_{selected_pjt}_{data_sig[:10]}",
+        )
+
+
+def build_s_curve_figure(sdf: pd.DataFrame, hist: pd.DataFrame) -> go.Figure:
+    """프로젝트 S-Curve: 주간 계획 곡선 + 실적 이력 + 현재 실적 (시작일·종료일은 date)"""
+    min_d, max_d = sdf['시작일'].min(), sdf['종료일'].max()
+    d_range = pd.date_range(min_d, max_d, freq='W-MON').date.tolist()
+    p_trend = [
+        calc_weighted_progress_mean(
+            sdf,
+            sdf.apply(
+                lambda r: calc_planned_progress(r['시작일'], r['종료일'], d),
+                axis=1,
+            ),
+        )
+        for d in d_range
+    ]
+    a_prog = calc_weighted_actual_progress(sdf)
+    fig_s = go.Figure()
+    fig_s.add_trace(go.Scatter(x=[d.strftime("%Y-%m-%d") for d in d_range], y=p_trend, mode='lines+markers', name='계획'))
+    if hist is not None and not hist.empty:
+        fig_s.add_trace(go.Scatter(x=hist['날짜'], y=hist['실적%'], mode='lines+markers', name='실적 이력', line=dict(color='red', width=2)))
+    fig_s.add_trace(go.Scatter(x=[datetime.date.today().strftime("%Y-%m-%d")], y=[a_prog], mode='markers', name='현재 실적', marker=dict(size=12, color='red', symbol='star')))
+    fig_s.update_layout(title="진척률 추이 (S-Curve)", yaxis_title="진척률(%)")
+    return fig_s
+
+
+def build_slip_figure(hist: pd.DataFrame) -> go.Figure:
+    """공정 지연 추이 (계획−실적, %p) 막대"""
+    fig_slip = go.Figure()
+    fig_slip.add_trace(go.Bar(x=hist['날짜'], y=hist['지연(%p)'], name='계획−실적', marker_color='rgba(239, 83, 80, 0.75)'))
+    fig_slip.update_layout(title="공정 지연 추이 (계획−실적, %p)", yaxis_title="%p", height=300)
+    return fig_slip
+
+
+def render_print_button():
+    """자바스크립트를 이용해 브라우저 인쇄(PDF 저장) 창을 띄우는 버튼"""
+    components.html(
+        """
+        <script>
+            function printApp() {
+                window.parent.print();
+            }
+        </script>
+        <style>
+            body { margin: 0; padding: 0; background-color: transparent; }
+            .print-btn {
+                float: right;
+                background-color: #f8f9fa;
+                color: #212529;
+                border: 1px solid #dee2e6;
+                padding: 6px 14px;
+                border-radius: 6px;
+                font-size: 13px;
+                font-weight: bold;
+                cursor: pointer;
+                font-family: sans-serif;
+                box-shadow: 0 1px 2px rgba(0,0,0,0.05);
+                transition: all 0.2s;
+            }
+            .print-btn:hover {
+                background-color: #e9ecef;
+                border-color: #ced4da;
+            }
+        </style>
+        <button class="print-btn" onclick="printApp()">🖨️ PDF 저장 / 인쇄</button>
+        """,
+        height=40
+    )
+
+# ---------------------------------------------------------
+# [SECTION 2] 뷰(View) 함수
+# ---------------------------------------------------------
+
+def build_project_status_report_df(pjt_list, snapshots: dict = None):
+    """
+    구글 시트 프로젝트 탭과 동일 규칙으로 집계 (통합 대시보드와 동일 데이터 소스).
+    - PM/금주/차주: 2행 H,I,J
+    - 진행률: 공정표 '진행률' 열 기간(일정) 가중 평균, 계획: 시작~종료일 기준 calc_planned_progress 기간 가중 평균
+    - snapshots: load_portfolio_snapshots 결과 (없으면 병렬 로더로 조회)
+    """
+    if snapshots is None:
+        snapshots = load_portfolio_snapshots(pjt_list)
+    rows = []
+    for p_name in pjt_list:
+        try:
+            data = snapshots.get(p_name)
+            if data is None:
+                continue
+            df, pm_name, this_w, next_w = _parse_project_head(data)
+            if not df.empty and "진행률" in df.columns:
+                avg_act = calc_weighted_actual_progress(df)
+                avg_plan = calc_weighted_planned_progress(df)
+            else:
+                avg_act = 0.0
+                avg_plan = 0.0
+            status_ui = _status_from_progress(avg_plan, avg_act)
+            rows.append(
+                {
+                    "프로젝트명": p_name,
+                    "용량(MW)": _extract_capacity_mw(p_name),
+                    "담당자": pm_name,
+                    "진행률_실적%": avg_act,
+                    "계획진행률%": avg_plan,
+                    "상태": status_ui,
+                    "금주_주요": this_w,
+                    "차주_주요": next_w,
+                }
+            )
+        except Exception:
+            pass
+    return pd.DataFrame(rows)
+
+
+def _gemini_api_key():
+    """Cloud Secrets / 로컬 secrets.toml / 환경변수 순으로 후보를 읽음 (이름 오타·앱 혼동 완화)."""
+
+    def _clean(val):
+        if val is None:
+            return ""
+        s = str(val).strip()
+        if not s or s.lower() in ("none", "null", "your-api-key-here"):
+            return ""
+        return s
+
+    k = _clean(os.environ.get("GEMINI_API_KEY"))
+    if k:
+        return k
+
+    try:
+        if "GEMINI_API_KEY" in st.secrets:
+            k = _clean(st.secrets["GEMINI_API_KEY"])
+            if k:
+                return k
+        g = st.secrets.get("gemini") or {}
+        if isinstance(g, dict):
+            k = _clean(g.get("api_key"))
+            if k:
+                return k
+        if "GOOGLE_API_KEY" in st.secrets:
+            k = _clean(st.secrets["GOOGLE_API_KEY"])
+            if k:
+                return k
+    except Exception:
+        pass
+    return ""
+
+
+def _gemini_key_debug_hint() -> str:
+    """키 값은 노출하지 않고, 어떤 경로에 값이 있는지만 표시 (Cloud 설정 확인용)."""
+    parts = []
+    env_set = bool((os.environ.get("GEMINI_API_KEY") or "").strip())
+    parts.append(f"- 환경변수 `GEMINI_API_KEY`: {'있음' if env_set else '없음'}")
+    try:
+        sk = st.secrets.get("GEMINI_API_KEY")
+        parts.append(
+            f"- Secrets 최상위 `GEMINI_API_KEY`: {'있음(비어 있지 않음)' if sk is not None and str(sk).strip() else '없음 또는 빈 값'}"
+        )
+        g = st.secrets.get("gemini")
+        if isinstance(g, dict):
+            ga = g.get("api_key")
+            parts.append(
+                f"- `[gemini]` → `api_key`: {'있음' if ga is not None and str(ga).strip() else '없음'}"
+            )
+        gk = st.secrets.get("GOOGLE_API_KEY")
+        parts.append(
+            f"- `GOOGLE_API_KEY` (별칭): {'있음' if gk is not None and str(gk).strip() else '없음'}"
+        )
+    except Exception as e:
+        parts.append(f"- Secrets 읽기 예외: `{e}`")
+    parts.append(
+        f"**→ 앱이 실제 사용할 키: {'인식됨' if _gemini_api_key() else '아직 없음'}**"
+    )
+    return "\n".join(parts)
+
+
+def _gemini_user_facing_error(exc: BaseException) -> str:
+    """화면에 키·전체 URL이 노출되지 않도록 정리 (스크린샷 유출 방지)."""
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        code = exc.response.status_code
+        if code == 429:
+            return (
+                "Gemini **요청 한도(429)**에 걸렸습니다. API 키는 이미 전달된 상태입니다. "
+                "1~5분 뒤 다시 시도하거나, [Google AI Studio](https://aistudio.google.com/)에서 "
+                "**사용량·무료 한도**를 확인하세요. (테스트를 짧은 간격으로 많이 누르면 자주 발생합니다.)"
+            )
+        if code == 403:
+            return "Gemini **접근 거부(403)**입니다. API 키 활성화·제한(지역/IP)을 확인하세요."
+        if code == 400:
+            return "Gemini **요청 오류(400)**입니다. 잠시 후 다시 시도해 주세요."
+        return f"Gemini HTTP 오류 ({code}). 잠시 후 다시 시도해 주세요."
+    s = str(exc)
+    s = re.sub(r"key=AIza[A-Za-z0-9_-]{10,}", "key=(숨김)", s)
+    s = re.sub(r"\?key=[^&\s\"']+", "?key=(숨김)", s)
+    return f"Gemini API 오류: {s}"
+
+
+def call_gemini_summarize_table(df_report: pd.DataFrame):
+    """
+    금주/차주 텍스트를 핵심 위주로 짧게 요약한 열을 추가한 표 반환.
+    secrets: GEMINI_API_KEY 또는 [gemini] api_key
+    """
+    key = _gemini_api_key()
+    if not key:
+        return (
+            None,
+            "Gemini API 키를 찾지 못했습니다. **같은 앱**(예: `pjt`의 Secrets)에 "
+            "`GEMINI_API_KEY = \"...\"` 가 있는지 확인하고, 저장 후 **Reboot** 하세요. "
+            "아래 Expander의 진단 표를 참고하세요.",
+        )
+    if df_report.empty:
+        return None, "요약할 데이터가 없습니다."
+    payload = df_report[
+        ["프로젝트명", "담당자", "진행률_실적%", "금주_주요", "차주_주요"]
+    ].to_dict(orient="records")
+    prompt = (
+        "다음은 프로젝트 주간보고 표(JSON)입니다. 각 항목에 대해 "
+        "'금주_주요_요약', '차주_주요_요약'을 각각 불릿 2~4개 이내로 한국어로 압축하세요. "
+        "원문에 없는 내용은 만들지 마세요. "
+        "응답은 반드시 JSON 배열만 출력하세요. 키: 프로젝트명, 금주_주요_요약, 차주_주요_요약.\n\n"
+        + json.dumps(payload, ensure_ascii=False)
+    )
+    url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
+    j = None
+    for attempt in range(5):
+        try:
+            r = requests.post(
+                url,
+                params={"key": key},
+                json={
+                    "contents": [{"parts": [{"text": prompt}]}],
+                    "generationConfig": {"temperature": 0.2, "maxOutputTokens": 8192},
+                },
+                timeout=120,
+            )
+            if r.status_code == 429:
+                if attempt < 4:
+                    time.sleep(min(45, 3 * (2**attempt)))
+                    continue
+                he = requests.HTTPError()
+                he.response = r
+                return None, _gemini_user_facing_error(he)
+            r.raise_for_status()
+            j = r.json()
+            break
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 429 and attempt < 4:
+                time.sleep(min(45, 3 * (2**attempt)))
+                continue
+            return None, _gemini_user_facing_error(e)
+        except Exception as e:
+            return None, _gemini_user_facing_error(e)
+    if j is None:
+        return None, "Gemini 응답을 받지 못했습니다."
+    try:
+        text = j["candidates"][0]["content"]["parts"][0]["text"]
+    except (KeyError, IndexError, TypeError) as e:
+        return None, _gemini_user_facing_error(e)
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[-1]
+        if "```" in text:
+            text = text.rsplit("```", 1)[0]
+        text = text.strip()
+    try:
+        arr = json.loads(text)
+    except json.JSONDecodeError:
+        return None, "Gemini 응답을 JSON으로 파싱하지 못했습니다. 다시 시도해 주세요."
+    sum_df = pd.DataFrame(arr)
+    if sum_df.empty or "프로젝트명" not in sum_df.columns:
+        return None, "요약 결과 형식이 올바르지 않습니다."
+    out = df_report.merge(
+        sum_df[["프로젝트명", "금주_주요_요약", "차주_주요_요약"]],
+        on="프로젝트명",
+        how="left",
+    )
+    return out, None
+
+
+# 1. 통합 대시보드
+def view_dashboard(sh, pjt_list):
+    if "dashboard_report_font_size" not in st.session_state:
+        st.session_state.dashboard_report_font_size = 12
+    col_title, col_right = st.columns([7, 2])
+    with col_title:
+        st.title("📊 통합 대시보드 (현황 브리핑)")
+    with col_right:
+        render_print_button()
+        report_font = st.slider("📝 보고 글자 크기", min_value=10, max_value=20, value=int(st.session_state.dashboard_report_font_size), step=1, key="dashboard_font_slider")
+        st.session_state.dashboard_report_font_size = float(report_font)
+    
+    dashboard_data = []
+    
+    progress_bar, progress_cb = _portfolio_progress_callback("프로젝트 데이터를 불러오는 중…")
+    snapshots = load_portfolio_snapshots(pjt_list, progress_cb=progress_cb)
+    progress_bar.empty()
+    record_daily_progress_snapshots(sh, snapshots)
+    try:
+        evm_map = get_portfolio_evm(snapshots)["projects"].set_index("프로젝트명").to_dict("index")
+    except Exception:
+        evm_map = {}
+
+    with st.spinner("프로젝트 데이터를 분석 중입니다..."):
+        for p_name in pjt_list:
+            try:
+                # ★ 성능 개선: 전체가 아니라 상단 일부만 + 캐시 사용 (병렬 로더 결과)
+                data = snapshots.get(p_name)
+                if data is None:
+                    continue
+                
+                df, pm_name, this_w, next_w = _parse_project_head(data)
+
+                if not df.empty and '진행률' in df.columns:
+                    avg_act = calc_weighted_actual_progress(df)
+                    avg_plan = calc_weighted_planned_progress(df)
+                else:
+                    avg_act = 0.0; avg_plan = 0.0
+                
+                status_key = "정상"
+                status_ui = "🟢 정상"
+                b_style = "status-normal"
+                if (avg_plan - avg_act) >= 10:
+                    status_key = "지연"
+                    status_ui = "🔴 지연"
+                    b_style = "status-delay"
+                elif avg_act >= 100:
+                    status_key = "완료"
+                    status_ui = "🔵 완료"
+                    b_style = "status-done"
+                
+                dashboard_data.append({
+                    "p_name": p_name,
+                    "pm_name": pm_name,
+                    "this_w": this_w,
+                    "next_w": next_w,
+                    "avg_act": avg_act,
+                    "avg_plan": avg_plan,
+                    "status_key": status_key,
+                    "status_ui": status_ui,
+                    "b_style": b_style,
+                    "evm": evm_map.get(p_name),
+                })
+            except Exception:
+                # 개별 프로젝트 오류는 무시하고 계속
+                pass
+
+    all_pms = sorted(list(set([d["pm_name"] for d in dashboard_data])))
+    
+    _STATUS_FILTER_OPTS = ["🟢 정상", "🔴 지연", "🔵 완료"]
+    _STATUS_KEY_MAP = {"🟢 정상": "정상", "🔴 지연": "지연", "🔵 완료": "완료"}
+
+    _EVM_SORT_OPTS = ["기본(시트 순)", "SPI 낮은 순", "일정편차(지연일) 큰 순", "예상완료 늦은 순"]
+
+    f_col1, f_col2, f_col_sort, f_col3 = st.columns([1, 1.2, 1, 2.4])
+    with f_col1:
+        selected_pm = st.selectbox("👤 담당자 조회", ["전체"] + all_pms, key="dashboard_pm_filter")
+    with f_col2:
+        selected_status_labels = st.multiselect(
+            "📌 상태 필터",
+            _STATUS_FILTER_OPTS,
+            default=["🟢 정상", "🔴 지연"],
+            help="기본값은 진행 중(정상·지연)만 표시합니다. 완료 프로젝트는 '🔵 완료'를 선택하세요.",
+            key="dashboard_status_filter",
+        )
+        selected_status_keys = {_STATUS_KEY_MAP[l] for l in selected_status_labels}
+    with f_col_sort:
+        evm_sort = st.selectbox("↕️ 정렬 (EVM)", _EVM_SORT_OPTS, key="dashboard_evm_sort")
+        spi_only = st.checkbox("SPI 0.9 미만만", value=False, key="dashboard_spi_filter")
+
+    if selected_pm != "전체":
+        pm_filtered = [d for d in dashboard_data if d["pm_name"] == selected_pm]
+    else:
+        pm_filtered = dashboard_data
+
+    if selected_status_keys:
+        filtered_data = [d for d in pm_filtered if d["status_key"] in selected_status_keys]
+    else:
+        filtered_data = []
+
+    def _evm_value(d, key):
+        v = (d.get("evm") or {}).get(key)
+        return None if v is None or pd.isna(v) else v
+
+    if spi_only:
+        filtered_data = [d for d in filtered_data if _evm_value(d, "SPI") is not None and _evm_value(d, "SPI") < 0.9]
+    if evm_sort == "SPI 낮은 순":
+        filtered_data = sorted(filtered_data, key=lambda d: (_evm_value(d, "SPI") is None, _evm_value(d, "SPI") or 0))
+    elif evm_sort == "일정편차(지연일) 큰 순":
+        filtered_data = sorted(filtered_data, key=lambda d: (_evm_value(d, "SV(일)") is None, _evm_value(d, "SV(일)") or 0))
+    elif evm_sort == "예상완료 늦은 순":
+        filtered_data = sorted(
+            filtered_data,
+            key=lambda d: (_evm_value(d, "예상완료일") is None, pd.Timestamp(_evm_value(d, "예상완료일") or "1900-01-01")),
+            reverse=True,
+        )
+
+    pool_cnt = len(pm_filtered)
+    display_cnt = len(filtered_data)
+    normal_cnt = len([d for d in pm_filtered if d["status_key"] == "정상"])
+    delay_cnt = len([d for d in pm_filtered if d["status_key"] == "지연"])
+    done_cnt = len([d for d in pm_filtered if d["status_key"] == "완료"])
+    pool_hint = (
+        f" <span style='opacity:0.75;font-size:12px;'>(전체 {pool_cnt}건)</span>"
+        if pool_cnt != display_cnt
+        else ""
+    )
+
+    with f_col3:
+        st.markdown(f"""
+            <div class="metric-container" style="display: flex; gap: 10px; align-items: center; height: 100%; padding-top: 28px; flex-wrap: wrap;">
+                <div style="background: rgba(128,128,128,0.1); padding: 7px 12px; border-radius: 6px; font-weight: bold; font-size: 13px;">
+                    📊 표시: <span style="color: #2196f3; font-size: 15px;">{display_cnt}</span>건{pool_hint}
+                </div>
+                <div style="background: rgba(33,150,243,0.1); padding: 7px 12px; border-radius: 6px; font-weight: bold; font-size: 13px; color: #1976d2;">
+                    🟢 정상: {normal_cnt}건
+                </div>
+                <div style="background: rgba(244,67,54,0.1); padding: 7px 12px; border-radius: 6px; font-weight: bold; font-size: 13px; color: #d32f2f;">
+                    🔴 지연: {delay_cnt}건
+                </div>
+                <div style="background: rgba(76,175,80,0.1); padding: 7px 12px; border-radius: 6px; font-weight: bold; font-size: 13px; color: #388e3c;">
+                    🔵 완료: {done_cnt}건
+                </div>
+            </div>
+        """, unsafe_allow_html=True)
+        
+    st.divider()
+
+    if not selected_status_keys:
+        st.info("상태 필터에서 하나 이상을 선택해 주세요. (기본: 정상·지연)")
+    elif display_cnt == 0:
+        st.info("선택한 담당자·상태 조건에 맞는 프로젝트가 없습니다. 완료 건은 상태 필터에 '🔵 완료'를 추가하세요.")
+    else:
+        daily_df = load_daily_report_df(sh)
+        for d in filtered_data:
+            with st.container(border=True):
+                h_col1, h_col2 = st.columns([7.5, 2.5], gap="small")
+
+                with h_col1:
+                    st.markdown(f"""
+                        <div style="display: flex; align-items: center; flex-wrap: wrap; gap: 6px; margin-top: 2px;">
+                            <h4 style="font-weight:700; margin:0; font-size:clamp(13.5px, 3.5vw, 16px); word-break:keep-all; line-height:1.2;">
+                                🏗️ {d['p_name']}
+                            </h4>
+                            <span class="pm-tag" style="margin:0;">PM: {d['pm_name']}</span>
+                            <span class="status-badge {d['b_style']}" style="margin:0;">{d['status_ui']}</span>
+                        </div>
+                    """, unsafe_allow_html=True)
+
+                with h_col2:
+                    st.button("🔍 상세", key=f"btn_go_{d['p_name']}", on_click=navigate_to_project, args=(d['p_name'],), use_container_width=True)
+
+                weekly_col, daily_col = st.columns([0.85, 1.35], gap="medium")
+                fs = st.session_state.get("dashboard_report_font_size", 12)
+                this_w_html = html_module.escape(str(d['this_w'])).replace('\n', '<br>')
+                next_w_html = html_module.escape(str(d['next_w'])).replace('\n', '<br>')
+
+                with weekly_col:
+                    st.markdown('<p class="dashboard-report-split-title">📋 주간보고</p>', unsafe_allow_html=True)
+                    st.markdown(f'''
+                        <div style="margin-bottom:4px;">
+                            <p style="font-size:{fs}px; opacity: 0.7; margin-top:0; margin-bottom:4px;">계획: {d['avg_plan']}% | 실적: {d['avg_act']}%{(' | ' + _format_evm_caption(d.get('evm'))) if d.get('evm') else ''}</p>
+                            <div class="weekly-box" style="margin-top:0; font-size:{fs}px;">
+                                <div style="margin-bottom: 8px;"><b>[금주]</b><br>{this_w_html}</div>
+                                <div><b>[차주]</b><br>{next_w_html}</div>
+                            </div>
+                        </div>
+                    ''', unsafe_allow_html=True)
+                    st.progress(min(1.0, max(0.0, d['avg_act']/100)))
+
+                with daily_col:
+                    st.markdown('<p class="dashboard-report-split-title">📋 일일보고</p>', unsafe_allow_html=True)
+                    dr_date, dr_rows = _get_latest_daily_report_for_project(daily_df, d['p_name'])
+                    if dr_rows:
+                        st.caption(f"최근 일자: {_daily_report_date_korean(dr_date)}")
+                        _render_daily_report_section_table(
+                            dr_rows,
+                            dr_date,
+                            project_name=None,
+                            compact=True,
+                        )
+                    else:
+                        st.markdown(
+                            '<div class="weekly-box" style="font-size:12px; opacity:0.85;">'
+                            "저장된 일일보고가 없습니다.<br>"
+                            "<span style='font-size:11px;'>일일보고 메뉴에서 작성·업로드하세요.</span>"
+                            "</div>",
+                            unsafe_allow_html=True,
+                        )
+
+
+def render_portfolio_rollup(snapshots: dict):
+    """포트폴리오 전체·PM별·상태별 MW 가중 진척 + 주간 포트폴리오 S-Curve"""
+    rollup = compute_portfolio_rollup(_portfolio_snapshot_version(snapshots), snapshots, datetime.date.today())
+    proj = rollup["projects"]
+    if proj.empty:
+        st.info("집계할 프로젝트가 없습니다.")
+        return
+    no_cap = int(pd.to_numeric(proj["용량(MW)"], errors="coerce").isna().sum())
+    st.caption(
+        "프로젝트명 끝의 용량 표기(예: `_1MW`)로 가중합니다. "
+        + (f"용량 표기가 없는 **{no_cap}건**은 MW 가중에서 제외됩니다." if no_cap else "")
+    )
+    total = rollup["total"]
+    if not total.empty:
+        t = total.iloc[0]
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("프로젝트 수", f"{int(t['프로젝트수'])}건")
+        m2.metric("총 용량", f"{float(t['용량합계(MW)']):,.2f} MW")
+        m3.metric("계획(MW 가중)", f"{float(t['계획%(MW가중)']):.1f}%")
+        m4.metric(
+            "실적(MW 가중)",
+            f"{float(t['실적%(MW가중)']):.1f}%",
+            delta=f"{-float(t['계획−실적(%p)']):+.1f}%p",
+        )
+    c1, c2 = st.columns(2)
+    with c1:
+        st.markdown("##### 👤 PM별")
+        st.dataframe(rollup["by_pm"], use_container_width=True, hide_index=True)
+    with c2:
+        st.markdown("##### 📌 상태별")
+        st.dataframe(rollup["by_status"], use_container_width=True, hide_index=True)
+
+    s_curve = rollup["s_curve"]
+    if not s_curve.empty:
+        fig_p = go.Figure()
+        fig_p.add_trace(
+            go.Scatter(
+                x=[d.strftime("%Y-%m-%d") for d in s_curve["기준일"]],
+                y=s_curve["계획%(MW가중)"],
+                mode="lines",
+                name="포트폴리오 계획",
+            )
+        )
+        if not total.empty:
+            fig_p.add_trace(
+                go.Scatter(
+                    x=[datetime.date.today().strftime("%Y-%m-%d")],
+                    y=[float(total.iloc[0]["실적%(MW가중)"])],
+                    mode="markers",
+                    name="현재 실적",
+                    marker=dict(size=12, color="red", symbol="star"),
+                )
+            )
+        fig_p.update_layout(title="포트폴리오 진척률 추이 (S-Curve, MW 가중)", yaxis_title="진척률(%)", height=380)
+        st.plotly_chart(fig_p, use_container_width=True)
+
+
+def view_weekly_final_report(sh, pjt_list):
+    """프로젝트별 진행 현황 표 + 엑셀 다운로드 (선택: Gemini 요약)"""
+    col_title, col_btn = st.columns([7, 2])
+    with col_title:
+        st.title("📋 프로젝트별 주간 최종 보고 (표)")
+    with col_btn:
+        render_print_button()
+    st.caption(
+        "데이터는 구글 시트 `pms_db`의 각 프로젝트 시트와 동일합니다. "
+        "**실적·계획%**는 공정별 진행률을 **일정 기간(종료일−시작일)으로 가중**한 평균입니다."
+    )
+
+    progress_bar, progress_cb = _portfolio_progress_callback("프로젝트별 데이터를 불러오는 중…")
+    snapshots = load_portfolio_snapshots(pjt_list, progress_cb=progress_cb)
+    progress_bar.empty()
+    report_df = build_project_status_report_df(pjt_list, snapshots)
+    evm = get_portfolio_evm(snapshots)
+    if not report_df.empty and not evm["projects"].empty:
+        report_df = report_df.merge(
+            evm["projects"][["프로젝트명", "SPI", "SV(일)", "예상완료일"]],
+            on="프로젝트명",
+            how="left",
+        )
+
+    if report_df.empty:
+        st.info("표시할 프로젝트가 없습니다.")
+        return
+
+    all_pms = sorted(report_df["담당자"].dropna().unique().tolist())
+    f1, f2 = st.columns([1, 3])
+    with f1:
+        pm_sel = st.selectbox("담당자 필터", ["전체"] + all_pms, key="report_pm_filter")
+    base_df = st.session_state.get("gemini_summary_df")
+    display_df = base_df if base_df is not None else report_df
+    filt = display_df if pm_sel == "전체" else display_df[display_df["담당자"] == pm_sel]
+
+    st.metric("조회 건수", f"{len(filt)}건")
+    show_df = filt.copy()
+    show_df = show_df.reset_index(drop=True)
+    show_df.insert(0, "순번", range(1, len(show_df) + 1))
+
+    # 표 표시용 컬럼명/순서 정리
+    rename_map = {
+        "용량(MW)": "용량",
+        "계획진행률%": "계획",
+        "진행률_실적%": "실적",
+        "금주_주요": "금주",
+        "차주_주요": "차주",
+    }
+    show_df = show_df.rename(columns=rename_map)
+
+    base_cols = [
+        "순번",
+        "프로젝트명",
+        "용량",
+        "담당자",
+        "계획",
+        "실적",
+        "상태",
+        "SPI",
+        "SV(일)",
+        "예상완료일",
+        "금주",
+        "차주",
+    ]
+    extra_cols = [c for c in ["금주_주요_요약", "차주_주요_요약"] if c in show_df.columns]
+    ordered_cols = [c for c in base_cols if c in show_df.columns] + extra_cols
+    show_df = show_df[ordered_cols]
+
+    st.dataframe(show_df, use_container_width=True, height=min(520, 120 + len(show_df) * 36))
+
+    with st.expander("🏭 포트폴리오 현황 (용량 MW 가중)", expanded=False):
+        render_portfolio_rollup(snapshots)
+
+    with st.expander("📐 대분류별 일정 성과 (SPI·일정편차·예상완료)", expanded=False):
+        st.caption(
+            "SPI = 실적% ÷ 계획% (기간 가중). 일정편차(일)는 계획 곡선이 현재 실적%에 도달하는 날짜(ES)와 오늘의 차이입니다. "
+            "음수면 계획보다 늦습니다."
+        )
+        groups = evm["groups"]
+        if pm_sel != "전체":
+            groups = groups[groups["프로젝트명"].isin(filt["프로젝트명"])]
+        st.dataframe(
+            groups.sort_values(["SPI"], na_position="last"),
+            use_container_width=True,
+            hide_index=True,
+            height=min(520, 120 + len(groups) * 36),
+        )
+
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        buf = io.BytesIO()
+        with pd.ExcelWriter(buf, engine="openpyxl") as writer:
+            show_df.to_excel(writer, index=False, sheet_name="주간최종보고")
+        st.download_button(
+            label="📥 엑셀(xlsx) 다운로드",
+            data=buf.getvalue(),
+            file_name=f"프로젝트별_주간최종보고_{datetime.date.today()}.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            use_container_width=True,
+        )
+    with c2:
+        if st.button("🔄 원본 표로 초기화", use_container_width=True):
+            st.session_state["gemini_summary_df"] = None
+            st.rerun()
+    with c3:
+        pass
+
+    with st.expander("✨ Gemini로 금주·차주 요약 열 추가", expanded=False):
+        st.markdown(
+            "로컬은 `.streamlit/secrets.toml`, **Streamlit Cloud**는 해당 앱 **⋮ → Settings → Secrets**에 "
+            "아래 **한 줄**을 **최상위**(다른 `[표제]` 블록 밖이어도 됨)로 넣으세요.\n\n"
+            "```toml\nGEMINI_API_KEY = \"여기에_키\"\n```\n\n"
+            "- **`chatbot`과 `pjt`는 Secrets가 각각 따로입니다.** 지금 보는 앱과 동일한 앱에 넣었는지 확인하세요.\n"
+            "- 저장 후 메뉴의 **Reboot**로 한 번 재시작하면 반영이 확실합니다.\n"
+            "- 이름은 대문자 `GEMINI_API_KEY` 권장 (`Gemini_api_key` 등은 인식 안 될 수 있음).\n\n"
+            "[Google AI Studio](https://aistudio.google.com/apikey)에서 키 발급. "
+            "(외부 전송 전 회사 보안 정책을 확인하세요.)"
+        )
+        with st.expander("🔧 키 인식 진단 (값은 표시하지 않음)", expanded=False):
+            st.markdown(_gemini_key_debug_hint())
+        if st.button("Gemini로 요약 표 생성", type="primary", use_container_width=True):
+            with st.spinner("Gemini 요약 중…"):
+                summ, err = call_gemini_summarize_table(report_df.copy())
+            if err:
+                st.error(err)
+            else:
+                st.session_state["gemini_summary_df"] = summ
+                st.success("요약 열이 추가되었습니다. 위 표와 엑셀 다운로드에 반영됩니다.")
+                st.rerun()
+
+
+# 2. 프로젝트 상세 관리
+def view_project_detail(sh, pjt_list):
+    col_title, col_btn = st.columns([8, 2])
+    with col_title:
+        st.title("🏗️ 프로젝트 상세 관리")
+    with col_btn:
+        st.write("")
+        render_print_button()
+    
+    selected_pjt = st.selectbox("현장 선택", ["선택"] + pjt_list, key="selected_pjt")
+    
+    if selected_pjt != "선택":
+        data = cached_get_all_values('pms_db', selected_pjt)
+        
+        current_pm = ""
+        this_val = ""
+        next_val = ""
+        
+        if len(data) > 0:
+            header = data[0][:7]
+            df = pd.DataFrame([r[:7] for r in data[1:]], columns=header) if len(data) > 1 else pd.DataFrame(columns=header)
+            
+            if len(data) > 1 and len(data[1]) > 7: current_pm = str(data[1][7]).strip()
+            if len(data) > 1 and len(data[1]) > 8: this_val = str(data[1][8]).strip()
+            if len(data) > 1 and len(data[1]) > 9: next_val = str(data[1][9]).strip()
+        else:
+            df = pd.DataFrame(columns=["시작일", "종료일", "대분류", "구분", "진행상태", "비고", "진행률"])
+
+        # 주간 업무 입력칸은 key 로 세션에 값이 남으므로, 시트의 I2/J2 가 바뀌면 세션 값도 새 값으로 맞춤
+        weekly_src_key = f"weekly_src_{selected_pjt}"
+        if st.session_state.get(weekly_src_key) != (this_val, next_val):
+            st.session_state[weekly_src_key] = (this_val, next_val)
+            st.session_state[f"weekly_this_{selected_pjt}"] = this_val
+            st.session_state[f"weekly_next_{selected_pjt}"] = next_val
+
+        if '시작일' in df.columns:
+            df['시작일'] = df['시작일'].astype(str).str.split().str[0].replace('nan', '')
+        if '종료일' in df.columns:
+            df['종료일'] = df['종료일'].astype(str).str.split().str[0].replace('nan', '')
+
+        if '진행률' in df.columns:
+            df['진행률'] = pd.to_numeric(df['진행률'], errors='coerce').fillna(0)
+
+        # 편집용 복사본: 시작일/종료일 정규화 후 date 타입으로 변환 (잘못된 입력도 YYYY-MM-DD로 표시)
+        df_edit = df.copy()
+
+        def _normalize_date_string(val):
+            """구글 시트 숫자(20260313.0), '2026.03.13', '20260313' 등 → '2026-03-13' 형태로 정규화."""
+            if val is None:
+                return ""
+            if isinstance(val, (int, float)):
+                if pd.isna(val):
+                    return ""
+                # 시트에서 숫자로 들어온 경우 (예: 20260313.0, 20260313)
+                i = int(val)
+                if 19000101 <= i <= 21001231:
+                    sc = str(i)
+                    if len(sc) == 8:
+                        return f"{sc[:4]}-{sc[4:6]}-{sc[6:8]}"
+                return ""
+            s = str(val).strip()
+            if not s or s.lower() in ("nan", "none", "."):
+                return ""
+            # 앞에 붙은 마이너스(오타) 제거
+            if s.startswith("-"):
+                s = s[1:].strip()
+            # 이미 YYYY-MM-DD 형태면 그대로
+            if len(s) >= 10 and s[4] == "-" and s[7] == "-":
+                return s[:10]
+            # 숫자만 추출 (20260313.0 → 20260313)
+            s_clean = "".join(c for c in s if c.isdigit())
+            if len(s_clean) >= 8:
+                s_clean = s_clean[:8]
+                return f"{s_clean[:4]}-{s_clean[4:6]}-{s_clean[6:8]}"
+            # 점/슬래시를 dash로 통일 후 처리
+            s = s.replace(".", "-").replace("/", "-")
+            parts = s.split("-")
+            if len(parts) == 2 and len(parts[0]) == 4 and len(parts[1]) == 4:
+                return f"{parts[0]}-{parts[1][:2]}-{parts[1][2:]}"
+            return s
+
+        def _to_date_or_none(ser):
+            def one(val):
+                norm = _normalize_date_string(val)
+                if not norm:
+                    return None
+                try:
+                    parsed = pd.to_datetime(norm, errors="coerce")
+                    return parsed.date() if pd.notna(parsed) else None
+                except Exception:
+                    return None
+            return ser.apply(one)
+
+        df_edit['시작일'] = _to_date_or_none(df_edit['시작일'])
+        df_edit['종료일'] = _to_date_or_none(df_edit['종료일'])
+
+        # 텍스트 컬럼에서 'None', 'nan' 표기 제거 → 빈 칸으로 표시
+        for col in ['대분류', '구분', '진행상태', '비고']:
+            if col in df_edit.columns:
+                df_edit[col] = df_edit[col].astype(str).replace({"None": "", "nan": "", "NaN": ""})
+
+        # 편집 내용 유지: 프로젝트별 세션 보관 (단, 시트 데이터가 바뀌면 자동 재로드)
+        data_sig = _sheet_data_signature(data, 'pms_db', selected_pjt)
+        sig_key = f"process_edit_sig_{selected_pjt}"
+        invalidated = set(st.session_state.get("process_edit_invalidated_pjts") or ())
+        sheet_changed = st.session_state.get(sig_key) != data_sig
+        need_reload = (
+            "process_edit_df" not in st.session_state
+            or st.session_state.get("process_edit_pjt") != selected_pjt
+            or selected_pjt in invalidated
+            or sheet_changed
+        )
+        if need_reload:
+            st.session_state.process_edit_df = df_edit.copy()
+            st.session_state.process_edit_pjt = selected_pjt
+            st.session_state[sig_key] = data_sig
+            if selected_pjt in invalidated:
+                invalidated.discard(selected_pjt)
+                st.session_state.process_edit_invalidated_pjts = invalidated
+
+        col_pm1, col_pm2 = st.columns([3, 1])
+        with col_pm1:
+            new_pm = st.text_input("프로젝트 담당 PM (H2 셀)", value=current_pm)
+        with col_pm2:
+            st.write("")
+            if st.button("PM 성함 저장"):
+                ws = safe_api_call(sh.worksheet, selected_pjt)
+                safe_api_call(ws.update, 'H2', [[new_pm]])
+                cached_get_all_values.clear()
+                cached_get_head.clear()
+                clear_file_cache(selected_pjt)
+                st.success("PM이 업데이트되었습니다!")
+        
+        st.divider()
+
+        tab1, tab2, tab3 = st.tabs(["📊 간트 차트", "📈 S-Curve 분석", "📝 주간 업무 보고"])
+        
+        with tab1:
+            try:
+                render_project_gantt(df, selected_pjt, data_sig)
+            except Exception as e:
+                st.error(f"차트를 그리는 중 세부 오류가 발생했습니다: {e}")
+
+        with tab2:
+            try:
+                sdf = df.copy()
+                sdf['시작일'] = pd.to_datetime(sdf['시작일'], errors='coerce').dt.date
+                sdf['종료일'] = pd.to_datetime(sdf['종료일'], errors='coerce').dt.date
+                sdf = sdf.dropna(subset=['시작일', '종료일'])
+                if not sdf.empty:
+                    hist = decode_progress_history(load_progress_history_df(), selected_pjt)
+                    s_opts = {"today": datetime.date.today(), "hist": frame_signature(hist)}
+                    fig_s = get_or_build_figure(
+                        "s_curve",
+                        data_sig,
+                        s_opts,
+                        lambda: build_s_curve_figure(sdf, hist),
+                    )
+                    st.plotly_chart(fig_s, use_container_width=True)
+                    if len(hist) >= 2:
+                        fig_slip = get_or_build_figure("s_curve_slip", data_sig, s_opts, lambda: build_slip_figure(hist))
+                        st.plotly_chart(fig_slip, use_container_width=True)
+                    else:
+                        st.caption("📈 실적 이력은 저장 시점과 하루 1회(대시보드 조회 시) `progress_history` 시트에 쌓입니다.")
+            except:
+                pass
+
+        with tab3:
+            st.subheader("📋 최근 주간 업무 이력")
+            try:
+                h_df = pd.DataFrame(cached_get_all_records('pms_db', 'weekly_history'))
+            except Exception as e:
+                h_df = None
+                h_err = e
+            try:
+                if h_df is None:
+                    raise h_err
+                if not h_df.empty:
+                    h_df['프로젝트명'] = h_df['프로젝트명'].astype(str).str.strip()
+                    p_match = h_df[h_df['프로젝트명'] == selected_pjt.strip()]
+                    if not p_match.empty:
+                        latest = p_match.iloc[-1]
+                        
+                        hist_this_w = str(latest.get('금주업무', latest.get('주요현황', '-'))).replace('\n', '<br>')
+                        hist_next_w = str(latest.get('차주업무', '-')).replace('\n', '<br>')
+                        
+                        st.markdown(f"""
+                        <div class="history-box">
+                            <p style="font-size:14px; opacity: 0.7; margin-bottom:10px;">📅 <b>최종 보고일:</b> {latest.get('날짜', '-')}</p>
+                            <div style="margin-bottom:12px;"><b>✔️ 금주 주요 업무:</b><br>{hist_this_w}</div>
+                            <div><b>🔜 차주 주요 업무:</b><br>{hist_next_w}</div>
+                        </div>
+                        """, unsafe_allow_html=True)
+                    else: 
+                        st.info("아직 등록된 주간 업무 기록이 없습니다.")
+                else:
+                    st.info("아직 등록된 주간 업무 기록이 없습니다.")
+            except: 
+                st.warning("이력 데이터를 불러오는 중 오류가 발생했습니다.")
+
+            # ---------- [추가] 전체 주간 보고 히스토리 (history 시트 전체 내역) ----------
+            st.subheader("📜 전체 주간 보고 히스토리")
+            try:
+                if h_df is None:
+                    raise h_err
+                if not h_df.empty:
+                    hist_for_pjt = h_df[h_df['프로젝트명'].astype(str).str.strip() == selected_pjt.strip()].copy()
+                    if not hist_for_pjt.empty:
+                        # 날짜 컬럼이 있으면 최신순 정렬
+                        if '날짜' in hist_for_pjt.columns:
+                            hist_for_pjt['_sort_date'] = pd.to_datetime(hist_for_pjt['날짜'], errors='coerce')
+                            hist_for_pjt = hist_for_pjt.sort_values('_sort_date', ascending=False).drop(columns=['_sort_date'], errors='ignore')
+                        # 표시용: 프로젝트명 컬럼은 제거 (이미 선택된 프로젝트이므로)
+                        display_cols = [c for c in hist_for_pjt.columns if c != '프로젝트명']
+                        hist_display = hist_for_pjt[display_cols] if display_cols else hist_for_pjt
+                        st.caption(f"총 {len(hist_for_pjt)}건의 주간 보고 이력 (최신순)")
+                        st.dataframe(hist_display, use_container_width=True, height=min(400, 80 + len(hist_display) * 38))
+                    else:
+                        st.info("이 프로젝트에 대한 주간 보고 이력이 없습니다.")
+                else:
+                    st.info("히스토리 시트에 데이터가 없습니다.")
+            except Exception as e:
+                st.warning(f"전체 히스토리를 불러오는 중 오류가 발생했습니다: {e}")
+
+            st.divider()
+
+            st.subheader("📝 주간 업무 작성 및 동기화 (I2, J2 셀 & 히스토리)")
+            
+            st.info("💡 우측 하단 모서리를 마우스로 드래그하면 입력 창의 크기를 자유롭게 늘리거나 줄일 수 있습니다.")
+            with st.form("weekly_sync_form"):
+                in_this = st.text_area("✔️ 금주 주요 업무 (I2)", height=250, key=f"weekly_this_{selected_pjt}")
+                in_next = st.text_area("🔜 차주 주요 업무 (J2)", height=250, key=f"weekly_next_{selected_pjt}")
+                if st.form_submit_button("시트 데이터 업데이트 및 이력 저장"):
+                    ws = safe_api_call(sh.worksheet, selected_pjt)
+                    safe_api_call(ws.update, 'I2', [[in_this]])
+                    safe_api_call(ws.update, 'J2', [[in_next]])
+                    try:
+                        h_ws = safe_api_call(sh.worksheet, 'weekly_history')
+                        safe_api_call(h_ws.append_row, [datetime.date.today().strftime("%Y-%m-%d"), selected_pjt, in_this, in_next, st.session_state.user_id])
+                        cached_get_all_records.clear()
+                    except: 
+                        pass
+                    cached_get_all_values.clear()
+                    cached_get_head.clear()
+                    clear_file_cache(selected_pjt)
+                    st.success("성공적으로 업데이트 및 저장되었습니다!"); time.sleep(1); st.rerun()
 
+        st.write("---")
+        h_edit1, h_edit2 = st.columns([5, 1])
+        with h_edit1:
+            st.subheader("📝 상세 공정표 편집 (A~G열 전용)")
+        with h_edit2:
+            st.write("")
+            if st.button("🔄 시트에서 새로고침", use_container_width=True, key=f"reload_sheet_{selected_pjt}"):
+                refresh_sheet_data_cache([selected_pjt])
+                st.session_state.pop(sig_key, None)
+                st.rerun()
+        st.info("✏️ **날짜·내용을 모두 입력한 뒤**, 맨 아래 **💾 변경사항 전체 저장** 버튼 **한 번만** 누르면 시트에 반영됩니다. (마스터 설정 엑셀 업로드 후에는 자동 반영되며, 안 보이면 **시트에서 새로고침**을 누르세요.)")
 
-# 1. 통합 대시보드
-def view_dashboard(sh, pjt_list):
-    if "dashboard_report_font_size" not in st.session_state:
-        st.session_state.dashboard_report_font_size = 12
-    col_title, col_right = st.columns([7, 2])
-    with col_title:
-        st.title("📊 통합 대시보드 (현황 브리핑)")
-    with col_right:
-        render_print_button()
-        report_font = st.slider("📝 보고 글자 크기", min_value=10, max_value=20, value=int(st.session_state.dashboard_report_font_size), step=1, key="dashboard_font_slider")
-        st.session_state.dashboard_report_font_size = float(report_font)
-    
-    dashboard_data = []
-    
-    with st.spinner("프로젝트 데이터를 분석 중입니다..."):
-        for p_name in pjt_list:
-            try:
-                # ★ 성능 개선: 전체가 아니라 상단 일부만 + 캐시 사용
-                data = cached_get_head('pms_db', p_name, max_rows=200)
-                
-                pm_name = "미지정"
-                this_w = "금주 실적 미입력"
-                next_w = "차주 계획 미입력"
-                
-                if len(data) > 0:
-                    header = data[0][:7]
-                    df = pd.DataFrame(
-                        [r[:7] for r in data[1:]],
-                        columns=header
-                    ) if len(data) > 1 else pd.DataFrame(columns=header)
-                    
-                    if len(data) > 1 and len(data[1]) > 7 and str(data[1][7]).strip(): pm_name = str(data[1][7]).strip()
-                    if len(data) > 1 and len(data[1]) > 8 and str(data[1][8]).strip(): this_w = str(data[1][8]).strip()
-                    if len(data) > 1 and len(data[1]) > 9 and str(data[1][9]).strip(): next_w = str(data[1][9]).strip()
-                else:
-                    df = pd.DataFrame()
+        _render_schedule_editor_fragment(sh, selected_pjt, data_sig, new_pm, this_val, next_val)
 
-                if not df.empty and '진행률' in df.columns:
-                    avg_act = calc_weighted_actual_progress(df)
-                    avg_plan = calc_weighted_planned_progress(df)
+@_fragment_or_plain
+def _render_schedule_editor_fragment(sh, selected_pjt: str, data_sig: str, new_pm: str, this_val: str, next_val: str):
+    """상세 공정표 달력 폼 + 편집기 + 저장 (셀 편집은 이 영역만 리런, 저장 시에만 전체 새로고침)"""
+    process_df = st.session_state.process_edit_df
+
+    # ---------- 달력: 폼으로 묶어서 '이 행에 적용' 클릭 시에만 전송 → 리프레시 최소화 ----------
+    with st.expander("📅 달력으로 날짜 선택 (행 선택 후 시작일/종료일 설정)", expanded=False):
+        n_rows = len(process_df)
+        if n_rows == 0:
+            st.caption("아래 표에서 행을 추가한 뒤 여기서 날짜를 설정할 수 있습니다.")
+        else:
+            with st.form("calendar_apply_form"):
+                row_options = list(range(n_rows))
+                def _row_label(i):
+                    g = str(process_df.iloc[i].get("구분", ""))[:18]
+                    return f"{i+1}행 - {g}" if g else f"{i+1}행"
+                sel_row = st.selectbox("행 선택", row_options, format_func=_row_label, key="calendar_row_sel")
+                cur_start = process_df.iloc[sel_row].get("시작일")
+                cur_end = process_df.iloc[sel_row].get("종료일")
+                default_start = cur_start if isinstance(cur_start, datetime.date) else datetime.date.today()
+                default_end = cur_end if isinstance(cur_end, datetime.date) else datetime.date.today()
+                cal_start = st.date_input("시작일", value=default_start, min_value=datetime.date(2020, 1, 1), max_value=datetime.date(2035, 12, 31), key="cal_start")
+                cal_end = st.date_input("종료일", value=default_end, min_value=datetime.date(2020, 1, 1), max_value=datetime.date(2035, 12, 31), key="cal_end")
+                calendar_submitted = st.form_submit_button("✅ 이 행에 적용")
+            if calendar_submitted:
+                _proc = st.session_state.process_edit_df.copy()
+                _proc.at[_proc.index[sel_row], "시작일"] = cal_start
+                _proc.at[_proc.index[sel_row], "종료일"] = cal_end
+                st.session_state.process_edit_df = _proc
+                st.success(f"{sel_row+1}행 날짜가 반영되었습니다. 아래 표에서 다른 항목도 수정한 뒤 **변경사항 전체 저장**을 누르세요.")
+                _rerun_fragment()
+
+    st.caption("표에서 날짜·대분류·구분·진행상태·비고·진행률을 입력/수정한 뒤, **한 번만** 맨 아래 **💾 변경사항 전체 저장**을 누르세요.")
+    # 시작일/종료일 컬럼을 달력(DateColumn)으로 설정
+    column_config = {
+        "시작일": st.column_config.DateColumn(
+            "시작일",
+            format="YYYY-MM-DD",
+            min_value=datetime.date(2020, 1, 1),
+            max_value=datetime.date(2035, 12, 31),
+            step=1,
+            help="셀 클릭 또는 위 달력에서 선택",
+        ),
+        "종료일": st.column_config.DateColumn(
+            "종료일",
+            format="YYYY-MM-DD",
+            min_value=datetime.date(2020, 1, 1),
+            max_value=datetime.date(2035, 12, 31),
+            step=1,
+            help="셀 클릭 또는 위 달력에서 선택",
+        ),
+    }
+    edited = st.data_editor(
+        process_df,
+        column_config=column_config,
+        use_container_width=True,
+        num_rows="dynamic",
+        key=f"process_schedule_editor_{selected_pjt}_{data_sig[:12]}",
+    )
+    st.session_state.process_edit_df = edited
+
+    def _date_cell_to_str(val):
+        """날짜/datetime 셀을 YYYY-MM-DD 문자열로 변환"""
+        if val is None or (isinstance(val, float) and pd.isna(val)):
+            return ""
+        if hasattr(val, "strftime"):
+            return val.strftime("%Y-%m-%d")
+        s = str(val).strip()
+        if not s or s.lower() == "nan":
+            return ""
+        # 이미 "2025-01-15" 형태면 그대로, "2025-01-15 00:00:00" 형태면 앞 10자만
+        return s[:10] if len(s) >= 10 else s
+
+    if st.button("💾 변경사항 전체 저장"):
+        in_this = st.session_state.get(f"weekly_this_{selected_pjt}", this_val)
+        in_next = st.session_state.get(f"weekly_next_{selected_pjt}", next_val)
+        full_data = []
+        header_7 = list(edited.columns.values)[:7]
+        while len(header_7) < 7:
+            header_7.append("")
+        full_data.append(header_7 + ["PM", "금주", "차주"])
+
+        if len(edited) > 0:
+            for i in range(len(edited)):
+                row = edited.iloc[i]
+                r_7 = []
+                for c in edited.columns[:7]:
+                    val = row[c]
+                    if c in ("시작일", "종료일"):
+                        r_7.append(_date_cell_to_str(val))
+                    else:
+                        r_7.append("" if (val is None or (isinstance(val, float) and pd.isna(val))) else str(val))
+                while len(r_7) < 7:
+                    r_7.append("")
+                if i == 0:
+                    r_7.extend([new_pm, in_this, in_next])
                 else:
-                    avg_act = 0.0; avg_plan = 0.0
-                
-                status_key = "정상"
-                status_ui = "🟢 정상"
-                b_style = "status-normal"
-                if (avg_plan - avg_act) >= 10:
-                    status_key = "지연"
-                    status_ui = "🔴 지연"
-                    b_style = "status-delay"
-                elif avg_act >= 100:
-                    status_key = "완료"
-                    status_ui = "🔵 완료"
-                    b_style = "status-done"
-                
-                dashboard_data.append({
-                    "p_name": p_name,
-                    "pm_name": pm_name,
-                    "this_w": this_w,
-                    "next_w": next_w,
-                    "avg_act": avg_act,
-                    "avg_plan": avg_plan,
-                    "status_key": status_key,
-                    "status_ui": status_ui,
-                    "b_style": b_style
-                })
-            except Exception:
-                # 개별 프로젝트 오류는 무시하고 계속
-                pass
+                    r_7.extend([new_pm, "", ""])
+                full_data.append(r_7)
+        else:
+            full_data.append([""] * 7 + [new_pm, in_this, in_next])
 
-    all_pms = sorted(list(set([d["pm_name"] for d in dashboard_data])))
-    
-    _STATUS_FILTER_OPTS = ["🟢 정상", "🔴 지연", "🔵 완료"]
-    _STATUS_KEY_MAP = {"🟢 정상": "정상", "🔴 지연": "지연", "🔵 완료": "완료"}
+        ws = safe_api_call(sh.worksheet, selected_pjt)
+        safe_api_call(ws.clear)
+        safe_api_call(ws.update, 'A1', full_data)
+        try:
+            saved_df = pd.DataFrame([r[:7] for r in full_data[1:]], columns=full_data[0][:7])
+            record_progress_snapshots(sh, {selected_pjt: saved_df}, force=True)
+        except Exception:
+            pass
+        cached_get_all_values.clear()
+        cached_get_head.clear()
+        clear_file_cache(selected_pjt)
+        invalidate_process_edit_cache([selected_pjt])
+        st.session_state.pop(f"process_edit_sig_{selected_pjt}", None)
+        st.success("데이터가 완벽하게 저장되었습니다!"); time.sleep(1); st.rerun()
 
-    f_col1, f_col2, f_col3 = st.columns([1, 1.2, 2.8])
-    with f_col1:
-        selected_pm = st.selectbox("👤 담당자 조회", ["전체"] + all_pms, key="dashboard_pm_filter")
-    with f_col2:
-        selected_status_labels = st.multiselect(
-            "📌 상태 필터",
-            _STATUS_FILTER_OPTS,
-            default=["🟢 정상", "🔴 지연"],
-            help="기본값은 진행 중(정상·지연)만 표시합니다. 완료 프로젝트는 '🔵 완료'를 선택하세요.",
-            key="dashboard_status_filter",
-        )
-        selected_status_keys = {_STATUS_KEY_MAP[l] for l in selected_status_labels}
 
-    if selected_pm != "전체":
-        pm_filtered = [d for d in dashboard_data if d["pm_name"] == selected_pm]
-    else:
-        pm_filtered = dashboard_data
+# 3. 일 발전량 및 일조 분석
+def _load_one_solar_worksheet_df(sheet_name: str, location: str) -> pd.DataFrame:
+    for loader in (
+        lambda: cached_get_all_records("pms_db", sheet_name),
+        lambda: _records_from_sheet_values(cached_get_all_values("pms_db", sheet_name)),
+    ):
+        try:
+            raw = loader()
+            if not raw:
+                continue
+            df = pd.DataFrame(raw)
+            if df.empty:
+                continue
+            if "지점" not in df.columns:
+                df["지점"] = location
+            return _normalize_solar_db_df(df)
+        except Exception:
+            continue
+    return pd.DataFrame()
 
-    if selected_status_keys:
-        filtered_data = [d for d in pm_filtered if d["status_key"] in selected_status_keys]
-    else:
-        filtered_data = []
 
-    pool_cnt = len(pm_filtered)
-    display_cnt = len(filtered_data)
-    normal_cnt = len([d for d in pm_filtered if d["status_key"] == "정상"])
-    delay_cnt = len([d for d in pm_filtered if d["status_key"] == "지연"])
-    done_cnt = len([d for d in pm_filtered if d["status_key"] == "완료"])
-    pool_hint = (
-        f" <span style='opacity:0.75;font-size:12px;'>(전체 {pool_cnt}건)</span>"
-        if pool_cnt != display_cnt
-        else ""
-    )
+# -------------------------------
+# [성능 개선] 일사량 로컬 열(column) 저장소 — 지점·연도별 파티션(.npz), 시트와 증분 동기화
+# -------------------------------
+# 파티션: pms_sheet_cache/solar_store/<지점>/<연도>.npz (d=일 번호, gen=발전시간, rad=일사량합계)
+# manifest.json: 지점별 원본 시트·버전·마지막 확인 시각·연도별 행수/해시
+SOLAR_STORE_ENABLED = os.environ.get("PMS_SOLAR_STORE", "true").strip().lower() not in (
+    "0", "false", "no", "off"
+)
+SOLAR_STORE_DIR = CACHE_DIR / "solar_store"
+SOLAR_STORE_MANIFEST = SOLAR_STORE_DIR / "manifest.json"
+SOLAR_STORE_SYNC_TTL = int(os.environ.get("PMS_SOLAR_STORE_TTL", "600"))  # 초. 이 간격마다 시트 버전 확인
 
-    with f_col3:
-        st.markdown(f"""
-            <div class="metric-container" style="display: flex; gap: 10px; align-items: center; height: 100%; padding-top: 28px; flex-wrap: wrap;">
-                <div style="background: rgba(128,128,128,0.1); padding: 7px 12px; border-radius: 6px; font-weight: bold; font-size: 13px;">
-                    📊 표시: <span style="color: #2196f3; font-size: 15px;">{display_cnt}</span>건{pool_hint}
-                </div>
-                <div style="background: rgba(33,150,243,0.1); padding: 7px 12px; border-radius: 6px; font-weight: bold; font-size: 13px; color: #1976d2;">
-                    🟢 정상: {normal_cnt}건
-                </div>
-                <div style="background: rgba(244,67,54,0.1); padding: 7px 12px; border-radius: 6px; font-weight: bold; font-size: 13px; color: #d32f2f;">
-                    🔴 지연: {delay_cnt}건
-                </div>
-                <div style="background: rgba(76,175,80,0.1); padding: 7px 12px; border-radius: 6px; font-weight: bold; font-size: 13px; color: #388e3c;">
-                    🔵 완료: {done_cnt}건
-                </div>
-            </div>
-        """, unsafe_allow_html=True)
-        
-    st.divider()
 
-    if not selected_status_keys:
-        st.info("상태 필터에서 하나 이상을 선택해 주세요. (기본: 정상·지연)")
-    elif display_cnt == 0:
-        st.info("선택한 담당자·상태 조건에 맞는 프로젝트가 없습니다. 완료 건은 상태 필터에 '🔵 완료'를 추가하세요.")
-    else:
-        daily_df = load_daily_report_df(sh)
-        for d in filtered_data:
-            with st.container(border=True):
-                h_col1, h_col2 = st.columns([7.5, 2.5], gap="small")
+@st.cache_resource
+def _solar_store_state():
+    """
+    저장소 쓰기 잠금 + 파티션 읽기 메모 (경로 → (mtime, 배열)) + 지점 프레임 메모 (지점 → (파티션 해시, 프레임))
+    + 마지막 동기화 때 읽은 구 Solar_DB 지점별 행 (write-through 가 같은 행·버전을 쓰도록)
+    """
+    return {"lock": threading.RLock(), "partitions": {}, "frames": {}, "legacy": None}
 
-                with h_col1:
-                    st.markdown(f"""
-                        <div style="display: flex; align-items: center; flex-wrap: wrap; gap: 6px; margin-top: 2px;">
-                            <h4 style="font-weight:700; margin:0; font-size:clamp(13.5px, 3.5vw, 16px); word-break:keep-all; line-height:1.2;">
-                                🏗️ {d['p_name']}
-                            </h4>
-                            <span class="pm-tag" style="margin:0;">PM: {d['pm_name']}</span>
-                            <span class="status-badge {d['b_style']}" style="margin:0;">{d['status_ui']}</span>
-                        </div>
-                    """, unsafe_allow_html=True)
 
-                with h_col2:
-                    st.button("🔍 상세", key=f"btn_go_{d['p_name']}", on_click=navigate_to_project, args=(d['p_name'],), use_container_width=True)
+def _load_solar_manifest() -> dict:
+    try:
+        with open(SOLAR_STORE_MANIFEST, "r", encoding="utf-8") as f:
+            m = json.load(f)
+        m.setdefault("locations", {})
+        return m
+    except Exception:
+        return {"locations": {}, "index_synced_at": 0}
 
-                weekly_col, daily_col = st.columns([0.85, 1.35], gap="medium")
-                fs = st.session_state.get("dashboard_report_font_size", 12)
-                this_w_html = html_module.escape(str(d['this_w'])).replace('\n', '<br>')
-                next_w_html = html_module.escape(str(d['next_w'])).replace('\n', '<br>')
 
-                with weekly_col:
-                    st.markdown('<p class="dashboard-report-split-title">📋 주간보고</p>', unsafe_allow_html=True)
-                    st.markdown(f'''
-                        <div style="margin-bottom:4px;">
-                            <p style="font-size:{fs}px; opacity: 0.7; margin-top:0; margin-bottom:4px;">계획: {d['avg_plan']}% | 실적: {d['avg_act']}%</p>
-                            <div class="weekly-box" style="margin-top:0; font-size:{fs}px;">
-                                <div style="margin-bottom: 8px;"><b>[금주]</b><br>{this_w_html}</div>
-                                <div><b>[차주]</b><br>{next_w_html}</div>
-                            </div>
-                        </div>
-                    ''', unsafe_allow_html=True)
-                    st.progress(min(1.0, max(0.0, d['avg_act']/100)))
+def _save_solar_manifest(manifest: dict) -> None:
+    try:
+        SOLAR_STORE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = SOLAR_STORE_MANIFEST.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp, SOLAR_STORE_MANIFEST)
+    except Exception:
+        pass
 
-                with daily_col:
-                    st.markdown('<p class="dashboard-report-split-title">📋 일일보고</p>', unsafe_allow_html=True)
-                    dr_date, dr_rows = _get_latest_daily_report_for_project(daily_df, d['p_name'])
-                    if dr_rows:
-                        st.caption(f"최근 일자: {_daily_report_date_korean(dr_date)}")
-                        _render_daily_report_section_table(
-                            dr_rows,
-                            dr_date,
-                            project_name=None,
-                            compact=True,
-                        )
-                    else:
-                        st.markdown(
-                            '<div class="weekly-box" style="font-size:12px; opacity:0.85;">'
-                            "저장된 일일보고가 없습니다.<br>"
-                            "<span style='font-size:11px;'>일일보고 메뉴에서 작성·업로드하세요.</span>"
-                            "</div>",
-                            unsafe_allow_html=True,
-                        )
 
+def _solar_partition_path(location: str, year: int) -> pathlib.Path:
+    return SOLAR_STORE_DIR / _sheet_name_to_filename(location) / f"{int(year)}.npz"
 
-def view_weekly_final_report(sh, pjt_list):
-    """프로젝트별 진행 현황 표 + 엑셀 다운로드 (선택: Gemini 요약)"""
-    col_title, col_btn = st.columns([7, 2])
-    with col_title:
-        st.title("📋 프로젝트별 주간 최종 보고 (표)")
-    with col_btn:
-        render_print_button()
-    st.caption(
-        "데이터는 구글 시트 `pms_db`의 각 프로젝트 시트와 동일합니다. "
-        "**실적·계획%**는 공정별 진행률을 **일정 기간(종료일−시작일)으로 가중**한 평균입니다."
+
+def _read_solar_partition(path: pathlib.Path) -> Optional[dict]:
+    """파티션 배열 (파일 mtime 이 같으면 메모리 재사용)"""
+    try:
+        mtime = path.stat().st_mtime
+    except OSError:
+        return None
+    state = _solar_store_state()
+    hit = state["partitions"].get(str(path))
+    if hit is not None and hit[0] == mtime:
+        return hit[1]
+    try:
+        with np.load(path) as z:
+            arrays = {"d": z["d"], "gen": z["gen"], "rad": z["rad"]}
+    except Exception:
+        return None
+    state["partitions"][str(path)] = (mtime, arrays)
+    return arrays
+
+
+def write_solar_store_location(manifest: dict, location: str, loc_df: pd.DataFrame, version: str, source: str) -> int:
+    """
+    지점 전체 이력 → 연도 파티션. 내용(해시)이 바뀐 연도만 다시 쓰고, 사라진 연도는 삭제.
+    반환: 다시 쓴 파티션 수
+    """
+    entry = manifest["locations"].get(location) or {}
+    old_years = entry.get("years") or {}
+    df = loc_df.dropna(subset=["날짜"]).sort_values("날짜").drop_duplicates(subset=["날짜"], keep="last")
+    new_years = {}
+    written = 0
+    if not df.empty:
+        days = df["날짜"].to_numpy(dtype="datetime64[D]").astype("int64")
+        gen = pd.to_numeric(df["발전시간"], errors="coerce").fillna(0).to_numpy(dtype="float64")
+        rad = pd.to_numeric(df["일사량합계"], errors="coerce").fillna(0).to_numpy(dtype="float64")
+        years = df["날짜"].dt.year.to_numpy()
+        for yr in np.unique(years):
+            sel = years == yr
+            d_y, g_y, r_y = days[sel], gen[sel], rad[sel]
+            digest = hashlib.md5(d_y.tobytes() + g_y.tobytes() + r_y.tobytes()).hexdigest()
+            path = _solar_partition_path(location, int(yr))
+            old = old_years.get(str(int(yr))) or {}
+            agg = old.get("agg")
+            if old.get("hash") != digest or not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with open(path, "wb") as f:
+                    np.savez(f, d=d_y, gen=g_y, rad=r_y)
+                written += 1
+                agg = None
+            gaps = old.get("gaps") if agg is not None else None
+            if agg is None:
+                agg = _solar_year_aggregates(d_y, g_y, r_y)
+            if gaps is None:
+                gaps = _missing_day_ranges(d_y, int(yr))
+            new_years[str(int(yr))] = {"rows": int(sel.sum()), "hash": digest, "agg": agg, "gaps": gaps}
+    for yr in set(old_years) - set(new_years):
+        try:
+            _solar_partition_path(location, int(yr)).unlink()
+        except Exception:
+            pass
+    manifest["locations"][location] = {
+        "source": source,
+        "version": version,
+        "synced_at": time.time(),
+        "years": new_years,
+        "min_date": df["날짜"].min().strftime("%Y-%m-%d") if not df.empty else None,
+        "max_date": df["날짜"].max().strftime("%Y-%m-%d") if not df.empty else None,
+    }
+    return written
+
+
+def _solar_sheet_version(sheet_name: str, df: pd.DataFrame) -> str:
+    return (
+        get_snapshot_version("pms_db", sheet_name, "records")
+        or get_snapshot_version("pms_db", sheet_name, "values")
+        or frame_signature(df)
+    )
+
+
+def _solar_location_part_version(df: pd.DataFrame) -> str:
+    """지점 시트 내용 버전 — 정규화한 값 기준이라 시트에서 읽든 방금 쓴 행이든 같은 값"""
+    if df is None or df.empty:
+        return "empty"
+    return frame_signature(
+        df[["날짜", "발전시간", "일사량합계"]].astype({"발전시간": "float64", "일사량합계": "float64"}).reset_index(drop=True)
     )
 
-    with st.spinner("프로젝트별 데이터를 불러오는 중…"):
-        report_df = build_project_status_report_df(pjt_list)
 
-    if report_df.empty:
-        st.info("표시할 프로젝트가 없습니다.")
-        return
+def _solar_legacy_by_location(manifest: dict, reload: bool = False) -> tuple:
+    """구 Solar_DB 지점별 행 + 시트 버전. 동기화 때 읽은 값을 메모해 두고 write-through 에서 재사용"""
+    state = _solar_store_state()
+    if not manifest.get("has_legacy"):
+        state["legacy"] = ({}, "")
+        return state["legacy"]
+    if reload or state["legacy"] is None:
+        by_loc, version = {}, ""
+        legacy = _load_one_solar_worksheet_df(SOLAR_LEGACY_SHEET, "")
+        if not legacy.empty and "지점" in legacy.columns:
+            legacy["지점"] = legacy["지점"].astype(str).str.strip()
+            legacy = legacy[legacy["지점"] != ""]
+            by_loc = {str(k): g for k, g in legacy.groupby("지점")}
+            version = _solar_sheet_version(SOLAR_LEGACY_SHEET, legacy)
+        state["legacy"] = (by_loc, version)
+    return state["legacy"]
+
+
+def sync_solar_store(sh, locations: list = None, force: bool = False) -> dict:
+    """
+    Solar_지점명 시트(+ 구 Solar_DB) → 로컬 저장소 증분 동기화.
+    - 시트 목록은 SOLAR_STORE_SYNC_TTL 마다 1회만 조회, 지점별로도 TTL 안에 확인했으면 건너뜀
+    - 시트 스냅샷 버전이 같으면 파티션을 건드리지 않음, 바뀌면 바뀐 연도만 다시 씀
+    반환: {"checked": 확인한 지점 수, "written": 다시 쓴 파티션 수}
+    """
+    result = {"checked": 0, "written": 0}
+    state = _solar_store_state()
+    with state["lock"]:
+        manifest = _load_solar_manifest()
+        now = time.time()
+        index_fresh = now - float(manifest.get("index_synced_at") or 0) < SOLAR_STORE_SYNC_TTL
+        if not force and index_fresh and locations is None:
+            return result
+        sheets = manifest.get("sheets") or {}
+        if force or not index_fresh or not sheets:
+            sheets = {}
+            has_legacy = False
+            for ws in safe_api_call(sh.worksheets):
+                loc = location_from_solar_sheet(ws.title)
+                if loc:
+                    sheets[loc] = ws.title
+                elif ws.title == SOLAR_LEGACY_SHEET:
+                    has_legacy = True
+            manifest["sheets"] = sheets
+            manifest["has_legacy"] = has_legacy
+            manifest["index_synced_at"] = now
+
+        # 구 Solar_DB 행은 지점별 시트 뒤에 이어 붙임 (기존 drop_duplicates(keep="last") 와 동일한 우선순위)
+        legacy_by_loc, legacy_version = _solar_legacy_by_location(manifest, reload=True)
+
+        targets = sorted(set(sheets) | set(legacy_by_loc))
+        if locations is not None:
+            targets = [loc for loc in targets if loc in set(locations)]
+        for loc in targets:
+            entry = manifest["locations"].get(loc) or {}
+            if not force and now - float(entry.get("synced_at") or 0) < SOLAR_STORE_SYNC_TTL:
+                continue
+            result["checked"] += 1
+            parts = []
+            versions = []
+            if loc in sheets:
+                part = _load_one_solar_worksheet_df(sheets[loc], loc)
+                parts.append(part)
+                versions.append(_solar_location_part_version(part))
+            if loc in legacy_by_loc:
+                parts.append(legacy_by_loc[loc])
+                versions.append(legacy_version)
+            version = "|".join(versions)
+            if not force and entry.get("version") == version:
+                entry["synced_at"] = now
+                manifest["locations"][loc] = entry
+                continue
+            frames = [p for p in parts if p is not None and not p.empty]
+            loc_df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=SOLAR_UNIFIED_COLUMNS)
+            result["written"] += write_solar_store_location(
+                manifest, loc, loc_df, version, sheets.get(loc, SOLAR_LEGACY_SHEET)
+            )
+        for loc in set(manifest["locations"]) - set(sheets) - set(legacy_by_loc):
+            if locations is None:
+                write_solar_store_location(manifest, loc, pd.DataFrame(columns=SOLAR_UNIFIED_COLUMNS), "", "")
+                manifest["locations"].pop(loc, None)
+        _save_solar_manifest(manifest)
+    return result
+
+
+def mark_solar_store_stale(location: str = None) -> None:
+    """다음 조회 때 시트 버전을 다시 확인하도록 표시 (전체 새로고침·외부 수정 대비)"""
+    state = _solar_store_state()
+    with state["lock"]:
+        manifest = _load_solar_manifest()
+        if location is None:
+            manifest["index_synced_at"] = 0
+            for entry in manifest["locations"].values():
+                entry["synced_at"] = 0
+        elif location in manifest["locations"]:
+            manifest["locations"][location]["synced_at"] = 0
+        _save_solar_manifest(manifest)
 
-    all_pms = sorted(report_df["담당자"].dropna().unique().tolist())
-    f1, f2 = st.columns([1, 3])
-    with f1:
-        pm_sel = st.selectbox("담당자 필터", ["전체"] + all_pms, key="report_pm_filter")
-    base_df = st.session_state.get("gemini_summary_df")
-    display_df = base_df if base_df is not None else report_df
-    filt = display_df if pm_sel == "전체" else display_df[display_df["담당자"] == pm_sel]
 
-    st.metric("조회 건수", f"{len(filt)}건")
-    show_df = filt.copy()
-    show_df = show_df.reset_index(drop=True)
-    show_df.insert(0, "순번", range(1, len(show_df) + 1))
+def write_through_solar_store(location: str, sheet_rows: list) -> None:
+    """
+    시트에 방금 쓴 지점 전체 행(헤더 포함)을 저장소에도 반영 → 다음 조회 시 시트 재조회 불필요.
+    sync_solar_store 와 같게 구 Solar_DB 의 해당 지점 행을 뒤에 이어 붙이고 같은 버전 문자열을 기록
+    """
+    if not SOLAR_STORE_ENABLED or not location:
+        return
+    try:
+        body = [list(r[:3]) + [""] * (3 - len(r[:3])) for r in (sheet_rows or [])[1:] if r]
+        df = _normalize_solar_db_df(pd.DataFrame(body, columns=SOLAR_LOCATION_COLUMNS))
+        df["지점"] = location
+        state = _solar_store_state()
+        with state["lock"]:
+            manifest = _load_solar_manifest()
+            legacy_by_loc, legacy_version = _solar_legacy_by_location(manifest)
+            parts, versions = [df], [_solar_location_part_version(df)]
+            if location in legacy_by_loc:
+                parts.append(legacy_by_loc[location])
+                versions.append(legacy_version)
+            frames = [p for p in parts if not p.empty]
+            loc_df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=SOLAR_UNIFIED_COLUMNS)
+            write_solar_store_location(
+                manifest, location, loc_df, "|".join(versions), solar_sheet_title(location)
+            )
+            sheets = manifest.setdefault("sheets", {})
+            sheets[location] = solar_sheet_title(location)
+            _save_solar_manifest(manifest)
+    except Exception:
+        mark_solar_store_stale(location)
 
-    # 표 표시용 컬럼명/순서 정리
-    rename_map = {
-        "용량(MW)": "용량",
-        "계획진행률%": "계획",
-        "진행률_실적%": "실적",
-        "금주_주요": "금주",
-        "차주_주요": "차주",
-    }
-    show_df = show_df.rename(columns=rename_map)
 
-    base_cols = [
-        "순번",
-        "프로젝트명",
-        "용량",
-        "담당자",
-        "계획",
-        "실적",
-        "상태",
-        "금주",
-        "차주",
-    ]
-    extra_cols = [c for c in ["금주_주요_요약", "차주_주요_요약"] if c in show_df.columns]
-    ordered_cols = [c for c in base_cols if c in show_df.columns] + extra_cols
-    show_df = show_df[ordered_cols]
+def slice_by_date(frame: pd.DataFrame, start=None, end=None) -> pd.DataFrame:
+    """
+    날짜순으로 정렬된 프레임(DatetimeIndex 또는 '날짜' 열)을 이진 탐색으로 [start, end] 일 단위 구간 슬라이스.
+    전체 행 비교·복사 없이 위치 슬라이스만 반환
+    """
+    if frame is None or frame.empty or (start is None and end is None):
+        return frame
+    keys = frame.index if isinstance(frame.index, pd.DatetimeIndex) else pd.DatetimeIndex(frame["날짜"])
+    lo = int(keys.searchsorted(pd.Timestamp(start).normalize(), side="left")) if start is not None else 0
+    hi = (
+        int(keys.searchsorted(pd.Timestamp(end).normalize() + pd.Timedelta(days=1), side="left"))
+        if end is not None
+        else len(keys)
+    )
+    return frame.iloc[lo:max(lo, hi)]
 
-    st.dataframe(show_df, use_container_width=True, height=min(520, 120 + len(show_df) * 36))
 
-    c1, c2, c3 = st.columns(3)
-    with c1:
-        buf = io.BytesIO()
-        with pd.ExcelWriter(buf, engine="openpyxl") as writer:
-            show_df.to_excel(writer, index=False, sheet_name="주간최종보고")
-        st.download_button(
-            label="📥 엑셀(xlsx) 다운로드",
-            data=buf.getvalue(),
-            file_name=f"프로젝트별_주간최종보고_{datetime.date.today()}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            use_container_width=True,
-        )
-    with c2:
-        if st.button("🔄 원본 표로 초기화", use_container_width=True):
-            st.session_state["gemini_summary_df"] = None
-            st.rerun()
-    with c3:
-        pass
+def _solar_site_frame(location: str, entry: dict) -> pd.DataFrame:
+    """
+    지점 전체 이력 — 정렬된 DatetimeIndex(날짜) + 지점 categorical.
+    연도 파티션 해시가 그대로면 프로세스 메모리의 프레임을 재사용 (리런마다 다시 만들지 않음)
+    """
+    years = entry.get("years") or {}
+    sig = tuple(sorted((str(y), (v or {}).get("hash")) for y, v in years.items()))
+    state = _solar_store_state()
+    hit = state["frames"].get(location)
+    if hit is not None and hit[0] == sig:
+        return hit[1]
+    d, g, r = [], [], []
+    for yr in sorted(int(y) for y in years):
+        arr = _read_solar_partition(_solar_partition_path(location, yr))
+        if arr is None:
+            continue
+        d.append(arr["d"])
+        g.append(arr["gen"])
+        r.append(arr["rad"])
+    days = np.concatenate(d) if d else np.array([], dtype="int64")
+    gen = np.concatenate(g) if g else np.array([], dtype="float64")
+    rad = np.concatenate(r) if r else np.array([], dtype="float64")
+    if len(days) > 1 and (np.diff(days) < 0).any():
+        order = np.argsort(days, kind="stable")
+        days, gen, rad = days[order], gen[order], rad[order]
+    frame = pd.DataFrame(
+        {
+            "지점": pd.Categorical.from_codes(np.zeros(len(days), dtype="int8"), categories=[location]),
+            "발전시간": gen,
+            "일사량합계": rad,
+        },
+        index=pd.DatetimeIndex(days.astype("datetime64[D]").astype("datetime64[ns]"), name="날짜"),
+    )
+    state["frames"][location] = (sig, frame)
+    return frame
 
-    with st.expander("✨ Gemini로 금주·차주 요약 열 추가", expanded=False):
-        st.markdown(
-            "로컬은 `.streamlit/secrets.toml`, **Streamlit Cloud**는 해당 앱 **⋮ → Settings → Secrets**에 "
-            "아래 **한 줄**을 **최상위**(다른 `[표제]` 블록 밖이어도 됨)로 넣으세요.\n\n"
-            "```toml\nGEMINI_API_KEY = \"여기에_키\"\n```\n\n"
-            "- **`chatbot`과 `pjt`는 Secrets가 각각 따로입니다.** 지금 보는 앱과 동일한 앱에 넣었는지 확인하세요.\n"
-            "- 저장 후 메뉴의 **Reboot**로 한 번 재시작하면 반영이 확실합니다.\n"
-            "- 이름은 대문자 `GEMINI_API_KEY` 권장 (`Gemini_api_key` 등은 인식 안 될 수 있음).\n\n"
-            "[Google AI Studio](https://aistudio.google.com/apikey)에서 키 발급. "
-            "(외부 전송 전 회사 보안 정책을 확인하세요.)"
+
+def read_solar_store(location: str = None, start=None, end=None) -> pd.DataFrame:
+    """
+    저장소에서 타입이 정해진 구간 조회 (날짜 datetime64, 지점 categorical, 발전시간·일사량합계 float).
+    지점별 정렬 프레임을 메모리에 두고 날짜 구간은 searchsorted 슬라이스로 자름
+    """
+    manifest = _load_solar_manifest()
+    locs = [location] if location else sorted(manifest["locations"])
+    frames = []
+    for loc in locs:
+        entry = manifest["locations"].get(loc)
+        if not entry:
+            continue
+        part = slice_by_date(_solar_site_frame(loc, entry), start, end)
+        if not part.empty:
+            frames.append(part)
+    if not frames:
+        return pd.DataFrame(
+            {
+                "날짜": pd.Series(dtype="datetime64[ns]"),
+                "지점": pd.Series(dtype="category"),
+                "발전시간": pd.Series(dtype="float64"),
+                "일사량합계": pd.Series(dtype="float64"),
+            }
         )
-        with st.expander("🔧 키 인식 진단 (값은 표시하지 않음)", expanded=False):
-            st.markdown(_gemini_key_debug_hint())
-        if st.button("Gemini로 요약 표 생성", type="primary", use_container_width=True):
-            with st.spinner("Gemini 요약 중…"):
-                summ, err = call_gemini_summarize_table(report_df.copy())
-            if err:
-                st.error(err)
-            else:
-                st.session_state["gemini_summary_df"] = summ
-                st.success("요약 열이 추가되었습니다. 위 표와 엑셀 다운로드에 반영됩니다.")
-                st.rerun()
+    if len(frames) == 1:
+        return frames[0].reset_index()
+    out = pd.concat(frames)
+    out["지점"] = pd.Categorical(out["지점"].astype(str), categories=[loc for loc in locs if loc in manifest["locations"]])
+    return out.reset_index()
 
 
-# 2. 프로젝트 상세 관리
-def view_project_detail(sh, pjt_list):
-    col_title, col_btn = st.columns([8, 2])
-    with col_title:
-        st.title("🏗️ 프로젝트 상세 관리")
-    with col_btn:
-        st.write("")
-        render_print_button()
-    
-    selected_pjt = st.selectbox("현장 선택", ["선택"] + pjt_list, key="selected_pjt")
-    
-    if selected_pjt != "선택":
-        data = cached_get_all_values('pms_db', selected_pjt)
-        
-        current_pm = ""
-        this_val = ""
-        next_val = ""
-        
-        if len(data) > 0:
-            header = data[0][:7]
-            df = pd.DataFrame([r[:7] for r in data[1:]], columns=header) if len(data) > 1 else pd.DataFrame(columns=header)
-            
-            if len(data) > 1 and len(data[1]) > 7: current_pm = str(data[1][7]).strip()
-            if len(data) > 1 and len(data[1]) > 8: this_val = str(data[1][8]).strip()
-            if len(data) > 1 and len(data[1]) > 9: next_val = str(data[1][9]).strip()
+def load_solar_db_df(sh, location: str = None, start=None, end=None, fill_from_hourly: bool = False):
+    """
+    지역별 시트(Solar_지점명) + 구 Solar_DB 통합 로드 — 로컬 저장소(증분 동기화) 경유.
+    fill_from_hourly=True 면 일별 이력에 없는 날짜를 시간별 과거 데이터 집계로 보충 (조회 화면용, 학습·10년 분석에는 쓰지 않음)
+    """
+    out = None
+    if SOLAR_STORE_ENABLED:
+        try:
+            sync_solar_store(sh)
+            out = read_solar_store(location, start, end)
+        except Exception:
+            out = None
+    if out is None:
+        fb = _solar_sheets_fallback_frames(sh)
+        if location:
+            out = fb["by_loc"].get(str(location))
+            if out is None:
+                out = fb["frame"].iloc[0:0]
         else:
-            df = pd.DataFrame(columns=["시작일", "종료일", "대분류", "구분", "진행상태", "비고", "진행률"])
-
-        if '시작일' in df.columns:
-            df['시작일'] = df['시작일'].astype(str).str.split().str[0].replace('nan', '')
-        if '종료일' in df.columns:
-            df['종료일'] = df['종료일'].astype(str).str.split().str[0].replace('nan', '')
+            out = fb["frame"]
+        out = slice_by_date(out, start, end).reset_index(drop=True)
+    if fill_from_hourly and location:
+        out = fill_solar_days_from_hourly(location, out, start, end)
+    return out
 
-        if '진행률' in df.columns:
-            df['진행률'] = pd.to_numeric(df['진행률'], errors='coerce').fillna(0)
 
-        # 편집용 복사본: 시작일/종료일 정규화 후 date 타입으로 변환 (잘못된 입력도 YYYY-MM-DD로 표시)
-        df_edit = df.copy()
+# -------------------------------
+# [시간별] 시간 단위 일사량 저장소 — 지점·월별 float32 파티션, CSV 스트리밍 적재, 일 단위는 즉석 집계
+# -------------------------------
+# 파티션: pms_sheet_cache/solar_store/hourly/<지점>/<YYYY-MM>.npz (과거 관측)
+#         pms_sheet_cache/solar_store/hourly/<지점>/forecast/<YYYY-MM>.npz (예보 — 분석·일별 보충에는 쓰지 않음)
+#   월초 0시부터 1시간 간격 배열 (시각 배열 없이 위치 = 시간), 빈 시간은 NaN
+SOLAR_HOURLY_DIR = SOLAR_STORE_DIR / "hourly"
+SOLAR_HOURLY_FIELDS = {"shortwave_radiation": "일사_W", "temperature_2m": "기온", "cloud_cover": "운량"}
+SOLAR_HOURLY_SUNSHINE_W = 120.0  # WMO 일조 기준 (W/m²)
+SOLAR_HOURLY_MORNING_END = 9  # 0~8시 = 오전 구간
+SOLAR_HOURLY_EVENING_START = 17  # 17~23시 = 저녁 구간
 
-        def _normalize_date_string(val):
-            """구글 시트 숫자(20260313.0), '2026.03.13', '20260313' 등 → '2026-03-13' 형태로 정규화."""
-            if val is None:
-                return ""
-            if isinstance(val, (int, float)):
-                if pd.isna(val):
-                    return ""
-                # 시트에서 숫자로 들어온 경우 (예: 20260313.0, 20260313)
-                i = int(val)
-                if 19000101 <= i <= 21001231:
-                    sc = str(i)
-                    if len(sc) == 8:
-                        return f"{sc[:4]}-{sc[4:6]}-{sc[6:8]}"
-                return ""
-            s = str(val).strip()
-            if not s or s.lower() in ("nan", "none", "."):
-                return ""
-            # 앞에 붙은 마이너스(오타) 제거
-            if s.startswith("-"):
-                s = s[1:].strip()
-            # 이미 YYYY-MM-DD 형태면 그대로
-            if len(s) >= 10 and s[4] == "-" and s[7] == "-":
-                return s[:10]
-            # 숫자만 추출 (20260313.0 → 20260313)
-            s_clean = "".join(c for c in s if c.isdigit())
-            if len(s_clean) >= 8:
-                s_clean = s_clean[:8]
-                return f"{s_clean[:4]}-{s_clean[4:6]}-{s_clean[6:8]}"
-            # 점/슬래시를 dash로 통일 후 처리
-            s = s.replace(".", "-").replace("/", "-")
-            parts = s.split("-")
-            if len(parts) == 2 and len(parts[0]) == 4 and len(parts[1]) == 4:
-                return f"{parts[0]}-{parts[1][:2]}-{parts[1][2:]}"
-            return s
 
-        def _to_date_or_none(ser):
-            def one(val):
-                norm = _normalize_date_string(val)
-                if not norm:
-                    return None
-                try:
-                    parsed = pd.to_datetime(norm, errors="coerce")
-                    return parsed.date() if pd.notna(parsed) else None
-                except Exception:
-                    return None
-            return ser.apply(one)
+def _hourly_folder(location: str, source: str = "archive") -> pathlib.Path:
+    folder = SOLAR_HOURLY_DIR / _sheet_name_to_filename(location)
+    return folder / "forecast" if source == "forecast" else folder
 
-        df_edit['시작일'] = _to_date_or_none(df_edit['시작일'])
-        df_edit['종료일'] = _to_date_or_none(df_edit['종료일'])
 
-        # 텍스트 컬럼에서 'None', 'nan' 표기 제거 → 빈 칸으로 표시
-        for col in ['대분류', '구분', '진행상태', '비고']:
-            if col in df_edit.columns:
-                df_edit[col] = df_edit[col].astype(str).replace({"None": "", "nan": "", "NaN": ""})
+def _hourly_partition_path(location: str, year: int, month: int, source: str = "archive") -> pathlib.Path:
+    return _hourly_folder(location, source) / f"{int(year):04d}-{int(month):02d}.npz"
 
-        # 편집 내용 유지: 프로젝트별 세션 보관 (단, 시트 데이터가 바뀌면 자동 재로드)
-        data_sig = _sheet_data_signature(data)
-        sig_key = f"process_edit_sig_{selected_pjt}"
-        invalidated = set(st.session_state.get("process_edit_invalidated_pjts") or ())
-        sheet_changed = st.session_state.get(sig_key) != data_sig
-        need_reload = (
-            "process_edit_df" not in st.session_state
-            or st.session_state.get("process_edit_pjt") != selected_pjt
-            or selected_pjt in invalidated
-            or sheet_changed
-        )
-        if need_reload:
-            st.session_state.process_edit_df = df_edit.copy()
-            st.session_state.process_edit_pjt = selected_pjt
-            st.session_state[sig_key] = data_sig
-            if selected_pjt in invalidated:
-                invalidated.discard(selected_pjt)
-                st.session_state.process_edit_invalidated_pjts = invalidated
-        process_df = st.session_state.process_edit_df
 
-        ws = safe_api_call(sh.worksheet, selected_pjt)
+def _month_hours(year: int, month: int) -> int:
+    nxt = datetime.date(year + (month == 12), month % 12 + 1, 1)
+    return (nxt - datetime.date(year, month, 1)).days * 24
 
-        col_pm1, col_pm2 = st.columns([3, 1])
-        with col_pm1:
-            new_pm = st.text_input("프로젝트 담당 PM (H2 셀)", value=current_pm)
-        with col_pm2:
-            st.write("")
-            if st.button("PM 성함 저장"):
-                safe_api_call(ws.update, 'H2', [[new_pm]])
-                cached_get_all_values.clear()
-                cached_get_head.clear()
-                clear_file_cache(selected_pjt)
-                st.success("PM이 업데이트되었습니다!")
-        
-        st.divider()
 
-        tab1, tab2, tab3 = st.tabs(["📊 간트 차트", "📈 S-Curve 분석", "📝 주간 업무 보고"])
-        
-        with tab1:
-            try:
-                cdf = df.copy()
-                original_len = len(cdf)
-                
-                cdf['시작일'] = pd.to_datetime(cdf['시작일'], errors='coerce')
-                cdf['종료일'] = pd.to_datetime(cdf['종료일'], errors='coerce')
-                cdf = cdf.dropna(subset=['시작일', '종료일'])
-                
-                dropped_len = original_len - len(cdf)
-                if dropped_len > 0:
-                    st.warning(f"⚠️ 날짜 형식 오류(예: 2월 30일 등 존재하지 않는 날짜)로 인해 {dropped_len}개의 항목이 차트에서 제외되었습니다.")
-                
-                if not cdf.empty:
-                    cdf = cdf.reset_index(drop=True)
-                    
-                    if '대분류' in cdf.columns:
-                        cdf['대분류'] = cdf['대분류'].astype(str).replace({'nan': '미지정', '': '미지정'})
-                    if '구분' not in cdf.columns:
-                        cdf['구분'] = '내용 없음'
-                        
-                    cdf['진행률'] = pd.to_numeric(cdf['진행률'], errors='coerce').fillna(0).astype(float)
-                    
-                    # 표시용 라벨: 긴 글자 말줄임으로 좌측 영역 축소 (모바일에서 차트가 크게 보이도록)
-                    max_label_len = 14
-                    def truncate_label(row):
-                        raw = f"{row.name + 1}. {str(row['구분']).strip()}"
-                        if len(raw) <= max_label_len:
-                            return raw
-                        return raw[:max_label_len] + "…"
-                    cdf['구분_표시'] = cdf.apply(truncate_label, axis=1)
-                    
-                    cdf['duration'] = (cdf['종료일'] - cdf['시작일']).dt.total_seconds() * 1000
-                    cdf['duration'] = cdf['duration'].apply(lambda d: 86400000.0 if d <= 0 else d)
-                    
-                    cdf['시작일_str'] = cdf['시작일'].dt.strftime('%Y-%m-%d')
-                    cdf['종료일_str'] = cdf['종료일'].dt.strftime('%Y-%m-%d')
-                    
-                    # 프로젝트 기간 년.월 (26.1 ~ 27.3 형식)
-                    min_d = cdf['시작일'].min()
-                    max_d = cdf['종료일'].max()
-                    period_start = f"{min_d.year % 100}.{min_d.month}"
-                    period_end = f"{max_d.year % 100}.{max_d.month}"
-                    
-                    # 상단 고정: 프로젝트 기간 + 월 눈금(스크롤해도 유지)
-                    st.markdown(
-                        f'<div class="gantt-sticky-header">📅 프로젝트 기간: <strong>{period_start}</strong> ~ <strong>{period_end}</strong></div>',
-                        unsafe_allow_html=True
-                    )
-                    _render_gantt_month_ruler(min_d, max_d)
-                    st.caption("↕ 공정이 많으면 아래 차트 영역만 스크롤됩니다. 상단 기간·월 눈금은 고정됩니다.")
-                    
-                    # 진행률별 색상 대비 강화 (0=빨강, 30=주황, 60=노랑·연두, 100=초록)
-                    progress_colorscale = [
-                        [0.0, 'rgb(200, 60, 60)'],
-                        [0.2, 'rgb(230, 100, 80)'],
-                        [0.4, 'rgb(255, 180, 60)'],
-                        [0.6, 'rgb(180, 210, 90)'],
-                        [0.8, 'rgb(100, 180, 100)'],
-                        [1.0, 'rgb(50, 140, 70)'],
-                    ]
-                    
-                    fig = go.Figure()
-                    fig.add_trace(go.Bar(
-                        base=cdf['시작일'],
-                        x=cdf['duration'],
-                        y=[cdf['대분류'].tolist(), cdf['구분_표시'].tolist()],
-                        orientation='h',
-                        marker=dict(
-                            color=cdf['진행률'],
-                            colorscale=progress_colorscale,
-                            cmin=0,
-                            cmax=100,
-                            showscale=True,
-                            colorbar=dict(
-                                title=dict(text="진행률(%)", font=dict(size=12)),
-                                thickness=18,
-                                len=0.7,
-                                tickfont=dict(size=11),
-                                outlinewidth=1,
-                            ),
-                            line=dict(width=1.2, color='rgba(60,60,60,0.5)'),
-                        ),
-                        customdata=cdf[['시작일_str', '종료일_str', '대분류', '구분', '진행률']].values,
-                        hovertemplate="<b>[%{customdata[2]}] %{customdata[3]}</b><br>시작: %{customdata[0]} ~ 종료: %{customdata[1]}<br>진행률: %{customdata[4]:.0f}%<extra></extra>"
-                    ))
-                    
-                    today_ms = pd.Timestamp.now().normalize().timestamp() * 1000
-                    fig.add_vline(
-                        x=today_ms,
-                        line_width=2.5,
-                        line_dash="dash",
-                        line_color="rgb(120, 60, 180)",
-                        annotation_text=" 오늘 ",
-                        annotation_position="bottom",
-                        annotation_font=dict(color="rgb(120, 60, 180)", size=12, weight="bold"),
-                        annotation_bgcolor="rgba(240,230,255,0.9)",
-                        annotation_borderpad=4,
-                    )
-                    
-                    fig.update_xaxes(
-                        type="date",
-                        side="top",
-                        dtick="M1",
-                        tickformat="%y.%-m",
-                        tickangle=0,
-                        tickfont=dict(size=11),
-                        showticklabels=False,
-                        showgrid=True,
-                        gridwidth=1,
-                        gridcolor='rgba(200, 200, 200, 0.7)',
-                        showline=True,
-                        linewidth=1,
-                        linecolor='rgba(180, 180, 180, 0.8)',
-                        mirror=True,
-                        title_text="",
-                    )
-                    
-                    fig.update_yaxes(
-                        autorange="reversed",
-                        type="multicategory",
-                        categoryorder="trace",
-                        tickfont=dict(size=10),
-                        showgrid=True,
-                        gridwidth=1,
-                        gridcolor='rgba(200, 200, 200, 0.7)',
-                        showline=True,
-                        linewidth=1,
-                        linecolor='rgba(180, 180, 180, 0.8)',
-                        mirror=True,
-                        dividercolor='rgba(120, 120, 120, 0.6)',
-                        dividerwidth=1.2,
-                        title_text="",
-                    )
-                    
-                    # 좌측 여백 축소 → 차트 영역 확대 (모바일에서 그래프가 크게 보이도록)
-                    chart_h = max(500, len(cdf) * 40)
-                    fig.update_layout(
-                        height=chart_h,
-                        bargap=0.25,
-                        bargroupgap=0.08,
-                        plot_bgcolor='rgb(252,252,252)',
-                        paper_bgcolor='white',
-                        margin=dict(l=78, r=88, t=28, b=28),
-                        font=dict(family="Pretendard, sans-serif", size=10),
-                        showlegend=False,
-                    )
-                    
-                    gantt_panel_h = min(720, max(380, min(chart_h, len(cdf) * 36 + 90)))
-                    with st.container(height=gantt_panel_h, border=True):
-                        st.plotly_chart(
-                            fig,
-                            use_container_width=True,
-                            key=f"gantt_chart_{selected_pjt}_{data_sig[:10]}",
-                        )
-                else:
-                    st.info("차트를 그릴 수 있는 유효한 날짜 데이터가 부족합니다. 편집기에서 날짜를 확인해 주세요.")
-            except Exception as e:
-                st.error(f"차트를 그리는 중 세부 오류가 발생했습니다: {e}")
+def _write_hourly_month(location: str, year: int, month: int, arrays: dict, source: str = "archive") -> int:
+    """월 버퍼를 기존 파티션과 병합해 저장 (새 값이 있는 시간만 덮어씀). 반환: 채워진 시간 수"""
+    path = _hourly_partition_path(location, year, month, source)
+    merged = dict(arrays)
+    if path.exists():
+        try:
+            with np.load(path) as z:
+                for col, new in arrays.items():
+                    if col in z.files:
+                        merged[col] = np.where(np.isnan(new), z[col], new).astype(np.float32)
+        except Exception:
+            pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, **merged)
+    os.replace(tmp, path)
+    return int((~np.isnan(merged["일사_W"])).sum())
 
-        with tab2:
-            try:
-                sdf = df.copy()
-                sdf['시작일'] = pd.to_datetime(sdf['시작일'], errors='coerce').dt.date
-                sdf['종료일'] = pd.to_datetime(sdf['종료일'], errors='coerce').dt.date
-                sdf = sdf.dropna(subset=['시작일', '종료일'])
-                if not sdf.empty:
-                    min_d, max_d = sdf['시작일'].min(), sdf['종료일'].max()
-                    d_range = pd.date_range(min_d, max_d, freq='W-MON').date.tolist()
-                    p_trend = [
-                        calc_weighted_progress_mean(
-                            sdf,
-                            sdf.apply(
-                                lambda r: calc_planned_progress(r['시작일'], r['종료일'], d),
-                                axis=1,
-                            ),
-                        )
-                        for d in d_range
-                    ]
-                    a_prog = calc_weighted_actual_progress(sdf)
-                    fig_s = go.Figure()
-                    fig_s.add_trace(go.Scatter(x=[d.strftime("%Y-%m-%d") for d in d_range], y=p_trend, mode='lines+markers', name='계획'))
-                    fig_s.add_trace(go.Scatter(x=[datetime.date.today().strftime("%Y-%m-%d")], y=[a_prog], mode='markers', name='현재 실적', marker=dict(size=12, color='red', symbol='star')))
-                    fig_s.update_layout(title="진척률 추이 (S-Curve)", yaxis_title="진척률(%)")
-                    st.plotly_chart(fig_s, use_container_width=True)
-            except:
-                pass
 
-        with tab3:
-            st.subheader("📋 최근 주간 업무 이력")
+def _stream_open_meteo_hourly_csv(url: str, params: dict, timeout: float = 120):
+    """
+    Open-Meteo hourly 응답을 CSV 로 받아 한 줄씩 (연, 월, 월내 시간 인덱스, 값 튜플) 생성.
+    응답 전체를 메모리에 올리지 않음
+    """
+    params = dict(params, format="csv", hourly=",".join(SOLAR_HOURLY_FIELDS))
+    with _http_session().get(url, params=_normalize_http_params(params), timeout=timeout, stream=True) as r:
+        r.raise_for_status()
+        positions = None  # SOLAR_HOURLY_FIELDS 순서 → CSV 열 위치 (헤더 이름으로 매핑, 없으면 None)
+        for raw in r.iter_lines(decode_unicode=True):
+            line = (raw or "").strip()
+            if positions is None:
+                if line.startswith("time,"):
+                    # 예: time,shortwave_radiation (W/m²),temperature_2m (°C),cloud_cover (%)
+                    names = [h.split(" (")[0].strip() for h in line.split(",")]
+                    positions = [names.index(f) if f in names else None for f in SOLAR_HOURLY_FIELDS]
+                continue
+            if not line:
+                continue
+            parts = line.split(",")
+            t = parts[0]  # 2024-01-01T05:00
             try:
-                h_data = cached_get_all_records('pms_db', 'weekly_history')
-                h_df = pd.DataFrame(h_data)
-                if not h_df.empty:
-                    h_df['프로젝트명'] = h_df['프로젝트명'].astype(str).str.strip()
-                    p_match = h_df[h_df['프로젝트명'] == selected_pjt.strip()]
-                    if not p_match.empty:
-                        latest = p_match.iloc[-1]
-                        
-                        hist_this_w = str(latest.get('금주업무', latest.get('주요현황', '-'))).replace('\n', '<br>')
-                        hist_next_w = str(latest.get('차주업무', '-')).replace('\n', '<br>')
-                        
-                        st.markdown(f"""
-                        <div class="history-box">
-                            <p style="font-size:14px; opacity: 0.7; margin-bottom:10px;">📅 <b>최종 보고일:</b> {latest.get('날짜', '-')}</p>
-                            <div style="margin-bottom:12px;"><b>✔️ 금주 주요 업무:</b><br>{hist_this_w}</div>
-                            <div><b>🔜 차주 주요 업무:</b><br>{hist_next_w}</div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    else: 
-                        st.info("아직 등록된 주간 업무 기록이 없습니다.")
-                else:
-                    st.info("아직 등록된 주간 업무 기록이 없습니다.")
-            except: 
-                st.warning("이력 데이터를 불러오는 중 오류가 발생했습니다.")
+                y, m, d, h = int(t[0:4]), int(t[5:7]), int(t[8:10]), int(t[11:13])
+            except ValueError:
+                continue
+            vals = []
+            for pos in positions:
+                try:
+                    vals.append(float(parts[pos]))
+                except (TypeError, IndexError, ValueError):
+                    vals.append(np.nan)
+            yield y, m, (d - 1) * 24 + h, vals
 
-            # ---------- [추가] 전체 주간 보고 히스토리 (history 시트 전체 내역) ----------
-            st.subheader("📜 전체 주간 보고 히스토리")
-            try:
-                h_data_full = cached_get_all_records('pms_db', 'weekly_history')
-                h_df_full = pd.DataFrame(h_data_full)
-                if not h_df_full.empty:
-                    h_df_full['프로젝트명'] = h_df_full['프로젝트명'].astype(str).str.strip()
-                    hist_for_pjt = h_df_full[h_df_full['프로젝트명'] == selected_pjt.strip()].copy()
-                    if not hist_for_pjt.empty:
-                        # 날짜 컬럼이 있으면 최신순 정렬
-                        if '날짜' in hist_for_pjt.columns:
-                            hist_for_pjt['_sort_date'] = pd.to_datetime(hist_for_pjt['날짜'], errors='coerce')
-                            hist_for_pjt = hist_for_pjt.sort_values('_sort_date', ascending=False).drop(columns=['_sort_date'], errors='ignore')
-                        # 표시용: 프로젝트명 컬럼은 제거 (이미 선택된 프로젝트이므로)
-                        display_cols = [c for c in hist_for_pjt.columns if c != '프로젝트명']
-                        hist_display = hist_for_pjt[display_cols] if display_cols else hist_for_pjt
-                        st.caption(f"총 {len(hist_for_pjt)}건의 주간 보고 이력 (최신순)")
-                        st.dataframe(hist_display, use_container_width=True, height=min(400, 80 + len(hist_display) * 38))
-                    else:
-                        st.info("이 프로젝트에 대한 주간 보고 이력이 없습니다.")
-                else:
-                    st.info("히스토리 시트에 데이터가 없습니다.")
-            except Exception as e:
-                st.warning(f"전체 히스토리를 불러오는 중 오류가 발생했습니다: {e}")
 
-            st.divider()
+def ingest_solar_hourly(location: str, lat: float, lon: float, start, end, source: str = "archive") -> dict:
+    """
+    시간별 일사량 적재 (source: "archive" 과거, "forecast" 7일 예보 — 예보는 별도 파티션에 저장).
+    월 단위 버퍼만 메모리에 두고 월이 바뀔 때마다 파티션으로 내보냄. 과거 구간은 연 단위로 나눠 요청.
+    반환: {"hours": 적재 시간 수, "months": 쓴 파티션 수}
+    """
+    result = {"hours": 0, "months": 0}
+    cols = list(SOLAR_HOURLY_FIELDS.values())
+    if source == "forecast":
+        requests_list = [(OPEN_METEO_FORECAST_URL, {"forecast_days": 7})]
+    else:
+        s = pd.Timestamp(start).date()
+        e = min(pd.Timestamp(end).date(), datetime.date.today() - datetime.timedelta(days=SOLAR_ARCHIVE_LAG_DAYS))
+        requests_list = []
+        for yr in range(s.year, e.year + 1):
+            y0, y1 = max(s, datetime.date(yr, 1, 1)), min(e, datetime.date(yr, 12, 31))
+            if y0 <= y1:
+                requests_list.append((OPEN_METEO_ARCHIVE_URL, {"start_date": y0.isoformat(), "end_date": y1.isoformat()}))
+
+    state = _solar_store_state()
+    for url, extra in requests_list:
+        params = {"latitude": float(lat), "longitude": float(lon), "timezone": "Asia/Seoul", **extra}
+        cur, buf = None, None
+
+        def _flush():
+            if cur is not None and buf is not None:
+                with state["lock"]:
+                    _write_hourly_month(location, cur[0], cur[1], buf, source)
+                result["months"] += 1
+
+        for y, m, idx, vals in _stream_open_meteo_hourly_csv(url, params):
+            if cur != (y, m):
+                _flush()
+                cur = (y, m)
+                n_h = _month_hours(y, m)
+                buf = {c: np.full(n_h, np.nan, dtype=np.float32) for c in cols}
+            if 0 <= idx < len(buf[cols[0]]):
+                for c, v in zip(cols, vals):
+                    buf[c][idx] = v
+                result["hours"] += 1
+        _flush()
+    return result
 
-            st.subheader("📝 주간 업무 작성 및 동기화 (I2, J2 셀 & 히스토리)")
-            
-            st.info("💡 우측 하단 모서리를 마우스로 드래그하면 입력 창의 크기를 자유롭게 늘리거나 줄일 수 있습니다.")
-            with st.form("weekly_sync_form"):
-                in_this = st.text_area("✔️ 금주 주요 업무 (I2)", value=this_val, height=250)
-                in_next = st.text_area("🔜 차주 주요 업무 (J2)", value=next_val, height=250)
-                if st.form_submit_button("시트 데이터 업데이트 및 이력 저장"):
-                    safe_api_call(ws.update, 'I2', [[in_this]])
-                    safe_api_call(ws.update, 'J2', [[in_next]])
-                    try:
-                        h_ws = safe_api_call(sh.worksheet, 'weekly_history')
-                        safe_api_call(h_ws.append_row, [datetime.date.today().strftime("%Y-%m-%d"), selected_pjt, in_this, in_next, st.session_state.user_id])
-                        cached_get_all_records.clear()
-                    except: 
-                        pass
-                    cached_get_all_values.clear()
-                    cached_get_head.clear()
-                    clear_file_cache(selected_pjt)
-                    st.success("성공적으로 업데이트 및 저장되었습니다!"); time.sleep(1); st.rerun()
 
-        st.write("---")
-        h_edit1, h_edit2 = st.columns([5, 1])
-        with h_edit1:
-            st.subheader("📝 상세 공정표 편집 (A~G열 전용)")
-        with h_edit2:
-            st.write("")
-            if st.button("🔄 시트에서 새로고침", use_container_width=True, key=f"reload_sheet_{selected_pjt}"):
-                refresh_sheet_data_cache([selected_pjt])
-                st.session_state.pop(sig_key, None)
-                st.rerun()
-        st.info("✏️ **날짜·내용을 모두 입력한 뒤**, 맨 아래 **💾 변경사항 전체 저장** 버튼 **한 번만** 누르면 시트에 반영됩니다. (마스터 설정 엑셀 업로드 후에는 자동 반영되며, 안 보이면 **시트에서 새로고침**을 누르세요.)")
+def solar_hourly_months(location: str, source: str = "archive") -> list:
+    """적재된 (연, 월) 목록"""
+    folder = _hourly_folder(location, source)
+    if not folder.exists():
+        return []
+    out = []
+    for p in folder.glob("*.npz"):
+        try:
+            out.append((int(p.stem[:4]), int(p.stem[5:7])))
+        except ValueError:
+            continue
+    return sorted(out)
+
+
+def read_solar_hourly(location: str, start=None, end=None, source: str = "archive") -> pd.DataFrame:
+    """시간별 표 (시각 | 일사_W | 기온 | 운량), 해당 월 파티션만 읽음"""
+    months = solar_hourly_months(location, source)
+    s = pd.Timestamp(start).normalize() if start is not None else None
+    e = pd.Timestamp(end).normalize() + pd.Timedelta(hours=23) if end is not None else None
+    if s is not None:
+        months = [ym for ym in months if ym >= (s.year, s.month)]
+    if e is not None:
+        months = [ym for ym in months if ym <= (e.year, e.month)]
+    frames = []
+    for y, m in months:
+        try:
+            with np.load(_hourly_partition_path(location, y, m, source)) as z:
+                arrays = {c: z[c] for c in SOLAR_HOURLY_FIELDS.values() if c in z.files}
+        except Exception:
+            continue
+        n_h = len(arrays.get("일사_W", []))
+        base = np.datetime64(f"{y:04d}-{m:02d}-01T00", "h")
+        frames.append(pd.DataFrame({"시각": base + np.arange(n_h), **arrays}))
+    if not frames:
+        return pd.DataFrame(columns=["시각"] + list(SOLAR_HOURLY_FIELDS.values()))
+    out = pd.concat(frames, ignore_index=True)
+    out["시각"] = pd.to_datetime(out["시각"])
+    if s is not None:
+        out = out[out["시각"] >= s]
+    if e is not None:
+        out = out[out["시각"] <= e]
+    return out.dropna(subset=["일사_W"]).reset_index(drop=True)
+
+
+def aggregate_solar_hourly_to_daily(hourly_df: pd.DataFrame) -> pd.DataFrame:
+    """시간별 → 일별 (기존 화면 형식: 날짜 | 일사량합계(MJ/m²)) + 최대일사_W·일조시간"""
+    if hourly_df is None or hourly_df.empty:
+        return pd.DataFrame(columns=["날짜", "일사량합계", "최대일사_W", "일조시간"])
+    w = hourly_df["일사_W"].to_numpy(dtype=float)
+    day = hourly_df["시각"].dt.normalize()
+    g = pd.DataFrame({"날짜": day, "e": w * 0.0036, "w": w, "sun": (w >= SOLAR_HOURLY_SUNSHINE_W).astype(int)}).groupby("날짜")
+    out = pd.DataFrame({"일사량합계": g["e"].sum(), "최대일사_W": g["w"].max(), "일조시간": g["sun"].sum()}).reset_index()
+    out["일사량합계"] = out["일사량합계"].round(2)
+    return out
 
-        # ---------- 달력: 폼으로 묶어서 '이 행에 적용' 클릭 시에만 전송 → 리프레시 최소화 ----------
-        with st.expander("📅 달력으로 날짜 선택 (행 선택 후 시작일/종료일 설정)", expanded=False):
-            n_rows = len(process_df)
-            if n_rows == 0:
-                st.caption("아래 표에서 행을 추가한 뒤 여기서 날짜를 설정할 수 있습니다.")
-            else:
-                with st.form("calendar_apply_form"):
-                    row_options = list(range(n_rows))
-                    def _row_label(i):
-                        g = str(process_df.iloc[i].get("구분", ""))[:18]
-                        return f"{i+1}행 - {g}" if g else f"{i+1}행"
-                    sel_row = st.selectbox("행 선택", row_options, format_func=_row_label, key="calendar_row_sel")
-                    cur_start = process_df.iloc[sel_row].get("시작일")
-                    cur_end = process_df.iloc[sel_row].get("종료일")
-                    default_start = cur_start if isinstance(cur_start, datetime.date) else datetime.date.today()
-                    default_end = cur_end if isinstance(cur_end, datetime.date) else datetime.date.today()
-                    cal_start = st.date_input("시작일", value=default_start, min_value=datetime.date(2020, 1, 1), max_value=datetime.date(2035, 12, 31), key="cal_start")
-                    cal_end = st.date_input("종료일", value=default_end, min_value=datetime.date(2020, 1, 1), max_value=datetime.date(2035, 12, 31), key="cal_end")
-                    calendar_submitted = st.form_submit_button("✅ 이 행에 적용")
-                if calendar_submitted:
-                    _proc = st.session_state.process_edit_df.copy()
-                    _proc.at[_proc.index[sel_row], "시작일"] = cal_start
-                    _proc.at[_proc.index[sel_row], "종료일"] = cal_end
-                    st.session_state.process_edit_df = _proc
-                    st.success(f"{sel_row+1}행 날짜가 반영되었습니다. 아래 표에서 다른 항목도 수정한 뒤 **변경사항 전체 저장**을 누르세요.")
-                    st.rerun()
 
-        st.caption("표에서 날짜·대분류·구분·진행상태·비고·진행률을 입력/수정한 뒤, **한 번만** 맨 아래 **💾 변경사항 전체 저장**을 누르세요.")
-        # 시작일/종료일 컬럼을 달력(DateColumn)으로 설정
-        column_config = {
-            "시작일": st.column_config.DateColumn(
-                "시작일",
-                format="YYYY-MM-DD",
-                min_value=datetime.date(2020, 1, 1),
-                max_value=datetime.date(2035, 12, 31),
-                step=1,
-                help="셀 클릭 또는 위 달력에서 선택",
-            ),
-            "종료일": st.column_config.DateColumn(
-                "종료일",
-                format="YYYY-MM-DD",
-                min_value=datetime.date(2020, 1, 1),
-                max_value=datetime.date(2035, 12, 31),
-                step=1,
-                help="셀 클릭 또는 위 달력에서 선택",
-            ),
+def fill_solar_days_from_hourly(location: str, daily_df: pd.DataFrame, start=None, end=None) -> pd.DataFrame:
+    """
+    일별 이력에 없는 날짜를 시간별 과거 파티션(24시간 모두 있는 날만)의 일사량합계로 보충.
+    보충 행은 '시간별보충'=True, 발전시간은 실측이 아니므로 비워 둠 (모델 적합·평균 발전시간에서 빠짐).
+    시간별 데이터가 없으면 그대로 반환
+    """
+    if not location or not solar_hourly_months(location):
+        return daily_df
+    hdf = read_solar_hourly(location, start, end)
+    if hdf.empty:
+        return daily_df
+    day = hdf["시각"].dt.normalize()
+    hours = day.value_counts()
+    daily = aggregate_solar_hourly_to_daily(hdf)
+    keep = daily["날짜"].isin(hours.index[hours.to_numpy() >= 24])
+    if daily_df is not None and not daily_df.empty:
+        keep &= ~daily["날짜"].isin(pd.DatetimeIndex(daily_df["날짜"]))
+    daily = daily[keep]
+    if daily.empty:
+        return daily_df
+    fill = pd.DataFrame(
+        {
+            "날짜": daily["날짜"].to_numpy(),
+            "지점": location,
+            "발전시간": np.nan,
+            "일사량합계": daily["일사량합계"].to_numpy(dtype=float),
+            "시간별보충": True,
         }
-        edited = st.data_editor(
-            process_df,
-            column_config=column_config,
+    )
+    if daily_df is None or daily_df.empty:
+        return fill
+    out = pd.concat([daily_df.assign(시간별보충=False), fill], ignore_index=True)
+    if isinstance(daily_df["지점"].dtype, pd.CategoricalDtype):
+        out["지점"] = pd.Categorical(out["지점"].astype(str), categories=daily_df["지점"].cat.categories.union([location]))
+    return out.sort_values("날짜", kind="stable").reset_index(drop=True)
+
+
+def render_solar_hourly_analysis(sel_loc: str) -> None:
+    """시간별 일사 적재 + 일중 분포(오전·저녁 비중, 클리핑 임계 초과)"""
+    months = solar_hourly_months(sel_loc)
+    st.caption(
+        "Open-Meteo 시간별 일사(W/m²)를 지점·월별로 압축 저장합니다. "
+        + (f"적재 범위: {months[0][0]}-{months[0][1]:02d} ~ {months[-1][0]}-{months[-1][1]:02d} ({len(months)}개월)" if months else "아직 적재된 시간별 데이터가 없습니다.")
+    )
+    with st.form(f"hourly_ingest_{sel_loc}"):
+        last_year = datetime.date.today().year - 1
+        c1, c2 = st.columns([3, 1])
+        rng = c1.date_input("적재 기간 (과거)", [datetime.date(last_year, 1, 1), datetime.date(last_year, 12, 31)])
+        with_fc = c2.checkbox("7일 예보 포함", value=True)
+        go_ingest = st.form_submit_button("⏬ 시간별 데이터 적재", use_container_width=True)
+    if go_ingest:
+        lat, lon, _ = get_location_lat_lon(sel_loc)
+        if lat is None or lon is None:
+            st.error("지점 좌표를 확인할 수 없습니다.")
+        else:
+            try:
+                with st.spinner("시간별 데이터 스트리밍 적재 중..."):
+                    res = {"hours": 0, "months": 0}
+                    if len(rng) == 2:
+                        r1 = ingest_solar_hourly(sel_loc, lat, lon, rng[0], rng[1], source="archive")
+                        res = {k: res[k] + r1[k] for k in res}
+                    if with_fc:
+                        r2 = ingest_solar_hourly(sel_loc, lat, lon, None, None, source="forecast")
+                        res = {k: res[k] + r2[k] for k in res}
+                st.success(f"{res['hours']:,}시간 적재 ({res['months']}개 월 파티션)")
+                months = solar_hourly_months(sel_loc)
+            except Exception as e:
+                st.error(f"적재 중 오류: {e}")
+
+    today = datetime.date.today()
+    fc_daily = aggregate_solar_hourly_to_daily(
+        read_solar_hourly(sel_loc, today, today + datetime.timedelta(days=6), source="forecast")
+    )
+    if not fc_daily.empty:
+        st.caption("7일 예보 (시간별 → 일별, 아래 분석과 별도 저장)")
+        st.dataframe(
+            fc_daily.assign(날짜=fc_daily["날짜"].dt.strftime("%Y-%m-%d")),
             use_container_width=True,
-            num_rows="dynamic",
-            key=f"process_schedule_editor_{selected_pjt}_{data_sig[:12]}",
+            hide_index=True,
         )
-        st.session_state.process_edit_df = edited
-        
-        def _date_cell_to_str(val):
-            """날짜/datetime 셀을 YYYY-MM-DD 문자열로 변환"""
-            if val is None or (isinstance(val, float) and pd.isna(val)):
-                return ""
-            if hasattr(val, "strftime"):
-                return val.strftime("%Y-%m-%d")
-            s = str(val).strip()
-            if not s or s.lower() == "nan":
-                return ""
-            # 이미 "2025-01-15" 형태면 그대로, "2025-01-15 00:00:00" 형태면 앞 10자만
-            return s[:10] if len(s) >= 10 else s
-
-        if st.button("💾 변경사항 전체 저장"):
-            full_data = []
-            header_7 = list(edited.columns.values)[:7]
-            while len(header_7) < 7:
-                header_7.append("")
-            full_data.append(header_7 + ["PM", "금주", "차주"])
-
-            if len(edited) > 0:
-                for i in range(len(edited)):
-                    row = edited.iloc[i]
-                    r_7 = []
-                    for c in edited.columns[:7]:
-                        val = row[c]
-                        if c in ("시작일", "종료일"):
-                            r_7.append(_date_cell_to_str(val))
-                        else:
-                            r_7.append("" if (val is None or (isinstance(val, float) and pd.isna(val))) else str(val))
-                    while len(r_7) < 7:
-                        r_7.append("")
-                    if i == 0:
-                        r_7.extend([new_pm, in_this, in_next])
-                    else:
-                        r_7.extend([new_pm, "", ""])
-                    full_data.append(r_7)
-            else:
-                full_data.append([""] * 7 + [new_pm, in_this, in_next])
-                
-            safe_api_call(ws.clear)
-            safe_api_call(ws.update, 'A1', full_data)
-            cached_get_all_values.clear()
-            cached_get_head.clear()
-            clear_file_cache(selected_pjt)
-            invalidate_process_edit_cache([selected_pjt])
-            st.session_state.pop(f"process_edit_sig_{selected_pjt}", None)
-            st.success("데이터가 완벽하게 저장되었습니다!"); time.sleep(1); st.rerun()
+    if not months:
+        return
 
-# 3. 일 발전량 및 일조 분석
-def _load_one_solar_worksheet_df(sheet_name: str, location: str) -> pd.DataFrame:
-    for loader in (
-        lambda: cached_get_all_records("pms_db", sheet_name),
-        lambda: _records_from_sheet_values(cached_get_all_values("pms_db", sheet_name)),
-    ):
+    a1, a2 = st.columns([3, 1])
+    first = datetime.date(months[0][0], months[0][1], 1)
+    last = datetime.date(months[-1][0], months[-1][1], 1) + datetime.timedelta(days=_month_hours(*months[-1]) // 24 - 1)
+    view_rng = a1.date_input("분석 기간", [first, last], min_value=first, max_value=last, key=f"hourly_view_{sel_loc}")
+    clip_w = a2.number_input("클리핑 임계 (W/m²)", value=900, step=50, key=f"hourly_clip_{sel_loc}")
+    if len(view_rng) != 2:
+        return
+    hdf = read_solar_hourly(sel_loc, view_rng[0], view_rng[1])
+    if hdf.empty:
+        st.info("선택 기간에 시간별 데이터가 없습니다.")
+        return
+    w = hdf["일사_W"].to_numpy(dtype=float)
+    hour = hdf["시각"].dt.hour.to_numpy()
+    total = float(w.sum()) or 1.0
+    morning = float(w[hour < SOLAR_HOURLY_MORNING_END].sum()) / total * 100.0
+    evening = float(w[hour >= SOLAR_HOURLY_EVENING_START].sum()) / total * 100.0
+    over = w > float(clip_w)
+    clipped = float((w[over] - float(clip_w)).sum()) / total * 100.0
+    daily = aggregate_solar_hourly_to_daily(hdf)
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("일평균 일사량", f"{daily['일사량합계'].mean():.2f} MJ/m²")
+    m2.metric(f"오전(~{SOLAR_HOURLY_MORNING_END}시) 비중", f"{morning:.1f}%")
+    m3.metric(f"저녁({SOLAR_HOURLY_EVENING_START}시~) 비중", f"{evening:.1f}%")
+    m4.metric("임계 초과분(클리핑 추정)", f"{clipped:.2f}%", help=f"{int(over.sum())}시간이 {clip_w} W/m² 초과")
+
+    profile = pd.DataFrame({"시": hour, "일사_W": w}).groupby("시", as_index=False)["일사_W"].mean()
+    fig_h = get_or_build_figure(
+        "solar_hourly_profile",
+        frame_signature(profile),
+        {"loc": sel_loc, "clip": float(clip_w)},
+        lambda: go.Figure(
+            data=[go.Bar(x=profile["시"], y=profile["일사_W"], marker_color="rgba(255, 165, 0, 0.7)", name="평균 일사")],
+            layout=dict(
+                title=f"[{sel_loc}] 시간대별 평균 일사 (W/m²)",
+                xaxis=dict(title="시", dtick=1),
+                yaxis=dict(title="W/m²"),
+                height=360,
+                shapes=[dict(type="line", xref="paper", x0=0, x1=1, y0=float(clip_w), y1=float(clip_w), line=dict(color="red", dash="dash"))],
+            ),
+        ),
+    )
+    st.plotly_chart(fig_h, use_container_width=True)
+
+
+def solar_location_index(sh) -> dict:
+    """
+    지점 메타데이터 색인 {지점: {"years": {연도: 일수}, "min_date", "max_date"}}.
+    저장소 manifest 에서 읽으므로 지점 수가 늘어도 전체 이력을 불러오지 않음.
+    저장소 미사용 시에는 시트 통합 프레임에서 만든 색인을 5분간 재사용
+    """
+    if SOLAR_STORE_ENABLED:
         try:
-            raw = loader()
-            if not raw:
-                continue
-            df = pd.DataFrame(raw)
-            if df.empty:
-                continue
-            if "지점" not in df.columns:
-                df["지점"] = location
-            return _normalize_solar_db_df(df)
+            sync_solar_store(sh)
+            manifest = _load_solar_manifest()
+            return {
+                loc: {
+                    "years": {int(y): int((v or {}).get("rows", 0)) for y, v in (e.get("years") or {}).items()},
+                    "min_date": e.get("min_date"),
+                    "max_date": e.get("max_date"),
+                }
+                for loc, e in manifest["locations"].items()
+                if e.get("years")
+            }
         except Exception:
-            continue
-    return pd.DataFrame()
+            pass
+    return _solar_sheets_fallback_frames(sh)["index"]
+
+
+def _solar_index_from_frame(df: pd.DataFrame) -> dict:
+    index = {}
+    if df.empty:
+        return index
+    counts = df.groupby([df["지점"].astype(str), df["날짜"].dt.year]).size()
+    for (loc, yr), n in counts.items():
+        index.setdefault(loc, {"years": {}, "min_date": None, "max_date": None})["years"][int(yr)] = int(n)
+    bounds = df.groupby(df["지점"].astype(str))["날짜"].agg(["min", "max"])
+    for loc, row in bounds.iterrows():
+        index[loc]["min_date"] = row["min"].strftime("%Y-%m-%d")
+        index[loc]["max_date"] = row["max"].strftime("%Y-%m-%d")
+    return index
+
+
+# 저장소 미사용(PMS_SOLAR_STORE=off) 시: 시트 통합 프레임을 지점별로 1회 나눠 두고 시트 읽기 캐시(5분)와 같은 주기로 갱신
+SOLAR_SHEETS_FALLBACK_TTL = 300
+
+
+@st.cache_resource
+def _solar_sheets_fallback_state():
+    return {"lock": threading.Lock(), "loaded_at": 0.0, "data": None}
+
+
+def invalidate_solar_sheets_fallback() -> None:
+    state = _solar_sheets_fallback_state()
+    with state["lock"]:
+        state["loaded_at"], state["data"] = 0.0, None
+
+
+def _solar_sheets_fallback_frames(sh) -> dict:
+    """
+    시트 통합 이력 {"frame": 날짜순 전체, "by_loc": {지점: 날짜순 프레임}, "index": 지점 색인}.
+    저장소가 꺼져 있어도 지점 조회·색인이 매번 전체 프레임을 다시 읽고 거르지 않도록 메모
+    """
+    state = _solar_sheets_fallback_state()
+    with state["lock"]:
+        if state["data"] is not None and time.time() - state["loaded_at"] < SOLAR_SHEETS_FALLBACK_TTL:
+            return state["data"]
+        df = _load_solar_db_df_from_sheets(sh).sort_values("날짜", kind="stable").reset_index(drop=True)
+        by_loc = (
+            {str(k): g.reset_index(drop=True) for k, g in df.groupby(df["지점"].astype(str), sort=False)}
+            if not df.empty
+            else {}
+        )
+        state["data"] = {"frame": df, "by_loc": by_loc, "index": _solar_index_from_frame(df)}
+        state["loaded_at"] = time.time()
+        return state["data"]
 
 
-def load_solar_db_df(sh):
-    """지역별 시트(Solar_지점명) + 구 Solar_DB 통합 로드"""
+def _load_solar_db_df_from_sheets(sh):
+    """지역별 시트(Solar_지점명) + 구 Solar_DB 통합 로드 (저장소 미사용 시)"""
     frames = []
     seen_sheets = set()
 
@@ -2999,6 +6420,153 @@ def _normalize_solar_db_df(df: pd.DataFrame) -> pd.DataFrame:
     return out.dropna(subset=["날짜"])
 
 
+# -------------------------------
+# [성능 개선] 장기간 일사량 차트 다운샘플링 (LTTB / 구간 최소·최대, 주·월 집계)
+# -------------------------------
+SOLAR_CHART_MAX_POINTS = int(os.environ.get("PMS_SOLAR_CHART_POINTS", "800"))  # 트레이스당 최대 점 수
+SOLAR_CHART_POINT_OPTIONS = [400, 800, 1600, 3200]
+SOLAR_CHART_RESOLUTIONS = ["자동", "일별(원본)", "주별 평균", "월별 평균"]
+SOLAR_CHART_MARKER_MAX = 400  # 점 수가 이보다 많으면 선만 표시
+
+
+def _lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: 선 모양(피크·골)을 보존하며 n_out개 인덱스 선택"""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    y = np.where(np.isnan(y), np.nanmean(y) if np.isfinite(y).any() else 0.0, y)
+    bounds = np.linspace(1, n - 1, n_out - 1).astype(int)
+    out = np.empty(n_out, dtype=int)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = bounds[i], max(bounds[i + 1], bounds[i] + 1)
+        if i + 2 < len(bounds):
+            nlo, nhi = bounds[i + 1], max(bounds[i + 2], bounds[i + 1] + 1)
+            avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        else:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        xs, ys = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a] - avg_x) * (ys - y[a]) - (x[a] - xs) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def _minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """구간별 최소·최대 인덱스 (막대 차트용 — 극값이 빠지지 않음)"""
+    n = len(y)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+    y = np.where(np.isnan(y), np.nanmean(y) if np.isfinite(y).any() else 0.0, y)
+    bounds = np.linspace(0, n, max(1, n_out // 2) + 1).astype(int)
+    picks = []
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        if hi <= lo:
+            continue
+        seg = y[lo:hi]
+        picks.append(lo + int(np.argmin(seg)))
+        picks.append(lo + int(np.argmax(seg)))
+    return np.unique(np.asarray(picks, dtype=int))
+
+
+def build_solar_chart_series(f_df: pd.DataFrame, resolution: str = "자동", max_points: int = SOLAR_CHART_MAX_POINTS) -> dict:
+    """
+    일사량 차트용 트레이스별 데이터 (날짜 정렬된 f_df, '예측_추세선' 포함).
+    - 자동: 점 수가 max_points 이하이면 원본, 넘으면 일사량은 최소·최대, 발전시간·추세는 LTTB
+    - 주별/월별: 기간 평균으로 집계
+    반환: {"rad": DataFrame, "gen": DataFrame, "trend": DataFrame, "label": 설명}
+    """
+    cols = ["날짜", "일사량합계", "발전시간", "예측_추세선"]
+    base = f_df[[c for c in cols if c in f_df.columns]].sort_values("날짜").reset_index(drop=True)
+    if resolution in ("주별 평균", "월별 평균"):
+        freq = "W-MON" if resolution == "주별 평균" else "MS"
+        agg = base.set_index("날짜").resample(freq, label="left", closed="left").mean().dropna(how="all").reset_index()
+        label = f"{resolution} {len(agg)}점 (일 {len(base)}건)"
+        return {"rad": agg, "gen": agg, "trend": agg, "label": label}
+    if resolution == "일별(원본)" or len(base) <= max_points:
+        return {"rad": base, "gen": base, "trend": base, "label": f"일별 {len(base)}점"}
+
+    x = base["날짜"].to_numpy(dtype="datetime64[D]").astype("int64").astype(float)
+    rad = base.iloc[_minmax_indices(base["일사량합계"].to_numpy(dtype=float), max_points)]
+    gen = base.iloc[_lttb_indices(x, base["발전시간"].to_numpy(dtype=float), max_points)]
+    trend = base.iloc[_lttb_indices(x, base["예측_추세선"].to_numpy(dtype=float), max_points)]
+    label = f"일별 {len(base)}건 → 약 {max_points}점으로 축약 (최소·최대/LTTB, 극값 유지)"
+    return {"rad": rad, "gen": gen, "trend": trend, "label": label}
+
+
+def build_solar_trend_figure(series: dict, sel_loc: str, forecast_days: pd.DataFrame = None) -> go.Figure:
+    """
+    일사량(막대) + 실제 발전시간(선) + 예측 추세(빨간선) 혼합 차트.
+    series: build_solar_chart_series 결과, forecast_days: 예보 서비스 days (7일 예측 발전시간 겹쳐 그림)
+    """
+    fig_solar = go.Figure()
+    rad_df, gen_df, trend_df = series["rad"], series["gen"], series["trend"]
+
+    # 1. 일사량합계 (주황색 막대) - 1차 Y축
+    fig_solar.add_trace(go.Bar(
+        x=rad_df['날짜'],
+        y=rad_df['일사량합계'],
+        name='일사량 (기상청)',
+        marker_color='rgba(255, 165, 0, 0.6)',
+        yaxis='y1'
+    ))
+
+    # 2. 실제 발전시간 (파란색 선) - 2차 Y축
+    fig_solar.add_trace(go.Scatter(
+        x=gen_df['날짜'],
+        y=gen_df['발전시간'],
+        name='실제 발전시간',
+        mode='lines+markers' if len(gen_df) <= SOLAR_CHART_MARKER_MAX else 'lines',
+        line=dict(color='rgba(33, 150, 243, 1)', width=2),
+        marker=dict(size=4),
+        yaxis='y2'
+    ))
+
+    # 3. 예측 발전시간 추세 (빨간색 두꺼운 선) - 2차 Y축
+    fig_solar.add_trace(go.Scatter(
+        x=trend_df['날짜'],
+        y=trend_df['예측_추세선'],
+        name='예측 발전량 (Trend)',
+        mode='lines',
+        line=dict(color='red', width=4),
+        yaxis='y2'
+    ))
+
+    if forecast_days is not None and not forecast_days.empty:
+        fc = forecast_days.dropna(subset=["예측_발전시간"])
+        if not fc.empty:
+            fig_solar.add_trace(go.Scatter(
+                x=pd.to_datetime(fc["날짜"]),
+                y=fc["예측_발전시간"].round(4),
+                name="7일 예보 예측",
+                mode="lines+markers",
+                line=dict(color="purple", width=2, dash="dot"),
+                marker=dict(size=9, color="purple", symbol="diamond"),
+                yaxis='y2'
+            ))
+
+    fig_solar.update_layout(
+        title=f"[{sel_loc}] 일사량 및 실제/예측 발전시간 추이 비교",
+        xaxis=dict(title="날짜"),
+        yaxis=dict(
+            title=dict(text="일사량 (MJ/m²)", font=dict(color="orange")),
+            tickfont=dict(color="orange")
+        ),
+        yaxis2=dict(
+            title=dict(text="발전시간 (h)", font=dict(color="blue")),
+            tickfont=dict(color="blue"),
+            anchor="free",
+            overlaying="y",
+            side="right"
+        ),
+        hovermode="x unified",
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        meta={"series_label": series.get("label", "")},  # 캐시된 Figure 에서 축약 설명을 다시 읽기 위함
+    )
+    return fig_solar
+
+
 def view_solar(sh):
     col_title, col_btn = st.columns([8, 2])
     with col_title:
@@ -3008,17 +6576,20 @@ def view_solar(sh):
         render_print_button()
         
     try:
-        df_db = load_solar_db_df(sh)
-        if df_db.empty:
+        # 지점 목록·연도 적재 현황은 메타데이터 색인으로, 이력은 선택한 지점만 불러옴
+        solar_index = solar_location_index(sh)
+        ensure_solar_gap_backfill_worker()
+        ensure_portfolio_forecast_worker()
+        if not solar_index:
             st.info("데이터가 없습니다. 아래 **신규 지역 데이터 생성**에서 여주 등 지점 데이터를 만들 수 있습니다.")
             with st.expander("🏗️ 연도별 데이터 쌓기 (1년씩)", expanded=True):
-                render_solar_yearly_data_builder(sh, df_db)
+                render_solar_yearly_data_builder(sh, None, solar_index)
             return
 
         with st.expander("🔍 발전량 상세 검색 필터", expanded=True):
             f1, f2 = st.columns(2)
             with f1:
-                db_locs = list_solar_locations(sh, df_db)
+                db_locs = list_solar_locations(sh, index=solar_index)
                 extra_locs = sorted(set(GEO_FALLBACK_COORDS.keys()) - set(db_locs))
                 locs = db_locs + [f"{x} (미등록)" for x in extra_locs]
                 sel_raw = st.selectbox("조회 지역 선택", locs)
@@ -3030,20 +6601,32 @@ def view_solar(sh):
                 default_end = datetime.date(2025, 12, 31)
                 dr = st.date_input("조회 기간", [default_start, default_end])
         
-        mask = (df_db['지점'] == sel_loc)
-        if len(dr) == 2:
-            mask = mask & (df_db['날짜'].dt.date >= dr[0]) & (df_db['날짜'].dt.date <= dr[1])
-        
-        f_df = df_db[mask].sort_values('날짜')
+        # 조회 기간은 저장소의 정렬된 지점 프레임에서 이진 탐색으로 먼저 자른 뒤 그 구간만 꺼냄 (전체 이력 복사 없음)
+        f_df = (
+            load_solar_db_df(sh, location=sel_loc, start=dr[0], end=dr[1], fill_from_hourly=True)
+            if len(dr) == 2
+            else load_solar_db_df(sh, location=sel_loc, fill_from_hourly=True)
+        )
+        # 10년 분석은 저장소 manifest 집계를 쓰므로, 저장소에 없는 지점일 때만 전체 이력을 불러옴
+        in_store = SOLAR_STORE_ENABLED and bool((_load_solar_manifest()["locations"].get(sel_loc) or {}).get("years"))
+        loc_df = None if in_store else load_solar_db_df(sh, location=sel_loc)
+        # 시간별 데이터로 보충한 날(발전시간 없음)은 모델 적합·실측 지표에서 제외
+        measured_df = f_df[~f_df["시간별보충"]] if "시간별보충" in f_df.columns else f_df
 
         # -------------------------
         # [신규] 10년 평균 대비 연평균 일사량 분석 (2024·2025)
         # -------------------------
         with st.expander("📈 10년 평균 대비 분석 (2024·2025)", expanded=True):
-            render_solar_climatology_analysis(sel_loc, f_df, df_db)
+            render_solar_climatology_analysis(sel_loc, f_df, loc_df)
+
+        with st.expander("🎯 P50/P75/P90 초과확률 (연간·월별)", expanded=False):
+            render_solar_exceedance(sh, sel_loc, db_locs)
+
+        with st.expander("⏱️ 시간별 일사 (클리핑·오전/저녁 손실)", expanded=False):
+            render_solar_hourly_analysis(sel_loc)
 
         with st.expander("🏗️ 연도별 데이터 쌓기 (1년씩)", expanded=False):
-            render_solar_yearly_data_builder(sh, df_db)
+            render_solar_yearly_data_builder(sh, None, solar_index)
 
         st.divider()
 
@@ -3053,17 +6636,12 @@ def view_solar(sh):
         st.subheader("🔮 내일 태양광 예측 (날씨 예보 연동)")
         with st.container(border=True):
             tom = datetime.date.today() + datetime.timedelta(days=1)
-            geo = None
             try:
-                geo = geocode_location_open_meteo(sel_loc)
+                lat, lon, geo = get_location_lat_lon(sel_loc)
             except Exception:
-                geo = None
+                lat, lon, geo = None, None, None
 
-            lat = None
-            lon = None
-            if geo and geo.get("latitude") is not None and geo.get("longitude") is not None:
-                lat = float(geo["latitude"])
-                lon = float(geo["longitude"])
+            if lat is not None and lon is not None:
                 place = " / ".join([str(x) for x in [geo.get("name"), geo.get("admin1"), geo.get("country")] if x])
                 st.caption(f"예보 좌표: {place} (lat={lat:.4f}, lon={lon:.4f})")
             else:
@@ -3072,17 +6650,22 @@ def view_solar(sh):
                 lat = c1.number_input("위도(lat)", value=36.3504, format="%.6f")
                 lon = c2.number_input("경도(lon)", value=127.3845, format="%.6f")
 
+            # 좌표·7일 예보·모델을 한 번만 준비해 아래 지표·차트가 함께 사용
+            forecast_svc = build_location_forecast(sel_loc, measured_df, lat=lat, lon=lon, geo=geo, sh=sh)
             try:
-                fc = fetch_open_meteo_daily_forecast(lat, lon, timezone="Asia/Seoul")
-                rad = _pick_daily_value(fc, tom, "shortwave_radiation_sum")  # MJ/m²
-                cloud = _pick_daily_value(fc, tom, "cloud_cover_mean")
-                tmax = _pick_daily_value(fc, tom, "temperature_2m_max")
-                precip = _pick_daily_value(fc, tom, "precipitation_sum")
+                if forecast_svc["error"]:
+                    raise RuntimeError(forecast_svc["error"])
+                tom_fc = forecast_for_day(forecast_svc, tom) or {}
+                rad = tom_fc.get("일사량")  # MJ/m²
+                cloud = tom_fc.get("운량")
+                tmax = tom_fc.get("최고기온")
+                precip = tom_fc.get("강수량")
 
                 if rad is None:
                     st.warning("내일 일사량 예보 값을 가져오지 못했습니다. (API 응답에 날짜가 없을 수 있어요)")
                 else:
-                    pred_h, method, r2 = fit_predict_generation_hours(f_df, float(rad))
+                    pred_h = tom_fc["예측_발전시간"]
+                    method, r2 = forecast_svc["model"]["method"], forecast_svc["model"]["r2"]
 
                     m1, m2, m3, m4 = st.columns(4)
                     m1.metric("내일 예보 일사량", f"{float(rad):.2f} MJ/m²")
@@ -3108,31 +6691,17 @@ def view_solar(sh):
                         st.write("버튼을 누르면 `pms_db`에 `Solar_Forecast` 시트가 없으면 생성하고, 예측 결과를 1행 추가합니다.")
                         if st.button("💾 내일 예측값 시트에 저장", use_container_width=True):
                             try:
-                                f_ws_title = "Solar_Forecast"
-                                try:
-                                    f_ws = safe_api_call(sh.worksheet, f_ws_title)
-                                except WorksheetNotFound:
-                                    f_ws = safe_api_call(sh.add_worksheet, title=f_ws_title, rows="2000", cols="20")
-                                    safe_api_call(f_ws.append_row, ["날짜", "지점", "위도", "경도", "예보_일사량(MJ/m²)", "예측_발전시간(h)", "예측모델", "R2", "운량(%)", "최고기온(℃)", "강수량(mm)", "저장시각", "저장자"])
+                                f_ws = get_or_create_solar_forecast_worksheet(sh)
                                 now_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                                 safe_api_call(
                                     f_ws.append_row,
-                                    [
-                                        tom.strftime("%Y-%m-%d"),
-                                        str(sel_loc),
-                                        float(lat),
-                                        float(lon),
-                                        float(rad),
-                                        float(pred_h),
-                                        str(method),
-                                        "" if r2 is None else float(r2),
-                                        "" if cloud is None else float(cloud),
-                                        "" if tmax is None else float(tmax),
-                                        "" if precip is None else float(precip),
-                                        now_str,
-                                        st.session_state.get("user_id", "")
-                                    ]
+                                    _solar_forecast_row(
+                                        tom.strftime("%Y-%m-%d"), sel_loc, lat, lon, rad, pred_h, method, r2,
+                                        cloud, tmax, precip, now_str, st.session_state.get("user_id", ""),
+                                    ),
                                 )
+                                cached_get_all_values.clear()
+                                clear_file_cache(SOLAR_FORECAST_SHEET)
                                 st.success("저장 완료!")
                             except Exception as e:
                                 st.error(f"저장 중 오류: {e}")
@@ -3140,90 +6709,66 @@ def view_solar(sh):
             except Exception as e:
                 st.warning(f"예보 데이터를 불러오지 못했습니다: {e}")
 
+        with st.expander("🗺️ 전 지점 7일 발전 예보", expanded=False):
+            render_portfolio_forecast(sh, db_locs)
+
+        with st.expander("🧠 다변수 발전 예측 모델 (학습·등록 현황)", expanded=False):
+            render_generation_model_registry(sh, sel_loc, db_locs)
+
+        with st.expander("🧪 예측 백테스트 (Solar_Forecast vs 실적)", expanded=False):
+            render_forecast_backtest(sh)
+
         st.divider()
 
         if not f_df.empty:
             m1, m2, m3 = st.columns(3)
-            m1.metric("평균 발전 시간", f"{f_df['발전시간'].mean():.2f} h")
+            m1.metric("평균 발전 시간", f"{measured_df['발전시간'].mean():.2f} h")
             m2.metric("평균 일사량", f"{f_df['일사량합계'].mean():.2f} MJ/m²")
-            m3.metric("검색 데이터 수", f"{len(f_df)} 건")
+            n_filled = len(f_df) - len(measured_df)
+            m3.metric(
+                "검색 데이터 수",
+                f"{len(f_df)} 건",
+                help=f"시간별 데이터로 일사량만 보충한 날 {n_filled}건 포함" if n_filled else None,
+            )
 
-            # --- [핵심] 일사량(막대), 발전시간(선), 예측추세(빨간선) 혼합 차트 ---
-            fig_solar = go.Figure()
-            
-            # 1. 일사량합계 (주황색 막대) - 1차 Y축
-            fig_solar.add_trace(go.Bar(
-                x=f_df['날짜'], 
-                y=f_df['일사량합계'], 
-                name='일사량 (기상청)', 
-                marker_color='rgba(255, 165, 0, 0.6)', 
-                yaxis='y1'
-            ))
-            
-            # 2. 실제 발전시간 (파란색 선) - 2차 Y축
-            fig_solar.add_trace(go.Scatter(
-                x=f_df['날짜'], 
-                y=f_df['발전시간'], 
-                name='실제 발전시간', 
-                mode='lines+markers', 
-                line=dict(color='rgba(33, 150, 243, 1)', width=2), 
-                marker=dict(size=4),
-                yaxis='y2'
-            ))
-            
-            # 3. 예측 발전시간 추세 (빨간색 두꺼운 선) - 2차 Y축 (기존 로직 유지)
+            # 예측 발전시간 추세 (기존 로직 유지) — 엑셀 내보내기에도 포함
             f_df = f_df.copy()
             f_df['예측_발전시간'] = (f_df['일사량합계'] / 3.6) * 0.8
             f_df['예측_추세선'] = f_df['예측_발전시간'].rolling(window=14, min_periods=1, center=True).mean()
-            
-            fig_solar.add_trace(go.Scatter(
-                x=f_df['날짜'], 
-                y=f_df['예측_추세선'], 
-                name='예측 발전량 (Trend)', 
-                mode='lines', 
-                line=dict(color='red', width=4), 
-                yaxis='y2'
-            ))
 
-            # 내일 예측 점(가능할 때만)
-            try:
-                tom = datetime.date.today() + datetime.timedelta(days=1)
-                geo = geocode_location_open_meteo(sel_loc)
-                if geo and geo.get("latitude") and geo.get("longitude"):
-                    fc = fetch_open_meteo_daily_forecast(float(geo["latitude"]), float(geo["longitude"]), timezone="Asia/Seoul")
-                    rad = _pick_daily_value(fc, tom, "shortwave_radiation_sum")
-                    if rad is not None:
-                        pred_h, _, _ = fit_predict_generation_hours(f_df, float(rad))
-                        fig_solar.add_trace(go.Scatter(
-                            x=[datetime.datetime.combine(tom, datetime.time(0, 0))],
-                            y=[pred_h],
-                            name="내일 예측(점)",
-                            mode="markers",
-                            marker=dict(size=12, color="purple", symbol="diamond"),
-                            yaxis='y2'
-                        ))
-            except Exception:
-                pass
+            # 7일 예보 예측(위 예측 섹션에서 만든 서비스 재사용)
+            fc_days = forecast_svc["days"]
+            fc_key = (
+                [[str(d), round(float(h), 4)] for d, h in zip(fc_days["날짜"], fc_days["예측_발전시간"]) if pd.notna(h)]
+                if not fc_days.empty else []
+            )
 
-            fig_solar.update_layout(
-                title=f"[{sel_loc}] 일사량 및 실제/예측 발전시간 추이 비교",
-                xaxis=dict(title="날짜"),
-                yaxis=dict(
-                    title=dict(text="일사량 (MJ/m²)", font=dict(color="orange")), 
-                    tickfont=dict(color="orange")
-                ),
-                yaxis2=dict(
-                    title=dict(text="발전시간 (h)", font=dict(color="blue")), 
-                    tickfont=dict(color="blue"), 
-                    anchor="free", 
-                    overlaying="y", 
-                    side="right"
-                ),
-                hovermode="x unified",
-                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+            rc1, rc2 = st.columns([2, 1])
+            with rc1:
+                chart_res = st.radio("차트 해상도", SOLAR_CHART_RESOLUTIONS, horizontal=True, key="solar_chart_resolution")
+            with rc2:
+                chart_pts = st.select_slider(
+                    "최대 표시 점 수 (좁은 화면은 작게)",
+                    options=SOLAR_CHART_POINT_OPTIONS,
+                    value=SOLAR_CHART_MAX_POINTS if SOLAR_CHART_MAX_POINTS in SOLAR_CHART_POINT_OPTIONS else SOLAR_CHART_POINT_OPTIONS[1],
+                    key="solar_chart_points",
+                    disabled=chart_res != "자동",
+                )
+            # 다운샘플링(LTTB/최소·최대)은 Figure 캐시가 없을 때만 builder 안에서 실행
+            fig_solar = get_or_build_figure(
+                "solar_trend",
+                frame_signature(f_df[["날짜", "발전시간", "일사량합계"]]),
+                {
+                    "loc": sel_loc,
+                    "range": [str(d) for d in dr],
+                    "forecast": fc_key,
+                    "resolution": chart_res,
+                    "points": chart_pts,
+                },
+                lambda: build_solar_trend_figure(build_solar_chart_series(f_df, chart_res, chart_pts), sel_loc, fc_days),
             )
-            
             st.plotly_chart(fig_solar, use_container_width=True)
+            st.caption(f"📉 {(fig_solar.layout.meta or {}).get('series_label', '')}")
 
             st.subheader("📊 검색 결과 상세 내역")
             
@@ -3540,28 +7085,26 @@ def _build_daily_report_html(
         return "<p>표시할 항목이 없습니다.</p>"
 
     major_spans = _daily_report_major_rowspans(rows)
-    legend_cells = ""
-    for abbr, desc in DEFAULT_DAILY_REPORT_LEGEND:
-        legend_cells += (
-            f'<div class="daily-report-legend-cell"><b>{html_module.escape(abbr)}</b> '
-            f"{html_module.escape(desc)}</div>"
-        )
+    legend_cells = "".join(
+        f'<div class="daily-report-legend-cell"><b>{html_module.escape(abbr)}</b> '
+        f"{html_module.escape(desc)}</div>"
+        for abbr, desc in DEFAULT_DAILY_REPORT_LEGEND
+    )
 
-    body_rows = ""
+    parts = []
     for i, row in enumerate(rows):
-        body_rows += "<tr>"
-        body_rows += f'<td class="dr-col-id">{_daily_report_escape(row.get("구분", ""))}</td>'
+        parts.append("<tr>")
+        parts.append(f'<td class="dr-col-id">{_daily_report_escape(row.get("구분", ""))}</td>')
         if i in major_spans:
             span, cat = major_spans[i]
-            body_rows += (
-                f'<td class="dr-col-major" rowspan="{span}">{_daily_report_escape(cat)}</td>'
-            )
-        body_rows += f'<td class="dr-col-sub">{_daily_report_escape(row.get("세부항목", ""))}</td>'
-        body_rows += f'<td class="dr-col-work">{_daily_report_escape(row.get("업무내용", ""))}</td>'
+            parts.append(f'<td class="dr-col-major" rowspan="{span}">{_daily_report_escape(cat)}</td>')
+        parts.append(f'<td class="dr-col-sub">{_daily_report_escape(row.get("세부항목", ""))}</td>')
+        parts.append(f'<td class="dr-col-work">{_daily_report_escape(row.get("업무내용", ""))}</td>')
         pct = row.get("공정율", "")
-        body_rows += f'<td class="dr-col-pct">{_daily_report_escape(pct if pct not in ("-", "") else "")}</td>'
-        body_rows += f'<td class="dr-col-note">{_daily_report_escape(row.get("비고", ""))}</td>'
-        body_rows += "</tr>"
+        parts.append(f'<td class="dr-col-pct">{_daily_report_escape(pct if pct not in ("-", "") else "")}</td>')
+        parts.append(f'<td class="dr-col-note">{_daily_report_escape(row.get("비고", ""))}</td>')
+        parts.append("</tr>")
+    body_rows = "".join(parts)
 
     project_bar = ""
     if project_name and show_project_tag:
@@ -3752,6 +7295,18 @@ def _render_daily_report_html_viewport(viewport_cls: str, sheet_html: str, *, ro
     components.html(doc, height=height, scrolling=True)
 
 
+@st.cache_data(show_spinner=False, max_entries=256)
+def _cached_daily_report_html(project_name: str, date_iso: str, rows_hash: str, compact: bool, _section_rows: list) -> str:
+    """일일보고 표 HTML 캐시 — (프로젝트, 일자, 행 내용 해시, compact) 가 같으면 대시보드·미리보기에서 재사용"""
+    return _build_daily_report_html(
+        date_iso,
+        _section_rows,
+        project_name=project_name or None,
+        show_legend=not compact,
+        show_project_tag=not compact,
+    )
+
+
 def _render_daily_report_section_table(
     section_rows: list,
     date_iso: str,
@@ -3762,12 +7317,12 @@ def _render_daily_report_section_table(
     if not section_rows:
         st.info("표시할 항목이 없습니다.")
         return
-    sheet_html = _build_daily_report_html(
-        date_iso,
+    sheet_html = _cached_daily_report_html(
+        project_name or "",
+        str(date_iso)[:10],
+        _data_content_hash(section_rows),
+        compact,
         section_rows,
-        project_name=project_name,
-        show_legend=not compact,
-        show_project_tag=not compact,
     )
     viewport_cls = "daily-report-viewport daily-report-viewport--dashboard" if compact else "daily-report-viewport"
     _render_daily_report_html_viewport(
@@ -3941,6 +7496,25 @@ def _render_daily_report_edit_and_save(
     if draft_key not in st.session_state:
         st.session_state[draft_key] = _copy_daily_report_rows(initial_rows)
 
+    _render_daily_report_editor_fragment(
+        sh, project_name, date_iso, initial_rows, key_prefix, draft_key, show_html_preview
+    )
+
+
+@_fragment_or_plain
+def _render_daily_report_editor_fragment(
+    sh,
+    project_name: str,
+    date_iso: str,
+    initial_rows: list,
+    key_prefix: str,
+    draft_key: str,
+    show_html_preview: bool,
+):
+    """일일보고 편집기·미리보기 (셀 편집은 이 영역만 리런, 저장 시 전체 새로고침)"""
+    if draft_key not in st.session_state:
+        st.session_state[draft_key] = _copy_daily_report_rows(initial_rows)
+
     st.markdown(f"##### ✏️ 편집 — {_daily_report_date_korean(date_iso)} · {project_name}")
     edit_df = _editor_df_from_rows(st.session_state[draft_key])
     edited = st.data_editor(
@@ -3981,7 +7555,7 @@ def _render_daily_report_edit_and_save(
     with btn2:
         if st.button("↩️ 편집 초기화", key=f"dr_reset_{key_prefix}", use_container_width=True):
             st.session_state[draft_key] = _copy_daily_report_rows(initial_rows)
-            st.rerun()
+            _rerun_fragment()
 
     if show_html_preview:
         st.markdown("##### 👁️ 양식 미리보기")
@@ -4345,6 +7919,7 @@ def view_project_admin(sh, pjt_list):
                 skipped_sheets = []
                 
                 updated_projects = []
+                uploaded_frames = {}
                 with st.spinner("데이터를 매칭하여 일괄 업데이트 중입니다..."):
                     for sheet_name, df_up in all_sheets.items():
                         s_name = sheet_name.strip()
@@ -4354,8 +7929,13 @@ def view_project_admin(sh, pjt_list):
                             sync_worksheet_from_excel_df(ws, df_up)
                             updated_count += 1
                             updated_projects.append(s_name)
+                            uploaded_frames[s_name] = _normalize_excel_schedule_df(df_up)
                         else:
                             skipped_sheets.append(s_name)
+                    try:
+                        record_progress_snapshots(sh, uploaded_frames, force=True)
+                    except Exception:
+                        pass
                 
                 cached_get_all_values.clear()
                 cached_get_head.clear()
@@ -4376,11 +7956,18 @@ def view_project_admin(sh, pjt_list):
 
     with t5:
         if st.button("📚 통합 백업 엑셀 생성"):
+            progress_bar, progress_cb = _portfolio_progress_callback("프로젝트 시트를 불러오는 중…")
+            snapshots = load_portfolio_snapshots(
+                pjt_list,
+                loader=lambda name: cached_get_all_values('pms_db', name),
+                progress_cb=progress_cb,
+            )
+            progress_bar.empty()
             output = io.BytesIO()
             with pd.ExcelWriter(output, engine='openpyxl') as writer:
                 for p in pjt_list:
                     try:
-                        data = cached_get_all_values('pms_db', p)
+                        data = snapshots.get(p)
                         if not data:
                             continue
                         pd.DataFrame(data[1:], columns=data[0]).to_excel(writer, index=False, sheet_name=p[:31])
@@ -4403,6 +7990,7 @@ if check_login():
             sys_names = [
                 'weekly_history', SOLAR_LEGACY_SHEET, 'KPI', 'Sheet1', 'Control_Center',
                 'Dashboard_Control', '통합 대시보드', SOLAR_FORECAST_SHEET, DAILY_REPORT_SHEET,
+                PROGRESS_HISTORY_SHEET,
             ]
             pjt_list = _load_file_cache(WORKSHEET_LIST_CACHE, FILE_CACHE_TTL)
             if pjt_list is None: